@@ -1,11 +1,13 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
 import os
+import sys
+import time
+import threading
+from collections import OrderedDict
 import matplotlib.pyplot as plt
 import seaborn as sns
-import xgboost as xgb
 
 # --- Sayfa Yapılandırması ---
 st.set_page_config(
@@ -18,11 +20,23 @@ st.set_page_config(
 # --- Sabitler ve Yollar ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Dosya yolları için alternatifleri kontrol et (Cloud vs Local uyumluluğu)
+# Eğitimle aynı özellik mantığını kullanmak için src/ modülleri
+sys.path.insert(0, os.path.join(BASE_DIR, '..', 'src'))
+from features import build_feature_matrix
+from inference import make_store_date_grid
+from registry import ModelWatcher
+from store_index import build_store_index
+
+# Dosya yolları için alternatifleri kontrol et (Cloud vs Local uyumluluğu).
+# Model kayıt defteri (registry) varsa onun güncel sürümü kullanılır ve yeni sürümler
+# uygulama yeniden başlatılmadan devreye alınır; yoksa tek model paketi kullanılır.
 possible_model_paths = [
-    os.path.join(BASE_DIR, '..', 'models', 'xgb_sales_model.joblib'),
-    os.path.join(BASE_DIR, 'models', 'xgb_sales_model.joblib'),
-    'models/xgb_sales_model.joblib'
+    os.path.join(BASE_DIR, '..', 'models', 'registry'),
+    os.path.join(BASE_DIR, 'models', 'registry'),
+    'models/registry',
+    os.path.join(BASE_DIR, '..', 'models', 'xgb_sales_model'),
+    os.path.join(BASE_DIR, 'models', 'xgb_sales_model'),
+    'models/xgb_sales_model'
 ]
 
 possible_data_paths = [
@@ -42,11 +56,27 @@ DATA_PATH = find_file(possible_data_paths)
 
 # --- Yardımcı Fonksiyonlar ---
 @st.cache_resource
-def load_model():
+def get_model_watcher():
+    """
+    Güncel model paketini tutan ve registry'deki sürüm işaretçisini arka planda izleyen
+    nesne (tüm oturumlar için bir tane). Yeni sürüm yüklenip bir ısınma tahmini yapıldıktan
+    sonra devreye alınır; süren oturumlar beklemez.
+    """
     if MODEL_PATH is None:
-        st.error("Model dosyası bulunamadı! Lütfen 'models/xgb_sales_model.joblib' dosyasının yüklendiğinden emin olun.")
         return None
-    return joblib.load(MODEL_PATH)
+    return ModelWatcher(MODEL_PATH).start()
+
+def load_model():
+    watcher = get_model_watcher()
+    if watcher is None:
+        st.error("Model paketi bulunamadı! Lütfen 'models/xgb_sales_model' klasörünün yüklendiğinden emin olun.")
+        return None
+    # Her çalıştırmada bir kez okunur; sürüm bu çalıştırmanın ortasında değişse de aynı paket kullanılır
+    return watcher.bundle
+
+def get_model_key(model):
+    """Önbellek anahtarlarında modeli ayırt eden değer: paket klasörü ve oluşturulma zamanı."""
+    return (model.path, model.manifest['created_at'])
 
 @st.cache_data
 def load_store_data():
@@ -55,109 +85,159 @@ def load_store_data():
         return None
     return pd.read_csv(DATA_PATH)
 
-def get_sample_store_id(store_df, store_type, assortment):
-    """Seçilen özelliklere uygun bir örnek mağaza ID'si döndürür."""
+@st.cache_resource
+def load_store_index_data(_model, model_key):
+    """Model paketindeki mağaza indeksini döndürür; yoksa store.csv'den paketin kodlamalarıyla bir kez oluşturur."""
+    if _model is not None and _model.store_index is not None:
+        return _model.store_index
+    store_df = load_store_data()
     if store_df is None:
+        return None
+    if _model is None:
+        return build_store_index(store_df)
+    return build_store_index(store_df, _model.imputation.get('CompetitionDistance'), _model.encoders)
+
+def get_sample_store_id(store_index, store_type, assortment):
+    """Seçilen özelliklere uygun bir örnek mağaza ID'si döndürür."""
+    if store_index is None:
         return 1 # Fallback
-        
-    subset = store_df[
-        (store_df['StoreType'] == store_type) & 
-        (store_df['Assortment'] == assortment)
-    ]
-    if subset.empty:
+
+    store_type_match = store_index['store_type'] == np.searchsorted(store_index['store_type_classes'], store_type)
+    assortment_match = store_index['assortment'] == np.searchsorted(store_index['assortment_classes'], assortment)
+    candidates = np.flatnonzero(store_index['known'] & store_type_match & assortment_match)
+    if len(candidates) == 0:
         # Tam eşleşme yoksa sadece tipe göre döndür
-        subset = store_df[store_df['StoreType'] == store_type]
-        if subset.empty:
+        candidates = np.flatnonzero(store_index['known'] & store_type_match)
+        if len(candidates) == 0:
             return 1 # Varsayılan
-    return subset.iloc[0]['Store']
+    return int(candidates[0])
 
-def prepare_input_features(date, store_id, promo, state_holiday, school_holiday, store_data, competition_distance_override=None):
-    """Modelin beklediği formatta DataFrame oluşturur."""
-    
-    # Tarih özellikleri
-    input_data = {
-        'Store': [store_id],
-        'DayOfWeek': [date.weekday()],
-        'Date': [pd.to_datetime(date)], # Tarih formatı
-        'Sales': [0], # Dummy
-        'Customers': [0], # Dummy
-        'Open': [1],
-        'Promo': [promo],
-        'StateHoliday': [state_holiday],
-        'SchoolHoliday': [school_holiday],
-        'Year': [date.year],
-        'Month': [date.month],
-        'Day': [date.day],
-        'WeekOfYear': [date.isocalendar()[1]]
-    }
-    
-    df = pd.DataFrame(input_data)
-    
-    # Store verilerini merge et
-    store_info = store_data[store_data['Store'] == store_id].iloc[0]
-    
-    # Statik özellikleri ekle
-    # Not: Model eğitiminde kullanılan sütun isimleri ve feature engineering adımları buraya eklenmeli
-    # 4_Model_Opt.ipynb ve features.py'deki mantığı taklit ediyoruz
-    
-    # Feature Engineering (Özet)
-    df['StoreType'] = store_info['StoreType']
-    df['Assortment'] = store_info['Assortment']
-    
-    # CompetitionDistance (Kullanıcı değiştirebilsin diye override seçeneği)
-    if competition_distance_override is not None:
-        df['CompetitionDistance'] = competition_distance_override
-    else:
-        df['CompetitionDistance'] = store_info['CompetitionDistance']
-        
-    df['CompetitionOpenSinceMonth'] = store_info['CompetitionOpenSinceMonth']
-    df['CompetitionOpenSinceYear'] = store_info['CompetitionOpenSinceYear']
-    df['Promo2'] = store_info['Promo2']
-    df['Promo2SinceWeek'] = store_info['Promo2SinceWeek']
-    df['Promo2SinceYear'] = store_info['Promo2SinceYear']
-    df['PromoInterval'] = store_info['PromoInterval']
-
-    # Eksik verileri doldur (Model eğitimiyle tutarlı olmalı)
-    df['CompetitionOpenSinceMonth'].fillna(0, inplace=True)
-    df['CompetitionOpenSinceYear'].fillna(0, inplace=True)
-    df['CompetitionDistance'].fillna(df['CompetitionDistance'].mean(), inplace=True)
-    df['Promo2SinceWeek'].fillna(0, inplace=True)
-    df['Promo2SinceYear'].fillna(0, inplace=True)
-    df['PromoInterval'].fillna('', inplace=True)
-
-    # CompetitionOpen Hesaplama
-    df['CompetitionOpen'] = (df['Year'] - df['CompetitionOpenSinceYear']) * 12 + (df['Month'] - df['CompetitionOpenSinceMonth'])
-    df['CompetitionOpen'] = df['CompetitionOpen'].apply(lambda x: max(x, 0))
-
-    # IsPromo2 Hesaplama
-    def is_promo2_active(row):
-        if row['Promo2'] == 0: return 0
-        if row['Year'] < row['Promo2SinceYear']: return 0
-        month_str = row['Date'].strftime('%b')
-        return 1 if month_str in row['PromoInterval'] else 0
-    
-    df['IsPromo2'] = df.apply(is_promo2_active, axis=1)
+@st.cache_data(show_spinner=False, max_entries=32)
+def forecast_chain(_model, _store_index, model_key, start_date, days, store_types, assortments, promo, closed_on_sunday):
+    """
+    Seçilen mağazaların tamamı için tarih aralığı boyunca tahmin yapar. Özellik matrisi
+    tek seferde oluşturulur ve tek bir booster çağrısıyla (segmentli modelde segment başına bir) skorlanır.
+    Sonuç ufuk, filtreler ve model dosyası (model_key) ile önbelleğe alınır.
+    """
+    store_type_codes = np.searchsorted(_store_index['store_type_classes'], list(store_types))
+    assortment_codes = np.searchsorted(_store_index['assortment_classes'], list(assortments))
+    store_mask = _store_index['known'] & \
+        np.isin(_store_index['store_type'], store_type_codes) & \
+        np.isin(_store_index['assortment'], assortment_codes)
+    store_ids = np.flatnonzero(store_mask)
+    if len(store_ids) == 0:
+        return pd.DataFrame(columns=['Store', 'Date', 'StoreType', 'Assortment', 'Sales'])
 
-    # Label Encoding (Manuel Mapping - Model eğitimindeki LabelEncoder'ı kaydetmediysek bu risklidir ama basit map ile çözelim)
-    # Rossmann verisinde genelde: a:0, b:1, c:2, d:3
-    type_map = {'a':0, 'b':1, 'c':2, 'd':3}
-    assort_map = {'a':0, 'b':1, 'c':2}
-    holiday_map = {0:0, '0':0, 'a':1, 'b':2, 'c':3} # StateHoliday genellikle object gelir
-    
-    df['StoreType'] = df['StoreType'].map(type_map)
-    df['Assortment'] = df['Assortment'].map(assort_map)
-    # StateHoliday UI'dan string veya int gelebilir
-    df['StateHoliday'] = df['StateHoliday'].map(lambda x: holiday_map.get(str(x), 0))
-
-    # Modelin beklediği özellik sırası
-    features = [
-        'Year', 'Month', 'Day', 'DayOfWeek', 'WeekOfYear',
-        'Store', 'StoreType', 'Assortment', 'CompetitionDistance', 'CompetitionOpen',
-        'Promo', 'Promo2', 'IsPromo2',
-        'StateHoliday', 'SchoolHoliday'
-    ]
-    
-    return df[features]
+    grid = make_store_date_grid(store_ids, start_date, days, promo=promo)
+    if closed_on_sunday:
+        grid['Open'] = (grid['Date'].dt.dayofweek != 6).astype(int)
+
+    features_df = build_feature_matrix(grid, _store_index, _model.encoders, _model.features, _model.history)
+    predictions = _model.predict(features_df)
+    grid['Sales'] = np.where(grid['Open'].to_numpy() == 0, 0, predictions)
+    grid['StoreType'] = _store_index['store_type_classes'][features_df['StoreType'].to_numpy()]
+    grid['Assortment'] = _store_index['assortment_classes'][features_df['Assortment'].to_numpy()]
+    return grid[['Store', 'Date', 'StoreType', 'Assortment', 'Sales']]
+
+def render_chain_dashboard(model, store_index):
+    """Zincir geneli tahmin görünümü: filtreler, toplu grafikler ve sıralanabilir tablo."""
+    with st.sidebar:
+        st.header("⚙️ Tahmin Parametreleri")
+        store_types = st.multiselect("Mağaza Tipi", list(store_index['store_type_classes']),
+                                     default=list(store_index['store_type_classes']),
+                                     format_func=lambda x: f"Tip {x.upper()}")
+        assortments = st.multiselect("Ürün Çeşitliliği", list(store_index['assortment_classes']),
+                                     default=list(store_index['assortment_classes']))
+        start_date = st.date_input("Başlangıç Tarihi", value=pd.to_datetime("2015-08-01"))
+        days = st.slider("Tahmin Ufku (gün)", 1, 90, 42)
+        promo = st.toggle("Tüm Mağazalarda Promosyon", value=False)
+        closed_on_sunday = st.toggle("Pazar Günleri Kapalı", value=True)
+
+    start = time.perf_counter()
+    model_key = get_model_key(model)
+    forecast = forecast_chain(model, store_index, model_key, pd.Timestamp(start_date), days,
+                              tuple(store_types), tuple(assortments), 1 if promo else 0, closed_on_sunday)
+    elapsed = time.perf_counter() - start
+
+    if forecast.empty:
+        st.warning("Seçilen filtrelere uyan mağaza yok.")
+        return
+
+    st.markdown("### 🏬 Zincir Geneli Satış Tahmini")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Mağaza Sayısı", f"{forecast['Store'].nunique():,}")
+    col2.metric("Toplam Tahmini Satış", f"€{forecast['Sales'].sum():,.0f}")
+    col3.metric("Hesaplama Süresi", f"{elapsed * 1000:,.0f} ms", help=f"{len(forecast):,} mağaza×gün satırı")
+
+    st.subheader("Günlük Toplam Satış")
+    daily = forecast.pivot_table(index='Date', columns='StoreType', values='Sales', aggfunc='sum')
+    st.area_chart(daily)
+
+    st.subheader("Mağaza Tipine Göre Ortalama Günlük Satış")
+    by_type = forecast[forecast['Sales'] > 0].groupby('StoreType')['Sales'].mean()
+    st.bar_chart(by_type)
+
+    st.subheader("Mağaza Bazında Tahminler")
+    per_store = forecast.groupby(['Store', 'StoreType', 'Assortment'], as_index=False)['Sales'] \
+        .agg(ToplamSatış='sum', OrtalamaGünlükSatış='mean') \
+        .sort_values('ToplamSatış', ascending=False)
+    st.dataframe(per_store, hide_index=True, use_container_width=True)
+
+# --- What-if Yanıt Yüzeyi ---
+# Seçilen mağaza ve tarih için tüm senaryolar tek bir toplu tahminle hesaplanır;
+# arayüzdeki değişiklikler yalnızca bu tablodan değer okur.
+WHAT_IF_PROMO = [0, 1]
+WHAT_IF_STATE_HOLIDAYS = ['0', 'a', 'b', 'c']
+WHAT_IF_SCHOOL_HOLIDAY = [0, 1]
+COMPETITION_DISTANCE_AXIS = np.arange(0, 20001, 100)
+RESPONSE_SURFACE_CACHE_SIZE = 64
+
+@st.cache_resource
+def get_response_surface_cache():
+    """Oturumlar arasında paylaşılan, boyutu sınırlı LRU önbellek."""
+    return {'surfaces': OrderedDict(), 'lock': threading.Lock(), 'hits': 0, 'misses': 0}
+
+def build_response_surface(model, store_index, store_id, date):
+    """
+    Promo × resmi tatil × okul tatili × rakip mesafesi ızgarasının tamamını tek bir
+    inplace_predict çağrısıyla tahmin eder.
+
+    Returns:
+        np.ndarray: (promo, state holiday, school holiday, distance) boyutlu tahminler.
+    """
+    promo, holiday, school, distance = np.meshgrid(
+        WHAT_IF_PROMO, WHAT_IF_STATE_HOLIDAYS, WHAT_IF_SCHOOL_HOLIDAY, COMPETITION_DISTANCE_AXIS,
+        indexing='ij'
+    )
+    rows = pd.DataFrame({
+        'Store': store_id,
+        'Date': pd.Timestamp(date),
+        'Promo': promo.ravel(),
+        'StateHoliday': holiday.ravel(),
+        'SchoolHoliday': school.ravel(),
+    })
+    features_df = build_feature_matrix(rows, store_index, model.encoders, model.features, model.history)
+    features_df['CompetitionDistance'] = distance.ravel().astype(float)
+    return model.predict(features_df).reshape(promo.shape)
+
+def get_response_surface(model, store_index, store_id, date):
+    """Yanıt yüzeyini LRU önbellekten döndürür, yoksa hesaplayıp ekler."""
+    surface_cache = get_response_surface_cache()
+    key = (*get_model_key(model), int(store_id), pd.Timestamp(date))
+    with surface_cache['lock']:
+        surface = surface_cache['surfaces'].get(key)
+        if surface is not None:
+            surface_cache['surfaces'].move_to_end(key)
+            surface_cache['hits'] += 1
+            return surface, True
+
+    surface = build_response_surface(model, store_index, store_id, date)
+    with surface_cache['lock']:
+        surface_cache['surfaces'][key] = surface
+        surface_cache['misses'] += 1
+        while len(surface_cache['surfaces']) > RESPONSE_SURFACE_CACHE_SIZE:
+            surface_cache['surfaces'].popitem(last=False)
+    return surface, False
 
 # --- UI Tasarımı ---
 
@@ -169,7 +249,18 @@ Sol panelden mağaza özelliklerini ve tarihi değiştirerek farklı senaryolar
 
 # --- Sidebar (Girdiler) ---
 model = load_model()
-store_data = load_store_data()
+store_index = load_store_index_data(model, model and get_model_key(model))
+
+APP_MODES = ["Tek Mağaza Simülasyonu", "Zincir Geneli Tahmin"]
+with st.sidebar:
+    app_mode = st.radio("Görünüm", APP_MODES, horizontal=True)
+
+if app_mode == APP_MODES[1]:
+    if model and store_index is not None:
+        render_chain_dashboard(model, store_index)
+    else:
+        st.warning("Model veya veri yüklenemediği için tahmin yapılamıyor.")
+    st.stop()
 
 with st.sidebar:
     st.header("⚙️ Simülasyon Parametreleri")
@@ -180,10 +271,11 @@ with st.sidebar:
     assortment = st.selectbox("Ürün Çeşitliliği", ['a', 'c'], format_func=lambda x: "Temel" if x=='a' else "Geniş Kapsamlı")
     
     # Otomatik ID seçimi
-    selected_store_id = get_sample_store_id(store_data, store_type, assortment)
+    selected_store_id = get_sample_store_id(store_index, store_type, assortment)
     st.info(f"Seçilen özelliklere uygun referans mağaza: **Store {selected_store_id}**")
 
-    competition_dist = st.slider("En Yakın Rakip Mesafesi (m)", 0, 20000, 1000, step=100, help="Mağazaya en yakın rakibin metre cinsinden uzaklığı.")
+    competition_dist = st.slider("En Yakın Rakip Mesafesi (m)", int(COMPETITION_DISTANCE_AXIS[0]), int(COMPETITION_DISTANCE_AXIS[-1]), 1000,
+                                 step=int(COMPETITION_DISTANCE_AXIS[1] - COMPETITION_DISTANCE_AXIS[0]), help="Mağazaya en yakın rakibin metre cinsinden uzaklığı.")
 
     st.divider()
 
@@ -197,26 +289,28 @@ with st.sidebar:
 # --- Ana Ekran (Hesaplama ve Sonuçlar) ---
 
 if st.button("🚀 Satışları Simüle Et", type="primary", use_container_width=True):
-    if model and store_data is not None:
+    st.session_state['simulation_started'] = True
+
+# İlk simülasyondan sonra her widget değişikliği önbellekteki yanıt yüzeyinden okunur
+if st.session_state.get('simulation_started'):
+    if model and store_index is not None:
         with st.spinner('Yapay zeka hesaplama yapıyor...'):
+            interaction_start = time.perf_counter()
+            surface, surface_cache_hit = get_response_surface(model, store_index, selected_store_id, prediction_date)
+            surface_seconds = time.perf_counter() - interaction_start
+
+            promo_idx = 1 if promo else 0
+            holiday_idx = WHAT_IF_STATE_HOLIDAYS.index(state_holiday)
+            school_idx = 1 if school_holiday else 0
+            distance_idx = int(np.searchsorted(COMPETITION_DISTANCE_AXIS, competition_dist))
+
             # 1. Ana Senaryo Tahmini
-            input_df = prepare_input_features(
-                prediction_date, selected_store_id, 1 if promo else 0, 
-                state_holiday, 1 if school_holiday else 0, store_data,
-                competition_distance_override=competition_dist
-            )
-            # XGBoost Booster modeli DMatrix bekler
-            dmatrix = xgb.DMatrix(input_df)
-            prediction = model.predict(dmatrix)[0]
-            
+            prediction = surface[promo_idx, holiday_idx, school_idx, distance_idx]
+
             # 2. Karşılaştırma Senaryosu (Promosyonun tersi durumu)
-            input_df_alt = input_df.copy()
-            alt_promo = 0 if promo else 1
-            input_df_alt['Promo'] = alt_promo
-            
-            dmatrix_alt = xgb.DMatrix(input_df_alt)
-            prediction_alt = model.predict(dmatrix_alt)[0]
-            
+            prediction_alt = surface[1 - promo_idx, holiday_idx, school_idx, distance_idx]
+            lookup_seconds = time.perf_counter() - interaction_start - surface_seconds
+
             # Fark Hesaplama
             diff = prediction - prediction_alt
             diff_pct = (diff / prediction_alt) * 100 if prediction_alt != 0 else 0
@@ -267,7 +361,28 @@ if st.button("🚀 Satışları Simüle Et", type="primary", use_container_width
             Seçtiğiniz **Tip {store_type.upper()}** mağazası ve **{competition_dist}m** rakip mesafesi ile yapılan simülasyona göre;
             Promosyon yapılması satışları **€{abs(diff):,.0f}** kadar {'artırıyor' if diff > 0 else 'azaltıyor'}.
             """)
-            
+
+            # --- Duyarlılık Eğrisi ---
+            st.subheader("Rakip Mesafesine Duyarlılık")
+            sensitivity = pd.DataFrame({
+                'Rakip Mesafesi (m)': COMPETITION_DISTANCE_AXIS,
+                'Seçilen Durum': surface[promo_idx, holiday_idx, school_idx],
+                'Alternatif (Promo Ters)': surface[1 - promo_idx, holiday_idx, school_idx],
+            })
+            st.line_chart(sensitivity, x='Rakip Mesafesi (m)')
+
+            with st.expander("🛠️ Debug: Etkileşim Gecikmesi"):
+                surface_cache = get_response_surface_cache()
+                st.write({
+                    'yanıt yüzeyi': 'önbellekten' if surface_cache_hit else f'hesaplandı ({surface.size} senaryo, tek tahmin çağrısı)',
+                    'yüzey süresi (ms)': round(surface_seconds * 1000, 3),
+                    'değer okuma süresi (ms)': round(lookup_seconds * 1000, 3),
+                    'toplam etkileşim (ms)': round((time.perf_counter() - interaction_start) * 1000, 3),
+                    'model sürümü': get_model_watcher().version or model.path,
+                    'önbellek': f"{len(surface_cache['surfaces'])}/{RESPONSE_SURFACE_CACHE_SIZE} kayıt, "
+                                f"{surface_cache['hits']} isabet, {surface_cache['misses']} ıskalama",
+                })
+
     else:
         st.warning("Model veya veri yüklenemediği için tahmin yapılamıyor.")
 else:
@@ -1,11 +1,13 @@
+import argparse
+import json
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
 import xgboost as xgb
 import os
-import joblib
-from sklearn.metrics import mean_squared_error
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Setup paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -14,92 +16,275 @@ RAW_DATA_DIR = os.path.join(BASE_DIR, 'data', 'raw')
 DOCS_IMG_DIR = os.path.join(BASE_DIR, 'docs', 'images')
 STATS_FILE = os.path.join(BASE_DIR, 'docs', 'eda_stats.txt')
 MODEL_STATS_FILE = os.path.join(BASE_DIR, 'docs', 'model_stats.txt')
-MODEL_PATH = os.path.join(BASE_DIR, 'models', 'xgb_sales_model.joblib')
-
-if not os.path.exists(DOCS_IMG_DIR):
-    os.makedirs(DOCS_IMG_DIR)
-
-# --- EDA PART ---
-print("Starting EDA generation...")
-try:
-    merged_csv_path = os.path.join(DATA_DIR, 'train_merged.csv')
-    if not os.path.exists(merged_csv_path):
-         # Fallback if processed not found, try to merge raw
-         train_path = os.path.join(RAW_DATA_DIR, 'train.csv')
-         store_path = os.path.join(RAW_DATA_DIR, 'store.csv')
-         train_df = pd.read_csv(train_path, low_memory=False)
-         store_df = pd.read_csv(store_path)
-         df = pd.merge(train_df, store_df, on='Store', how='left')
-    else:
-        df = pd.read_csv(merged_csv_path, low_memory=False)
-
-    # Convert Date
-    df['Date'] = pd.to_datetime(df['Date'])
-    
-    # 1. Sales Distribution
+MODEL_PATH = os.path.join(BASE_DIR, 'models', 'xgb_sales_model')
+
+SALES_DIST_IMAGE = os.path.join(DOCS_IMG_DIR, 'eda_sales_dist.png')
+SALES_HOLIDAY_IMAGE = os.path.join(DOCS_IMG_DIR, 'eda_sales_stateholiday.png')
+FEATURE_IMPORTANCE_IMAGE = os.path.join(DOCS_IMG_DIR, 'model_feature_importance.png')
+METRICS_BREAKDOWN_IMAGE = os.path.join(DOCS_IMG_DIR, 'model_metrics_breakdown.png')
+
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+import eda_stats
+from cache import cache_key, file_digest, source_digest
+from config import REPORT_CHUNK_ROWS, REPORT_SALES_BIN_WIDTH, REPORT_DIGESTS_PATH
+from eda_stats import collect_eda_stats, iter_processed_chunks, iter_raw_merged_chunks
+from storage import processed_null_counts
+from model import load_model_bundle
+
+# Dağılım grafiğindeki çubuk sayısı ve yoğunluk (KDE) eğrisinin nokta sayısı
+HISTOGRAM_BINS = 50
+KDE_POINTS = 200
+
+# --- Rendering (işçi süreçlerde çalışır; girdileri yalnızca toplamlardır) ---
+def _render_sales_distribution(output_path, stats):
+    histogram = stats.positive_sales
+    nonzero = histogram.counts > 0
+    values, counts = histogram.edges()[nonzero], histogram.counts[nonzero]
+    bin_counts, bin_edges = np.histogram(values, bins=HISTOGRAM_BINS, weights=counts)
+    mean = np.average(values, weights=counts)
+    std = np.sqrt(np.average((values - mean) ** 2, weights=counts))
+    # Scott kuralı (seaborn/scipy gaussian_kde varsayılanı)
+    bandwidth = std * histogram.count ** (-1 / 5)
+    grid = np.linspace(values.min(), values.max(), KDE_POINTS)
+    density = histogram.kde(grid, bandwidth) * histogram.count * (bin_edges[1] - bin_edges[0])
+
     plt.figure(figsize=(10, 6))
-    sns.histplot(df[df['Sales'] > 0]['Sales'], bins=50, kde=True)
+    plt.hist(bin_edges[:-1], bins=bin_edges, weights=bin_counts, color='#4c72b0', alpha=0.75, edgecolor='white')
+    plt.plot(grid, density, color='#4c72b0')
     plt.title('Distribution of Sales (Store Open)')
     plt.xlabel('Sales')
-    plt.savefig(os.path.join(DOCS_IMG_DIR, 'eda_sales_dist.png'))
+    plt.ylabel('Count')
+    plt.savefig(output_path)
     plt.close()
 
-    # 2. Sales vs StateHoliday
-    plt.figure(figsize=(10, 6))
-    sns.boxplot(x='StateHoliday', y='Sales', data=df)
-    plt.title('Sales vs. State Holiday')
-    plt.savefig(os.path.join(DOCS_IMG_DIR, 'eda_sales_stateholiday.png'))
+def _render_sales_by_holiday(output_path, stats):
+    boxes = [stats.sales_by_holiday[label].box_stats(label) for label in sorted(stats.sales_by_holiday)]
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bxp(boxes, patch_artist=True, boxprops={'facecolor': '#4c72b0'}, medianprops={'color': 'white'},
+           flierprops={'marker': 'o', 'markersize': 4, 'markerfacecolor': 'none'})
+    ax.set_xlabel('StateHoliday')
+    ax.set_ylabel('Sales')
+    ax.set_title('Sales vs. State Holiday')
+    fig.savefig(output_path)
+    plt.close(fig)
+
+def _render_feature_importance(output_path, model_path):
+    model = load_model_bundle(model_path).booster
+    plt.figure(figsize=(12, 10))
+    xgb.plot_importance(model, max_num_features=20, height=0.8, ax=plt.gca())
+    plt.title('Feature Importance')
+    plt.tight_layout()
+    plt.savefig(output_path)
     plt.close()
 
-    # 3. Missing Values
-    missing_percentage = df.isnull().sum() / len(df) * 100
+def _render_metrics_breakdown(output_path, metrics):
+    breakdowns = [feature for feature in ('StoreType', 'DayOfWeek', 'Promo') if feature in metrics['breakdown']]
+    fig, axes = plt.subplots(1, len(breakdowns), figsize=(5 * len(breakdowns), 4), squeeze=False)
+    for ax, feature in zip(axes[0], breakdowns):
+        groups = metrics['breakdown'][feature]
+        ax.bar(list(groups), [m['rmspe'] for m in groups.values()], color='steelblue')
+        ax.set_title(f'Validation RMSPE by {feature}')
+    plt.tight_layout()
+    fig.savefig(output_path)
+    plt.close(fig)
+
+# --- Text reports ---
+def _write_eda_stats(stats, null_counts, num_rows):
+    null_counts = pd.Series(null_counts)
+    missing_percentage = null_counts / num_rows * 100
     missing_percentage = missing_percentage[missing_percentage > 0].sort_values(ascending=False)
-    
+
     with open(STATS_FILE, 'w') as f:
-        f.write(f"Dataset Shape: {df.shape}\n")
+        f.write(f"Dataset Shape: {(num_rows, len(null_counts))}\n")
         f.write("\nMissing Values (%):\n")
         f.write(missing_percentage.to_string())
         f.write("\n\nBasic Statistics (Sales):\n")
-        f.write(df['Sales'].describe().to_string())
-
-    print("EDA generation complete.")
-
-except Exception as e:
-    print(f"EDA Generation Failed: {e}")
-
-# --- MODEL PERFORMANCE PART ---
-print("Starting Model Evaluation...")
-try:
-    # Load Model
-    if os.path.exists(MODEL_PATH):
-        model = joblib.load(MODEL_PATH)
-        
-        # We need to recreate the features to generate importance plot
-        # Simplified feature engineering for the sake of getting column names if model doesn't store them well
-        # But XGBoost model usually stores feature names.
-        
-        plt.figure(figsize=(12, 10))
-        # Check if model is XGBClassifier/Regressor or Booster
-        if isinstance(model, xgb.XGBModel):
-            xgb.plot_importance(model, max_num_features=20, height=0.8)
-        else: # Try standard xgboost plot_importance
-            xgb.plot_importance(model, max_num_features=20, height=0.8)
-            
-        plt.title('Feature Importance')
-        plt.tight_layout()
-        plt.savefig(os.path.join(DOCS_IMG_DIR, 'model_feature_importance.png'))
-        plt.close()
-        
-        with open(MODEL_STATS_FILE, 'w') as f:
-            f.write(f"Model loaded from: {MODEL_PATH}\n")
-            f.write("Feature Importance plot generated.\n")
-            # Note: Calculating actual metrics requires recreating the exact test/val set which is complex 
-            # without the exact split logic. We will rely on generic info or if we can process a small sample.
-            
-    else:
-        print("Model file not found.")
-
-    print("Model evaluation complete.")
-
-except Exception as e:
-    print(f"Model Evaluation Failed: {e}")
+        f.write(stats.describe_sales().to_string())
+
+def _write_model_stats(metrics):
+    with open(MODEL_STATS_FILE, 'w') as f:
+        f.write(f"Model loaded from: {MODEL_PATH}\n")
+        f.write("Feature Importance plot generated.\n")
+        if metrics is None:
+            f.write("No validation metrics in the bundle; retrain the model to record them.\n")
+            return
+        f.write("\nValidation metrics:\n")
+        for name, value in metrics['overall'].items():
+            f.write(f"  {name}: {value}\n")
+        for feature, groups in metrics['breakdown'].items():
+            table = pd.DataFrame.from_dict(groups, orient='index')
+            if feature == 'Store':
+                table = table.sort_values('rmspe', ascending=False).head(10)
+                f.write("\nWorst 10 stores by RMSPE:\n")
+            else:
+                f.write(f"\nMetrics by {feature}:\n")
+            f.write(table.to_string(float_format='{:.4f}'.format) + "\n")
+
+# --- Input digests ---
+def _files_digest(*paths):
+    """Digest of the name, size and modification time of every file under paths."""
+    entries = []
+    for path in paths:
+        files = [path] if os.path.isfile(path) else sorted(
+            os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        for file_path in files:
+            stat = os.stat(file_path)
+            entries.append((os.path.relpath(file_path, BASE_DIR), stat.st_size, stat.st_mtime_ns))
+    return cache_key(entries)
+
+def _load_digests():
+    if not os.path.exists(REPORT_DIGESTS_PATH):
+        return {}
+    with open(REPORT_DIGESTS_PATH) as f:
+        return json.load(f)
+
+def _save_digests(digests):
+    os.makedirs(os.path.dirname(REPORT_DIGESTS_PATH), exist_ok=True)
+    with open(REPORT_DIGESTS_PATH, 'w') as f:
+        json.dump(digests, f, indent=2)
+
+def _stale_outputs(outputs, digest, digests):
+    """The outputs that are missing, were produced from other inputs or were changed since."""
+    stale = []
+    for output in outputs:
+        record = digests.get(os.path.relpath(output, BASE_DIR), {})
+        if (not os.path.exists(output) or record.get('inputs') != digest
+                or record.get('mtime_ns') != os.stat(output).st_mtime_ns):
+            stale.append(output)
+    return stale
+
+def _render_all(tasks, workers):
+    """Renders the figures in a process pool and returns the outputs that were written."""
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    done = []
+    if workers == 1:
+        for output, function, args in tasks:
+            try:
+                function(output, *args)
+                done.append(output)
+            except Exception as e:
+                print(f"Rendering {os.path.basename(output)} failed: {e}")
+        return done
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(function, output, *args): output for output, function, args in tasks}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                done.append(futures[future])
+            except Exception as e:
+                print(f"Rendering {os.path.basename(futures[future])} failed: {e}")
+    return done
+
+def generate_reports(force=False, workers=None, chunk_rows=REPORT_CHUNK_ROWS):
+    """
+    Regenerates the EDA and model reports under docs/.
+
+    The EDA statistics come from one chunked pass over the merged dataset
+    (or over train.csv joined with store.csv when it has not been merged),
+    so memory stays bounded by chunk_rows. The figures are rendered from
+    those aggregates in a process pool. Every output is skipped when the
+    digest of its inputs (data files, model bundle and report code) matches
+    the one it was last produced from.
+
+    Args:
+        force (bool): Regenerate every output regardless of the digests.
+        workers (int, optional): Rendering processes (default: CPU count).
+        chunk_rows (int): Rows per chunk of the statistics pass.
+    """
+    if not os.path.exists(DOCS_IMG_DIR):
+        os.makedirs(DOCS_IMG_DIR)
+    start = time.perf_counter()
+    digests = {} if force else _load_digests()
+    # Rapor kodu değişince tüm çıktılar yeniden üretilir
+    code_digest = cache_key(file_digest(os.path.abspath(__file__)), source_digest(eda_stats))
+    output_digests = {}
+    tasks = []
+
+    # --- EDA PART ---
+    print("Starting EDA generation...")
+    try:
+        merged_dataset_path = os.path.join(DATA_DIR, 'train_merged')
+        train_path = os.path.join(RAW_DATA_DIR, 'train.csv')
+        store_path = os.path.join(RAW_DATA_DIR, 'store.csv')
+        processed = os.path.exists(merged_dataset_path)
+        inputs = [merged_dataset_path] if processed else [train_path, store_path]
+        digest = cache_key(code_digest, _files_digest(*inputs), REPORT_SALES_BIN_WIDTH)
+        stale = _stale_outputs([STATS_FILE, SALES_DIST_IMAGE, SALES_HOLIDAY_IMAGE], digest, digests)
+        if not stale:
+            print("EDA outputs are up to date.")
+        else:
+            if processed:
+                # Eksik değerler Parquet istatistiklerinden gelir; veriden yalnızca gereken sütunlar okunur
+                chunks = iter_processed_chunks(merged_dataset_path, ['Sales', 'StateHoliday'], chunk_rows)
+                stats = collect_eda_stats(chunks, count_nulls=False, sales_bin_width=REPORT_SALES_BIN_WIDTH)
+                null_counts, num_rows = processed_null_counts(merged_dataset_path)
+            else:
+                # Fallback if processed not found: stream the raw files through the store join
+                chunks = iter_raw_merged_chunks(train_path, store_path, chunk_rows)
+                stats = collect_eda_stats(chunks, sales_bin_width=REPORT_SALES_BIN_WIDTH)
+                null_counts, num_rows = stats.null_counts, stats.rows
+            print(f"Collected statistics of {stats.rows} rows in {time.perf_counter() - start:.1f}s.")
+
+            if STATS_FILE in stale:
+                _write_eda_stats(stats, null_counts, num_rows)
+                output_digests[STATS_FILE] = digest
+            for output, render in ((SALES_DIST_IMAGE, _render_sales_distribution),
+                                   (SALES_HOLIDAY_IMAGE, _render_sales_by_holiday)):
+                if output in stale:
+                    tasks.append((output, render, (stats,)))
+                    output_digests[output] = digest
+        print("EDA generation complete.")
+
+    except Exception as e:
+        print(f"EDA Generation Failed: {e}")
+
+    # --- MODEL PERFORMANCE PART ---
+    print("Starting Model Evaluation...")
+    try:
+        if os.path.exists(MODEL_PATH):
+            digest = cache_key(code_digest, _files_digest(MODEL_PATH))
+            stale = _stale_outputs([MODEL_STATS_FILE, FEATURE_IMPORTANCE_IMAGE, METRICS_BREAKDOWN_IMAGE],
+                                   digest, digests)
+            # Doğrulama metrikleri eğitim sırasında pakete (metrics.json) yazılıyor
+            metrics = load_model_bundle(MODEL_PATH).metrics if stale else None
+            if MODEL_STATS_FILE in stale:
+                _write_model_stats(metrics)
+                output_digests[MODEL_STATS_FILE] = digest
+            if FEATURE_IMPORTANCE_IMAGE in stale:
+                tasks.append((FEATURE_IMPORTANCE_IMAGE, _render_feature_importance, (MODEL_PATH,)))
+                output_digests[FEATURE_IMPORTANCE_IMAGE] = digest
+            if METRICS_BREAKDOWN_IMAGE in stale and metrics is not None:
+                tasks.append((METRICS_BREAKDOWN_IMAGE, _render_metrics_breakdown, (metrics,)))
+                output_digests[METRICS_BREAKDOWN_IMAGE] = digest
+            if not stale:
+                print("Model outputs are up to date.")
+        else:
+            print("Model file not found.")
+
+        print("Model evaluation complete.")
+
+    except Exception as e:
+        print(f"Model Evaluation Failed: {e}")
+
+    if tasks:
+        print(f"Rendering {len(tasks)} figure(s)...")
+    rendered = set(_render_all(tasks, workers)) if tasks else set()
+    # Yalnızca başarıyla üretilen çıktıların özeti kaydedilir
+    for output, digest in output_digests.items():
+        if output.endswith('.png') and output not in rendered:
+            continue
+        digests[os.path.relpath(output, BASE_DIR)] = {'inputs': digest, 'mtime_ns': os.stat(output).st_mtime_ns}
+    _save_digests(digests)
+    print(f"Reports finished in {time.perf_counter() - start:.1f}s.")
+
+if __name__ == '__main__':
+    # Örnek kullanım:
+    # python generate_reports_script.py             # yalnızca girdisi değişen raporları üret
+    # python generate_reports_script.py --force     # tüm raporları yeniden üret
+    parser = argparse.ArgumentParser(description="Generates the EDA and model reports under docs/.")
+    parser.add_argument('--force', action='store_true', help="Regenerate every output regardless of the digests.")
+    parser.add_argument('--workers', type=int, default=None, help="Rendering processes (default: CPU count).")
+    parser.add_argument('--chunk-rows', type=int, default=REPORT_CHUNK_ROWS,
+                        help="Rows per chunk of the statistics pass.")
+    args = parser.parse_args()
+    generate_reports(args.force, args.workers, args.chunk_rows)
@@ -0,0 +1,226 @@
+# Kayan başlangıçlı (rolling-origin) zaman serisi çapraz doğrulaması
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from config import FEATURES, TARGET, XGB_PARAMS, VALIDATION_WEEKS, HISTORY_MIN_LAG_DAYS
+from model import train_booster
+from pipeline import load_training_rows, load_params_file
+
+# Her katın kutu sınırları (histogram cut'ları) yalnızca kendi eğitim satırlarından hesaplanır
+MAX_BIN = 256
+
+# Process pool modunda her işçinin bir kez açtığı veri
+_worker_state = {}
+
+def make_folds(dates, n_folds, horizon_weeks=VALIDATION_WEEKS, window='expanding', train_weeks=None):
+    """
+    Defines rolling-origin folds as row ranges over date-sorted rows. The last
+    fold validates on the same final horizon as the pipeline's holdout; each
+    earlier fold moves the origin back by one horizon.
+
+    Args:
+        dates (np.ndarray): The sorted datetime64 dates of the rows.
+        n_folds (int): Number of origins.
+        horizon_weeks (int): Length of each validation window.
+        window (str): 'expanding' trains on everything before the origin,
+            'rolling' on the train_weeks before it.
+        train_weeks (int, optional): Training window length for 'rolling'.
+
+    Returns:
+        list: One dict per fold with 'origin' and the 'train' and 'val' (start, end) row ranges.
+
+    Raises:
+        ValueError: If the horizon is longer than HISTORY_MIN_LAG_DAYS, since the
+            history features of its last validation days would then use sales
+            after the origin.
+    """
+    if window == 'rolling' and not train_weeks:
+        raise ValueError("A rolling window needs train_weeks.")
+    if 7 * horizon_weeks > HISTORY_MIN_LAG_DAYS:
+        raise ValueError(f"A {horizon_weeks}-week horizon is longer than the {HISTORY_MIN_LAG_DAYS}-day minimum lag "
+                         f"of the history features; use at most {HISTORY_MIN_LAG_DAYS // 7} weeks.")
+    horizon = np.timedelta64(7 * horizon_weeks, 'D')
+    last_origin = dates[-1] - horizon
+    origins = [last_origin - (n_folds - 1 - k) * horizon for k in range(n_folds)]
+    boundaries = list(np.searchsorted(dates, origins, side='left')) + [len(dates)]
+
+    folds = []
+    for k, origin in enumerate(origins):
+        if window == 'rolling':
+            train_start = int(np.searchsorted(dates, origin - np.timedelta64(7 * train_weeks, 'D'), side='left'))
+        else:
+            train_start = 0
+        train_end, val_end = int(boundaries[k]), int(boundaries[k + 1])
+        if train_end - train_start == 0 or val_end - train_end == 0:
+            raise ValueError(f"Fold {k} at origin {pd.Timestamp(origin).date()} has no training or validation rows; "
+                             "use fewer folds or a shorter horizon.")
+        folds.append({'fold': k, 'origin': pd.Timestamp(origin),
+                      'train': (train_start, train_end), 'val': (train_end, val_end)})
+    return folds
+
+def _save_arrays(data_dir, X, y):
+    np.save(os.path.join(data_dir, 'X.npy'), np.ascontiguousarray(X, dtype=np.float32))
+    np.save(os.path.join(data_dir, 'y.npy'), np.ascontiguousarray(y, dtype=np.float32))
+
+def _init_worker(data_dir, nthread):
+    X = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r')
+    _worker_state.update(X=X, y=y, nthread=nthread)
+
+def _fold_matrix(start, end, reference=None):
+    state = _worker_state
+    return xgb.QuantileDMatrix(state['X'][start:end], label=state['y'][start:end], ref=reference,
+                               max_bin=MAX_BIN, feature_names=FEATURES, nthread=state['nthread'])
+
+def _run_fold(fold, params):
+    start = time.perf_counter()
+    # Kutu sınırları katın eğitim satırlarından çıkarılır; başlangıçtan sonraki satırlar onlara sızmaz
+    dtrain = _fold_matrix(*fold['train'])
+    # Validasyon satırları eğitim matrisinin kutularına yerleştirilir
+    dval = _fold_matrix(*fold['val'], dtrain)
+    params = {**params, 'max_bin': MAX_BIN, 'nthread': _worker_state['nthread']}
+    booster = train_booster(dtrain, dval, params, verbose_eval=False)
+    return {
+        'fold': fold['fold'],
+        'origin': fold['origin'],
+        'train_rows': fold['train'][1] - fold['train'][0],
+        'val_rows': fold['val'][1] - fold['val'][0],
+        'rmspe': float(booster.best_score),
+        'best_iteration': int(booster.best_iteration),
+        'seconds': time.perf_counter() - start,
+    }
+
+def run_backtest(df, n_folds=4, horizon_weeks=VALIDATION_WEEKS, window='expanding', train_weeks=None,
+                 params=None, workers=None):
+    """
+    Trains and scores one model per fold, in parallel across processes.
+
+    Args:
+        df (pd.DataFrame): Encoded training rows with 'Date', FEATURES and TARGET
+            (see pipeline.load_training_rows).
+        n_folds, horizon_weeks, window, train_weeks: See make_folds.
+        params (dict, optional): XGBoost parameters. Defaults to XGB_PARAMS.
+        workers (int, optional): Processes. Defaults to min(CPU count, n_folds);
+            each worker gets cpu_count // workers XGBoost threads.
+
+    Returns:
+        pd.DataFrame: One row per fold with its origin, sizes, RMSPE and time.
+    """
+    params = params or XGB_PARAMS
+    # Tarihe göre tek bir sıralama; katlar bu sıranın satır aralıklarıdır
+    order = np.argsort(df['Date'].to_numpy(), kind='stable')
+    dates = df['Date'].to_numpy()[order]
+    folds = make_folds(dates, n_folds, horizon_weeks, window, train_weeks)
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(workers or cpu_count, n_folds))
+    nthread = max(1, cpu_count // workers)
+
+    data_dir = tempfile.mkdtemp(prefix='rossmann-backtest-')
+    try:
+        _save_arrays(data_dir, df[FEATURES].to_numpy(dtype=np.float32)[order],
+                     df[TARGET].to_numpy(dtype=np.float32)[order])
+        if workers > 1:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data_dir, nthread)) as pool:
+                results = list(pool.map(_run_fold, folds, [params] * len(folds)))
+        else:
+            _init_worker(data_dir, nthread)
+            results = [_run_fold(fold, params) for fold in folds]
+            _worker_state.clear()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return pd.DataFrame(results)
+
+def summarize_folds(results):
+    """Aggregate RMSPE over the folds: mean, standard deviation, min and max."""
+    return {
+        'folds': len(results),
+        'mean_rmspe': float(results['rmspe'].mean()),
+        'std_rmspe': float(results['rmspe'].std(ddof=0)),
+        'min_rmspe': float(results['rmspe'].min()),
+        'max_rmspe': float(results['rmspe'].max()),
+    }
+
+def _independent_runs(df, folds_by_date, params):
+    """
+    Baseline for the benchmark: each fold the way run_training_pipeline builds
+    its holdout, by slicing the pandas frame and building DMatrix objects from it.
+    """
+    for origin, val_end, train_start in folds_by_date:
+        train_mask = (df['Date'] >= train_start) & (df['Date'] < origin)
+        val_mask = (df['Date'] >= origin) & (df['Date'] <= val_end)
+        X_train, y_train = df[train_mask][FEATURES], df[train_mask][TARGET]
+        X_val, y_val = df[val_mask][FEATURES], df[val_mask][TARGET]
+        dtrain = xgb.DMatrix(X_train, label=y_train)
+        dval = xgb.DMatrix(X_val, label=y_val)
+        train_booster(dtrain, dval, params, verbose_eval=False)
+
+def benchmark(df, n_folds=4, horizon_weeks=VALIDATION_WEEKS, window='expanding', train_weeks=None,
+              params=None, workers=None):
+    """Times run_backtest against n_folds independent pipeline-style runs over the same folds."""
+    params = params or XGB_PARAMS
+    start = time.perf_counter()
+    results = run_backtest(df, n_folds, horizon_weeks, window, train_weeks, params, workers)
+    engine_seconds = time.perf_counter() - start
+
+    dates = np.sort(df['Date'].to_numpy())
+    folds = make_folds(dates, n_folds, horizon_weeks, window, train_weeks)
+    folds_by_date = [
+        (fold['origin'], pd.Timestamp(dates[fold['val'][1] - 1]), pd.Timestamp(dates[fold['train'][0]]))
+        for fold in folds
+    ]
+    start = time.perf_counter()
+    _independent_runs(df, folds_by_date, params)
+    baseline_seconds = time.perf_counter() - start
+    return results, {'engine_seconds': engine_seconds, 'independent_seconds': baseline_seconds,
+                     'speedup': baseline_seconds / engine_seconds}
+
+def _print_results(results, summary):
+    print(f"{'fold':>4} {'origin':>10} {'train rows':>10} {'val rows':>9} {'RMSPE':>7} {'best it':>7} {'time':>7}")
+    for r in results.itertuples():
+        print(f"{r.fold:>4} {r.origin.date()!s:>10} {r.train_rows:>10} {r.val_rows:>9} "
+              f"{r.rmspe:>7.4f} {r.best_iteration:>7} {r.seconds:>6.1f}s")
+    print(f"RMSPE over {summary['folds']} folds: {summary['mean_rmspe']:.4f} ± {summary['std_rmspe']:.4f} "
+          f"(min {summary['min_rmspe']:.4f}, max {summary['max_rmspe']:.4f})")
+
+if __name__ == '__main__':
+    # Örnek kullanım:
+    # python src/backtest.py --folds 4
+    # python src/backtest.py --folds 6 --window rolling --train-weeks 52 --workers 3
+    # python src/backtest.py --folds 4 --benchmark
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the sales model.")
+    parser.add_argument('--folds', type=int, default=4, help="Number of origins.")
+    parser.add_argument('--horizon-weeks', type=int, default=VALIDATION_WEEKS,
+                        help=f"Validation window per fold (at most {HISTORY_MIN_LAG_DAYS // 7} weeks).")
+    parser.add_argument('--window', choices=['expanding', 'rolling'], default='expanding')
+    parser.add_argument('--train-weeks', type=int, help="Training window for --window rolling.")
+    parser.add_argument('--workers', type=int, default=None, help="Processes (default: CPU count).")
+    parser.add_argument('--params', metavar='PATH', help="JSON file of XGBoost parameters (default: XGB_PARAMS).")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Also time the same folds as independent pipeline-style runs.")
+    args = parser.parse_args()
+    # Veri yüklenmeden önce reddedilir (bkz. make_folds)
+    if 7 * args.horizon_weeks > HISTORY_MIN_LAG_DAYS:
+        parser.error(f"--horizon-weeks must be at most {HISTORY_MIN_LAG_DAYS // 7}: longer horizons see "
+                     f"sales after the origin through the {HISTORY_MIN_LAG_DAYS}-day history lags.")
+
+    training_rows, _ = load_training_rows()
+    if training_rows is not None:
+        fold_args = (training_rows, args.folds, args.horizon_weeks, args.window, args.train_weeks,
+                     load_params_file(args.params) if args.params else None, args.workers)
+        if args.benchmark:
+            fold_results, timings = benchmark(*fold_args)
+        else:
+            fold_results = run_backtest(*fold_args)
+        _print_results(fold_results, summarize_folds(fold_results))
+        if args.benchmark:
+            print(f"\nBacktest engine: {timings['engine_seconds']:.1f}s, "
+                  f"independent runs: {timings['independent_seconds']:.1f}s "
+                  f"({timings['speedup']:.2f}x)")
@@ -0,0 +1,588 @@
+# Sentetik veri üzerinde pipeline aşamalarının süre/bellek ölçümü ve referansla karşılaştırma
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from config import (
+    FEATURES, TRAIN_COLUMNS, XGB_PARAMS, MERGE_MEMORY_LIMIT_MB, SYNTHETIC_SEED,
+    BENCHMARK_PATH, BENCHMARK_ROWS, BENCHMARK_BOOST_ROUNDS,
+    BENCHMARK_TIME_THRESHOLD, BENCHMARK_MEMORY_THRESHOLD, EXTERNAL_MEMORY_BATCH_ROWS
+)
+from data_prep import merge_data
+from external_memory import EXTERNAL_MEMORY_MODES, build_external_matrices
+from features import engineer_features, build_feature_matrix
+from history import build_history_state
+from inference import predict_sales
+from memory import PeakRssSampler
+from metrics import rmspe_score
+from model import train_booster, save_model_bundle, load_model_bundle
+from parallel_prep import run_parallel_preprocessing
+from pipeline import _encode_categorical_features, _split_train_validation, _validation_start
+from storage import load_processed_data
+from store_index import build_store_index
+from synthetic import generate_dataset
+
+# Uygulamadaki tek satırlık tahmin yolunun kaç kez ölçüleceği
+SINGLE_ROW_CALLS = 200
+# Çok kısa aşamalardaki gürültü gerileme sayılmasın diye mutlak alt sınırlar
+# (süre için aşamanın toplam süresindeki artış; tek satırlık yolda çağrı başı süre x çağrı sayısı)
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 10
+
+def _environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'xgboost': xgb.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def _time_single_row(bundle, rows, calls):
+    """Times the app's one-row prediction (feature matrix + booster call) and returns per-call seconds."""
+    timings = np.empty(calls)
+    for i in range(calls):
+        row = rows.iloc[[i % len(rows)]]
+        start = time.perf_counter()
+        X = build_feature_matrix(row, bundle.store_index, bundle.encoders, bundle.features, bundle.history)
+        bundle.predict(X)
+        timings[i] = time.perf_counter() - start
+    return timings
+
+def run_benchmark(rows=BENCHMARK_ROWS, seed=SYNTHETIC_SEED, boost_rounds=BENCHMARK_BOOST_ROUNDS,
+                  single_row_calls=SINGLE_ROW_CALLS):
+    """
+    Generates a synthetic dataset and runs the pipeline stages on it one by
+    one, recording the wall time and the peak RSS of each stage.
+
+    Args:
+        rows (int): Synthetic train rows.
+        seed (int): Generator seed.
+        boost_rounds (int): Boosting rounds of the training stage (no early stopping).
+        single_row_calls (int): Calls of the single-row prediction path to time.
+
+    Returns:
+        dict: {'stages': {stage: {'seconds': ..., 'peak_rss_mb': ...}}}. The
+        'app_single_row' stage reports the median call time as 'seconds' and
+        the 99th percentile as 'p99_seconds'.
+    """
+    work_dir = tempfile.mkdtemp(prefix='rossmann-benchmark-')
+    raw_dir = os.path.join(work_dir, 'raw')
+    processed_dir = os.path.join(work_dir, 'processed')
+    bundle_path = os.path.join(work_dir, 'model')
+    stages = {}
+
+    def measure(name, function):
+        with PeakRssSampler() as sampler:
+            start = time.perf_counter()
+            result = function()
+            seconds = time.perf_counter() - start
+        stages[name] = {'seconds': seconds, 'peak_rss_mb': sampler.peak_mb}
+        return result
+
+    try:
+        measure('generate', lambda: generate_dataset(raw_dir, rows, seed=seed))
+        measure('merge', lambda: merge_data(raw_dir, processed_dir, memory_limit_mb=MERGE_MEMORY_LIMIT_MB))
+        df = measure('load', lambda: load_processed_data(
+            os.path.join(processed_dir, 'train_merged'), columns=TRAIN_COLUMNS))
+        imputation = {'CompetitionDistance': float(df['CompetitionDistance'].median())}
+        history_state = build_history_state(df)
+        df = measure('features', lambda: engineer_features(df, verbose=False))
+        df, encoders = measure('encode', lambda: _encode_categorical_features(df))
+        X_train, y_train, X_val, y_val = measure('split', lambda: _split_train_validation(df))
+        dtrain, dval = measure('dmatrix', lambda: (xgb.DMatrix(X_train, label=y_train),
+                                                    xgb.DMatrix(X_val, label=y_val)))
+        model = measure('train', lambda: train_booster(
+            dtrain, dval, XGB_PARAMS, num_boost_round=boost_rounds,
+            early_stopping_rounds=boost_rounds, verbose_eval=False))
+
+        store_index = build_store_index(
+            pd.read_csv(os.path.join(raw_dir, 'store.csv')),
+            competition_distance_fill=imputation['CompetitionDistance'], category_classes=encoders
+        )
+        measure('save_bundle', lambda: save_model_bundle(
+            model, bundle_path, FEATURES, encoders, imputation, store_index=store_index, history=history_state))
+        bundle = measure('load_bundle', lambda: load_model_bundle(bundle_path))
+
+        test_rows = pd.read_csv(os.path.join(raw_dir, 'test.csv'), dtype={'StateHoliday': str})
+        measure('predict_batch', lambda: predict_sales(bundle, test_rows, bundle.store_index))
+        timings = measure('app_single_row', lambda: _time_single_row(bundle, test_rows, single_row_calls))
+        stages['app_single_row'].update({
+            'seconds': float(np.median(timings)),
+            'p99_seconds': float(np.percentile(timings, 99)),
+            'calls': single_row_calls,
+        })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {'stages': stages}
+
+def _best_of(runs):
+    """Keeps the fastest time and the lowest peak of each stage over repeated runs."""
+    best = {}
+    for run in runs:
+        for stage, metrics in run['stages'].items():
+            if stage not in best:
+                best[stage] = dict(metrics)
+                continue
+            for metric, value in metrics.items():
+                if value is not None and (best[stage][metric] is None or value < best[stage][metric]):
+                    best[stage][metric] = value
+    return best
+
+def benchmark(rows=BENCHMARK_ROWS, seed=SYNTHETIC_SEED, repeat=3, boost_rounds=BENCHMARK_BOOST_ROUNDS):
+    """Runs the benchmark repeat times and returns the best result of each stage with the environment."""
+    runs = []
+    for i in range(repeat):
+        print(f"Benchmark run {i + 1}/{repeat} ({rows} rows)...")
+        runs.append(run_benchmark(rows, seed, boost_rounds))
+    return {
+        'rows': rows,
+        'seed': seed,
+        'boost_rounds': boost_rounds,
+        'repeat': repeat,
+        'created': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'environment': _environment(),
+        'stages': _best_of(runs),
+    }
+
+def default_baseline_path(rows):
+    """Baselines are kept per scale: benchmarks/baseline_<rows>.json."""
+    return os.path.join(BENCHMARK_PATH, f'baseline_{rows}.json')
+
+def compare_results(current, baseline, time_threshold=BENCHMARK_TIME_THRESHOLD,
+                    memory_threshold=BENCHMARK_MEMORY_THRESHOLD):
+    """
+    Compares a benchmark result with a baseline and prints one line per stage.
+
+    Args:
+        current (dict): Result of benchmark().
+        baseline (dict): A saved result of benchmark() at the same scale.
+        time_threshold (float): Relative slowdown counted as a regression.
+        memory_threshold (float): Relative peak RSS growth counted as a regression.
+
+    Returns:
+        list: (stage, metric, baseline value, current value) of every regression.
+    """
+    if current['rows'] != baseline['rows'] or current['boost_rounds'] != baseline['boost_rounds']:
+        raise ValueError("The baseline was recorded with different rows or boost rounds.")
+    changed = {key: (value, current['environment'].get(key))
+               for key, value in baseline.get('environment', {}).items()
+               if current['environment'].get(key) != value}
+    if changed:
+        print(f"Warning: environment differs from the baseline: {changed}")
+
+    checks = (('seconds', time_threshold, MIN_SECONDS_DELTA),
+              ('peak_rss_mb', memory_threshold, MIN_MEMORY_DELTA_MB))
+    regressions = []
+    print(f"\n{'stage':<16}{'metric':<13}{'baseline':>12}{'current':>12}{'change':>9}")
+    for stage, metrics in current['stages'].items():
+        baseline_metrics = baseline['stages'].get(stage, {})
+        for metric, threshold, min_delta in checks:
+            old, new = baseline_metrics.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            scale = metrics.get('calls', 1) if metric == 'seconds' else 1
+            regressed = change > threshold and (new - old) * scale > min_delta
+            if regressed:
+                regressions.append((stage, metric, old, new))
+            print(f"{stage:<16}{metric:<13}{old:>12.4f}{new:>12.4f}{change:>+9.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def _train_scaling_run(mode, work_dir, boost_rounds, batch_rows):
+    """
+    Trains on the processed data of work_dir in memory (mode None, as the
+    pipeline does) or streamed (an EXTERNAL_MEMORY_MODES mode) and returns
+    the wall time, the peak RSS and the validation RMSPE.
+    """
+    dataset_path = os.path.join(work_dir, 'processed', 'train_merged')
+    with PeakRssSampler() as sampler:
+        start = time.perf_counter()
+        if mode is None:
+            df = load_processed_data(dataset_path, columns=TRAIN_COLUMNS)
+            df = engineer_features(df, verbose=False, history_cutoff=_validation_start(df) - pd.Timedelta(days=1))
+            df, _ = _encode_categorical_features(df)
+            X_train, y_train, X_val, y_val = _split_train_validation(df)
+            del df
+            dtrain, dval = xgb.DMatrix(X_train, label=y_train), xgb.DMatrix(X_val, label=y_val)
+            del X_train, X_val
+        else:
+            dtrain, dval, _ = build_external_matrices(
+                dataset_path, pd.read_csv(os.path.join(work_dir, 'raw', 'store.csv')), mode, batch_rows,
+                cache_path=os.path.join(work_dir, 'external_memory'))
+        model = train_booster(dtrain, dval, {**XGB_PARAMS, 'tree_method': 'hist'}, num_boost_round=boost_rounds,
+                              early_stopping_rounds=boost_rounds, verbose_eval=False)
+        seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'peak_rss_mb': sampler.peak_mb, 'train_rows': dtrain.num_row(),
+            'rmspe': float(rmspe_score(dval.get_label(), model.predict(dval)))}
+
+def run_scaling_benchmark(row_counts, seed=SYNTHETIC_SEED, boost_rounds=BENCHMARK_BOOST_ROUNDS,
+                          batch_rows=EXTERNAL_MEMORY_BATCH_ROWS):
+    """
+    Compares in-memory training with the external memory modes over data
+    scales. Every run trains in a fresh process, so its peak RSS is its own.
+
+    Args:
+        row_counts (list): Synthetic train rows of each scale.
+        seed (int): Generator seed.
+        boost_rounds (int): Boosting rounds (no early stopping).
+        batch_rows (int): Rows per batch of the external memory modes.
+
+    Returns:
+        list: One record per scale and mode with 'seconds', 'peak_rss_mb',
+        'train_rows' and the validation 'rmspe'.
+    """
+    results = []
+    for rows in row_counts:
+        work_dir = tempfile.mkdtemp(prefix='rossmann-scaling-')
+        try:
+            generate_dataset(os.path.join(work_dir, 'raw'), rows, seed=seed)
+            merge_data(os.path.join(work_dir, 'raw'), os.path.join(work_dir, 'processed'),
+                       memory_limit_mb=MERGE_MEMORY_LIMIT_MB)
+            for mode in [None] + EXTERNAL_MEMORY_MODES:
+                print(f"Scaling run: {rows} rows, {mode or 'in_memory'}...")
+                # 'spawn' ile her ölçüm boş bir süreçte başlar
+                with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                    run = pool.submit(_train_scaling_run, mode, work_dir, boost_rounds, batch_rows).result()
+                results.append({'rows': rows, 'mode': mode or 'in_memory', **run})
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def _prep_run(workers, work_dir):
+    """
+    Runs steps 1-4 on the raw data of work_dir: serially as the pipeline
+    does (workers None) or with run_parallel_preprocessing.
+    """
+    raw_dir = os.path.join(work_dir, 'raw')
+    with PeakRssSampler() as sampler:
+        start = time.perf_counter()
+        if workers is None:
+            merge_data(raw_dir, os.path.join(work_dir, 'serial'), memory_limit_mb=MERGE_MEMORY_LIMIT_MB)
+            df = load_processed_data(os.path.join(work_dir, 'serial', 'train_merged'), columns=TRAIN_COLUMNS)
+            df = engineer_features(df, verbose=False, history_cutoff=_validation_start(df) - pd.Timedelta(days=1))
+            df, _ = _encode_categorical_features(df)
+        else:
+            df, _ = run_parallel_preprocessing(raw_dir, os.path.join(work_dir, f'parallel_{workers}'), workers)
+        seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'peak_rss_mb': sampler.peak_mb, 'rows': len(df)}
+
+def run_prep_scaling_benchmark(rows, worker_counts, seed=SYNTHETIC_SEED):
+    """
+    Times steps 1-4 (merge, load, feature engineering, encoding) serially
+    and with each number of parallel_prep workers on one synthetic dataset.
+    Every run starts in a fresh process; the peak RSS is the parent's only.
+
+    Args:
+        rows (int): Synthetic train rows.
+        worker_counts (list): Worker counts of the parallel runs.
+        seed (int): Generator seed.
+
+    Returns:
+        list: One record per run with 'workers' (None for serial), 'seconds',
+        'speedup' over the serial run and 'peak_rss_mb'.
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='rossmann-prep-scaling-')
+    try:
+        generate_dataset(os.path.join(work_dir, 'raw'), rows, seed=seed)
+        for workers in [None] + list(worker_counts):
+            print(f"Preprocessing run: {rows} rows, {workers or 'serial'}...")
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                run = pool.submit(_prep_run, workers, work_dir).result()
+            results.append({'workers': workers, **run})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    for record in results:
+        record['speedup'] = results[0]['seconds'] / record['seconds']
+    return results
+
+# Birleştirilmiş verinin okunma biçimleri: eski CSV ve Parquet (tam, sütun seçimli, yalnızca validasyon dönemi)
+LOAD_SOURCES = ['csv', 'parquet', 'parquet_columns', 'parquet_validation']
+
+def _directory_size_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1024 ** 2
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(path) for name in files) / 1024 ** 2
+
+def _load_run(source, work_dir, validation_start):
+    """Loads the merged data of work_dir the way source names and returns the time, peak RSS and rows."""
+    dataset_path = os.path.join(work_dir, 'processed', 'train_merged')
+    with PeakRssSampler() as sampler:
+        start = time.perf_counter()
+        if source == 'csv':
+            # Eski pipeline'ın train_merged.csv okuması
+            df = pd.read_csv(os.path.join(work_dir, 'train_merged.csv'), low_memory=False)
+        elif source == 'parquet':
+            df = load_processed_data(dataset_path)
+        elif source == 'parquet_columns':
+            df = load_processed_data(dataset_path, columns=TRAIN_COLUMNS)
+        else:
+            df = load_processed_data(dataset_path, columns=TRAIN_COLUMNS, start_date=validation_start)
+        seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'peak_rss_mb': sampler.peak_mb, 'rows': len(df)}
+
+def run_load_benchmark(rows, seed=SYNTHETIC_SEED, repeat=3):
+    """
+    Compares loading the merged training data from the former
+    train_merged.csv with the partitioned Parquet dataset: all columns, the
+    pipeline's TRAIN_COLUMNS, and only the validation period. Every run
+    loads in a fresh process, so its peak RSS is its own.
+
+    Args:
+        rows (int): Synthetic train rows.
+        seed (int): Generator seed.
+        repeat (int): Runs of each source; the best time and peak are kept.
+
+    Returns:
+        list: One record per source with 'seconds', 'peak_rss_mb', 'rows'
+        and the on-disk 'size_mb'.
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='rossmann-load-')
+    try:
+        generate_dataset(os.path.join(work_dir, 'raw'), rows, seed=seed)
+        merge_data(os.path.join(work_dir, 'raw'), os.path.join(work_dir, 'processed'),
+                   memory_limit_mb=MERGE_MEMORY_LIMIT_MB)
+        dataset_path = os.path.join(work_dir, 'processed', 'train_merged')
+        merged = load_processed_data(dataset_path)
+        merged.to_csv(os.path.join(work_dir, 'train_merged.csv'), index=False)
+        validation_start = _validation_start(merged)
+        del merged
+        for source in LOAD_SOURCES:
+            print(f"Load run: {rows} rows, {source}...")
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                    runs.append(pool.submit(_load_run, source, work_dir, validation_start).result())
+            path = os.path.join(work_dir, 'train_merged.csv') if source == 'csv' else dataset_path
+            results.append({'source': source, 'rows': runs[0]['rows'],
+                            'seconds': min(run['seconds'] for run in runs),
+                            'peak_rss_mb': min(run['peak_rss_mb'] for run in runs),
+                            'size_mb': _directory_size_mb(path)})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def _startup_timings(function, runs):
+    timings = np.empty(runs)
+    for i in range(runs):
+        start = time.perf_counter()
+        function()
+        timings[i] = time.perf_counter() - start
+    return timings
+
+def run_startup_benchmark(rows=BENCHMARK_ROWS, seed=SYNTHETIC_SEED, boost_rounds=BENCHMARK_BOOST_ROUNDS, runs=20):
+    """
+    Compares the startup of the app's model: the former joblib pickle with
+    the store index rebuilt from store.csv, the model bundle (manifest,
+    booster, memory-mapped store index and history), and opening only the
+    bundle's manifest. Each is timed alone and followed by the first
+    one-row prediction, with new objects every run.
+
+    Args:
+        rows (int): Synthetic train rows of the trained model.
+        seed (int): Generator seed.
+        boost_rounds (int): Boosting rounds of the model.
+        runs (int): Timed runs of each path.
+
+    Returns:
+        dict: {path: {'open_ms': ..., 'first_predict_ms': ...}} (means over the runs).
+    """
+    work_dir = tempfile.mkdtemp(prefix='rossmann-startup-')
+    raw_dir = os.path.join(work_dir, 'raw')
+    pickle_path = os.path.join(work_dir, 'xgb_sales_model.pkl')
+    bundle_path = os.path.join(work_dir, 'model')
+    try:
+        generate_dataset(raw_dir, rows, seed=seed)
+        merge_data(raw_dir, os.path.join(work_dir, 'processed'), memory_limit_mb=MERGE_MEMORY_LIMIT_MB)
+        df = load_processed_data(os.path.join(work_dir, 'processed', 'train_merged'), columns=TRAIN_COLUMNS)
+        imputation = {'CompetitionDistance': float(df['CompetitionDistance'].median())}
+        history_state = build_history_state(df)
+        df = engineer_features(df, verbose=False, history_cutoff=_validation_start(df) - pd.Timedelta(days=1))
+        df, encoders = _encode_categorical_features(df)
+        X_train, y_train, X_val, y_val = _split_train_validation(df)
+        del df
+        model = train_booster(xgb.DMatrix(X_train, label=y_train), xgb.DMatrix(X_val, label=y_val), XGB_PARAMS,
+                              num_boost_round=boost_rounds, early_stopping_rounds=boost_rounds, verbose_eval=False)
+        store_path = os.path.join(raw_dir, 'store.csv')
+        store_index = build_store_index(pd.read_csv(store_path), imputation['CompetitionDistance'],
+                                        category_classes=encoders)
+        joblib.dump(model, pickle_path)
+        save_model_bundle(model, bundle_path, FEATURES, encoders, imputation, store_index=store_index,
+                          history=history_state)
+        row = pd.read_csv(os.path.join(raw_dir, 'test.csv'), dtype={'StateHoliday': str}).iloc[[0]]
+
+        # Eski yol: pickle + store.csv'den indeks; geçmiş durumu ona bellekte hazır verilir
+        def open_pickle():
+            booster = joblib.load(pickle_path)
+            index = build_store_index(pd.read_csv(store_path), imputation['CompetitionDistance'],
+                                      category_classes=encoders)
+            return booster, index
+
+        def pickle_first_predict():
+            booster, index = open_pickle()
+            booster.inplace_predict(build_feature_matrix(row, index, encoders, FEATURES, history_state))
+
+        def open_bundle():
+            bundle = load_model_bundle(bundle_path)
+            bundle.booster, bundle.store_index, bundle.history
+            return bundle
+
+        def bundle_first_predict():
+            bundle = open_bundle()
+            bundle.predict(build_feature_matrix(row, bundle.store_index, bundle.encoders, bundle.features,
+                                                bundle.history))
+
+        paths = {
+            'joblib + store.csv': (open_pickle, pickle_first_predict),
+            'bundle': (open_bundle, bundle_first_predict),
+            'bundle manifest only': (lambda: load_model_bundle(bundle_path), None),
+        }
+        results = {}
+        for name, (open_function, predict_function) in paths.items():
+            open_function()  # dosyalar işletim sistemi önbelleğine alınır
+            results[name] = {
+                'open_ms': float(_startup_timings(open_function, runs).mean() * 1000),
+                'first_predict_ms': (None if predict_function is None
+                                     else float(_startup_timings(predict_function, runs).mean() * 1000)),
+            }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def print_startup_results(results):
+    print(f"\n{'path':<24}{'open':>10}{'+ first predict':>18}")
+    for name, record in results.items():
+        first = record['first_predict_ms']
+        print(f"{name:<24}{record['open_ms']:>7.2f} ms{'n/a' if first is None else f'{first:.2f} ms':>18}")
+
+def print_load_results(results):
+    print(f"\n{'source':<20}{'rows':>10}{'seconds':>10}{'peak RSS':>12}{'on disk':>11}")
+    for record in results:
+        print(f"{record['source']:<20}{record['rows']:>10}{record['seconds']:>10.2f}"
+              f"{record['peak_rss_mb']:>9,.0f} MB{record['size_mb']:>8,.1f} MB")
+
+def print_prep_scaling_results(results):
+    print(f"\n{'workers':>8}{'seconds':>10}{'speedup':>9}{'peak RSS':>12}")
+    for record in results:
+        print(f"{record['workers'] or 'serial':>8}{record['seconds']:>10.2f}{record['speedup']:>8.2f}x"
+              f"{record['peak_rss_mb']:>9,.0f} MB")
+
+def print_scaling_results(results):
+    print(f"\n{'rows':>10}  {'mode':<10}{'seconds':>10}{'peak RSS':>12}{'RMSPE':>9}")
+    for record in results:
+        print(f"{record['rows']:>10}  {record['mode']:<10}{record['seconds']:>10.1f}"
+              f"{record['peak_rss_mb']:>9,.0f} MB{record['rmspe']:>9.4f}")
+
+def print_results(result):
+    print(f"\n{'stage':<16}{'seconds':>10}{'peak RSS':>12}")
+    for stage, metrics in result['stages'].items():
+        peak = metrics['peak_rss_mb']
+        peak = 'n/a' if peak is None else f"{peak:,.0f} MB"
+        print(f"{stage:<16}{metrics['seconds']:>10.4f}{peak:>12}")
+
+if __name__ == '__main__':
+    # Örnek kullanım:
+    # python src/benchmark.py --save-baseline          # referansı kaydet
+    # python src/benchmark.py                          # referansla karşılaştır (gerilemede çıkış kodu 1)
+    # python src/benchmark.py --rows 5000000 --repeat 3 --output results.json
+    # python src/benchmark.py --scaling 1000000 2000000 4000000   # bellek içi / dış bellek eğitimi
+    # python src/benchmark.py --prep-scaling 1 2 4 8 16 32 --rows 20000000   # paralel ön işleme
+    # python src/benchmark.py --load --rows 1000000   # eski CSV ile Parquet okuma karşılaştırması
+    # python src/benchmark.py --startup                # joblib pickle ile model paketinin açılış süresi
+    parser = argparse.ArgumentParser(description="Pipeline performance benchmark on synthetic data.")
+    parser.add_argument('--rows', type=int, default=BENCHMARK_ROWS, help="Synthetic train rows.")
+    parser.add_argument('--seed', type=int, default=SYNTHETIC_SEED)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs; the best time/peak of each stage is kept.")
+    parser.add_argument('--boost-rounds', type=int, default=BENCHMARK_BOOST_ROUNDS)
+    parser.add_argument('--baseline', default=None, metavar='PATH',
+                        help="Baseline JSON (default: benchmarks/baseline_<rows>.json).")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline.")
+    parser.add_argument('--output', default=None, metavar='PATH', help="Also write this run's result to a JSON file.")
+    parser.add_argument('--time-threshold', type=float, default=BENCHMARK_TIME_THRESHOLD)
+    parser.add_argument('--memory-threshold', type=float, default=BENCHMARK_MEMORY_THRESHOLD)
+    parser.add_argument('--scaling', type=int, nargs='+', metavar='ROWS',
+                        help="Instead of the stage benchmark, compare the time and peak RSS of in-memory and "
+                             "external memory training at these row counts.")
+    parser.add_argument('--batch-rows', type=int, default=EXTERNAL_MEMORY_BATCH_ROWS,
+                        help="Rows per batch of the external memory runs of --scaling.")
+    parser.add_argument('--prep-scaling', type=int, nargs='+', metavar='WORKERS',
+                        help="Instead of the stage benchmark, time steps 1-4 serially and with parallel_prep "
+                             "at these worker counts on --rows rows.")
+    parser.add_argument('--load', action='store_true',
+                        help="Instead of the stage benchmark, compare loading the merged data of --rows rows "
+                             "from the former CSV file and the Parquet dataset.")
+    parser.add_argument('--startup', action='store_true',
+                        help="Instead of the stage benchmark, compare the model startup of the former joblib "
+                             "pickle with the model bundle.")
+    args = parser.parse_args()
+
+    if args.startup:
+        startup = run_startup_benchmark(args.rows, args.seed, args.boost_rounds)
+        print_startup_results(startup)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(startup, f, indent=2)
+        sys.exit(0)
+
+    if args.load:
+        load = run_load_benchmark(args.rows, args.seed, args.repeat)
+        print_load_results(load)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(load, f, indent=2)
+        sys.exit(0)
+
+    if args.prep_scaling:
+        prep_scaling = run_prep_scaling_benchmark(args.rows, args.prep_scaling, args.seed)
+        print_prep_scaling_results(prep_scaling)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(prep_scaling, f, indent=2)
+        sys.exit(0)
+
+    if args.scaling:
+        scaling = run_scaling_benchmark(args.scaling, args.seed, args.boost_rounds, args.batch_rows)
+        print_scaling_results(scaling)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(scaling, f, indent=2)
+        sys.exit(0)
+
+    result = benchmark(args.rows, args.seed, args.repeat, args.boost_rounds)
+    print_results(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    baseline_path = args.baseline or default_baseline_path(args.rows)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nBaseline saved to {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            regressions = compare_results(result, json.load(f), args.time_threshold, args.memory_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {baseline_path}.")
+            sys.exit(1)
+        print(f"\nNo regressions against {baseline_path}.")
+    else:
+        print(f"\nNo baseline at {baseline_path}; run with --save-baseline to create one.")
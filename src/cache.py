@@ -0,0 +1,144 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+
+# Bir önbellek girdisinin tamamlandığını gösteren dosya
+_MANIFEST_NAME = 'manifest.json'
+# Ham dosyalar hash'lenirken okunan blok boyutu
+_HASH_BLOCK_SIZE = 1 << 20
+
+def file_digest(file_path):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def source_digest(obj):
+    """Returns the SHA-256 hex digest of a module's or function's source code."""
+    return hashlib.sha256(inspect.getsource(obj).encode('utf-8')).hexdigest()
+
+def cache_key(*parts):
+    """
+    Builds a content-addressed key from the inputs of a stage.
+
+    Args:
+        *parts: JSON-serialisable values (digests, feature lists, parameters).
+
+    Returns:
+        str: A hex key that changes whenever any of the parts change.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def _entry_path(cache_dir, stage, key):
+    return os.path.join(cache_dir, stage, key)
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def lookup_entry(cache_dir, stage, key):
+    """
+    Returns the directory of a completed cache entry, or None on a miss.
+    A hit refreshes the entry's access time used for eviction.
+
+    Args:
+        cache_dir (str): The root cache directory.
+        stage (str): The pipeline stage name.
+        key (str): The stage's cache key.
+    """
+    entry_path = _entry_path(cache_dir, stage, key)
+    manifest_path = os.path.join(entry_path, _MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    os.utime(manifest_path)
+    return entry_path
+
+def read_manifest(entry_path):
+    """Returns the manifest (including the saved metadata) of a cache entry."""
+    with open(os.path.join(entry_path, _MANIFEST_NAME)) as f:
+        return json.load(f)
+
+def save_entry(cache_dir, stage, key, write_fn, metadata=None):
+    """
+    Writes a cache entry atomically: write_fn fills a temporary directory,
+    which is renamed into place once it returns.
+
+    Args:
+        cache_dir (str): The root cache directory.
+        stage (str): The pipeline stage name.
+        key (str): The stage's cache key.
+        write_fn (callable): Called with the directory to write the stage output into.
+        metadata (dict, optional): Extra information saved in the entry manifest.
+
+    Returns:
+        str: The directory of the new entry.
+    """
+    entry_path = _entry_path(cache_dir, stage, key)
+    tmp_path = f"{entry_path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    write_fn(tmp_path)
+    with open(os.path.join(tmp_path, _MANIFEST_NAME), 'w') as f:
+        json.dump({'stage': stage, 'key': key, 'created': time.time(), **(metadata or {})}, f, indent=2)
+
+    if os.path.exists(entry_path):
+        shutil.rmtree(entry_path)
+    os.replace(tmp_path, entry_path)
+    return entry_path
+
+def invalidate_stages(cache_dir, stages=None):
+    """
+    Removes cached entries.
+
+    Args:
+        cache_dir (str): The root cache directory.
+        stages (list, optional): Stage names to clear. Clears every stage if None.
+    """
+    if not os.path.exists(cache_dir):
+        return
+    for stage in stages or os.listdir(cache_dir):
+        stage_path = os.path.join(cache_dir, stage)
+        if os.path.isdir(stage_path):
+            shutil.rmtree(stage_path)
+            print(f"Cache invalidated for stage '{stage}'.")
+
+def evict_entries(cache_dir, max_size_mb):
+    """
+    Removes the least recently used entries until the cache fits in max_size_mb.
+
+    Args:
+        cache_dir (str): The root cache directory.
+        max_size_mb (float): The size limit of the whole cache in megabytes.
+    """
+    if not os.path.exists(cache_dir):
+        return
+    entries = []
+    for stage in os.listdir(cache_dir):
+        stage_path = os.path.join(cache_dir, stage)
+        if not os.path.isdir(stage_path):
+            continue
+        for key in os.listdir(stage_path):
+            manifest_path = os.path.join(stage_path, key, _MANIFEST_NAME)
+            if os.path.exists(manifest_path):
+                entries.append((os.path.getmtime(manifest_path), os.path.join(stage_path, key)))
+
+    sizes = {path: _dir_size(path) for _, path in entries}
+    total = sum(sizes.values())
+    limit = max_size_mb * 1024 ** 2
+    for _, path in sorted(entries):
+        if total <= limit:
+            break
+        shutil.rmtree(path)
+        total -= sizes[path]
+        print(f"Evicted cache entry {os.path.relpath(path, cache_dir)}")
@@ -8,15 +8,124 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(PROJECT_ROOT, 'data')
 RAW_DATA_PATH = os.path.join(DATA_PATH, 'raw')
 PROCESSED_DATA_PATH = os.path.join(DATA_PATH, 'processed')
-PROCESSED_TRAIN_FILE = os.path.join(PROCESSED_DATA_PATH, 'train_merged.csv')
+# Birleştirilmiş eğitim verisi: year=YYYY/month=M şeklinde bölümlenmiş Parquet veri seti
+PROCESSED_TRAIN_DATASET = os.path.join(PROCESSED_DATA_PATH, 'train_merged')
 
+# train.csv + store.csv birleştirmesi için bellek tavanı (MB). None ise train.csv
+# tek seferde okunur; aksi halde bu sınıra göre boyutlanan parçalar halinde işlenir.
+MERGE_MEMORY_LIMIT_MB = 512
+
+# Eğitim pipeline'ının işlenmiş veriden okuduğu sütunlar (Customers ve DayOfWeek gerekmez)
+TRAIN_COLUMNS = [
+    'Store', 'Date', 'Sales', 'Open', 'Promo', 'StateHoliday', 'SchoolHoliday',
+    'StoreType', 'Assortment', 'CompetitionDistance',
+    'CompetitionOpenSinceMonth', 'CompetitionOpenSinceYear',
+    'Promo2', 'Promo2SinceWeek', 'Promo2SinceYear', 'PromoInterval'
+]
+
+# Ayrıştırma, birleştirme, özellik mühendisliği ve kodlama (adım 1-4) bu kadar süreçte, mağaza
+# aralıklarına (shard) bölünerek yapılır (parallel_prep.py); 1 ise seri yol kullanılır
+PREP_WORKERS = 1
+# Her süreç bu kadar mağaza aralığı işler; bir aralık hesaplanırken sıradakinin verisi okunur
+PREP_SHARDS_PER_WORKER = 4
+# train.csv satır sınırlarına hizalanmış bu büyüklükte bloklar halinde okunur (bayt)
+PREP_BLOCK_BYTES = 16 * 1024 ** 2
+
+# --- Pipeline Önbelleği ---
+# Aşama çıktıları (özellikler, DMatrix dosyaları) girdilerinin hash'i ile burada saklanır
+CACHE_PATH = os.path.join(PROJECT_ROOT, 'cache')
+CACHE_MAX_SIZE_MB = 4096
 
 # --- Model Kayıt Yolu ---
 MODEL_PATH = os.path.join(PROJECT_ROOT, 'models')
-MODEL_NAME = 'xgb_sales_model.joblib'
-MODEL_FILE_PATH = os.path.join(MODEL_PATH, MODEL_NAME)
+# Model paketi: booster (UBJSON), manifest (özellikler, kodlayıcılar, doldurma sabitleri) ve mağaza indeksi
+MODEL_NAME = 'xgb_sales_model'
+MODEL_BUNDLE_PATH = os.path.join(MODEL_PATH, MODEL_NAME)
+
+# --- Model Kayıt Defteri (Registry) ---
+# Kaydedilen her model paketi buraya sağlama toplamlarıyla birlikte bir sürüm (v0001, v0002, ...)
+# olarak kopyalanır; CURRENT.json sunulan sürümü gösterir ve atomik olarak değiştirilir
+MODEL_REGISTRY_PATH = os.path.join(MODEL_PATH, 'registry')
+# Pipeline ve artımlı güncelleme kaydettikleri modeli registry'de yayınlar (güncel sürüm yapar)
+MODEL_REGISTRY_PUBLISH = True
+# Saklanan en yeni sürüm sayısı; güncel ve bir önceki sürüm her zaman saklanır
+MODEL_REGISTRY_KEEP_VERSIONS = 5
+# Uygulama ve toplu tahmin CURRENT.json'u bu aralıkla kontrol eder (saniye)
+MODEL_REGISTRY_POLL_SECONDS = 2.0
+
+# --- Tahmin Servisi ---
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8080
+# Eşzamanlı istekler tek bir inplace_predict çağrısında birleştirilir (micro-batching).
+# Bir batch en fazla bu kadar satır içerir ve ilk istekten sonra en fazla bu kadar beklenir.
+SERVER_MAX_BATCH_ROWS = 4096
+SERVER_MAX_WAIT_MS = 5
+# Bu kadar satıra kadar olan batch'ler booster yerine NumPy dizilerine derlenmiş ağaçlarla
+# (tree_predictor.py) DMatrix kurulmadan tahmin edilir; 0 ise her zaman booster kullanılır
+COMPILED_PREDICT_MAX_ROWS = 64
+
+# --- Hiperparametre Araması ---
+# Denemelerin kaydedildiği günlük (yarıda kalan arama buradan devam eder)
+TUNING_LOG_PATH = os.path.join(MODEL_PATH, 'tuning_trials.jsonl')
+# En iyi parametrelerin dışa aktarıldığı dosya (python src/pipeline.py --params ile kullanılır)
+TUNED_PARAMS_PATH = os.path.join(MODEL_PATH, 'xgb_tuned_params.json')
+
+# --- Segment Modelleri ---
+# Ayarlanırsa global modele ek olarak her segment için ayrı bir model eğitilir:
+# 'StoreType', 'Assortment' veya 'StoreCluster' (STORE_CLUSTERS_PATH'teki Store,Cluster eşlemesi)
+SEGMENT_BY = None
+STORE_CLUSTERS_PATH = os.path.join(PROCESSED_DATA_PATH, 'store_clusters.csv')
+# Bundan az eğitim satırı olan segmentler global modeli kullanır
+SEGMENT_MIN_ROWS = 1000
 
 
+# --- Artımlı (Incremental) Yeniden Eğitim ---
+# incremental.py train.csv'ye eklenen günlerle mevcut modeli son INCREMENTAL_WINDOW_WEEKS
+# hafta üzerinde günceller; son INCREMENTAL_HOLDOUT_DAYS gün güncellemenin doğrulanması için ayrılır
+INCREMENTAL_MODE = 'continue'  # 'continue': ağaç ekler, 'refresh': yaprak değerlerini yeniden hesaplar
+INCREMENTAL_WINDOW_WEEKS = 12
+INCREMENTAL_HOLDOUT_DAYS = 7
+INCREMENTAL_ROUNDS = 50
+# Güncellenen modelin doğrulama RMSPE'si mevcut modelinkinden bu orandan fazla kötüyse tam yeniden eğitim yapılır
+INCREMENTAL_MAX_DEGRADATION = 0.02
+# Doğrulamayı geçen güncelleme, kaydedilmeden önce ayrılan son günler dahil tüm pencere üzerinde tekrarlanır
+INCREMENTAL_REFIT = True
+INCREMENTAL_LOG_PATH = os.path.join(MODEL_PATH, 'incremental_log.jsonl')
+
+# --- Sentetik Veri ve Performans Ölçümü ---
+# synthetic.py'nin varsayılan çıktı klasörü ve tohumu (aynı tohum aynı dosyaları üretir)
+SYNTHETIC_DATA_PATH = os.path.join(DATA_PATH, 'synthetic')
+SYNTHETIC_SEED = 42
+# benchmark.py'nin ölçüm sonuçlarını karşılaştırdığı JSON referansları (makineye özgü)
+BENCHMARK_PATH = os.path.join(PROJECT_ROOT, 'benchmarks')
+BENCHMARK_ROWS = 200_000
+# Ölçüm sırasında eğitilen ağaç sayısı (erken durdurma olmadan, süre karşılaştırılabilir kalsın diye)
+BENCHMARK_BOOST_ROUNDS = 50
+# Referansa göre bu oranlardan fazla yavaşlama / bellek artışı gerileme sayılır
+BENCHMARK_TIME_THRESHOLD = 0.25
+BENCHMARK_MEMORY_THRESHOLD = 0.15
+
+# --- Raporlar (generate_reports_script.py) ---
+# EDA istatistikleri veri bu büyüklükte parçalar halinde tek geçişte okunarak hesaplanır
+REPORT_CHUNK_ROWS = 500_000
+# Sales histogramlarının kutu genişliği; tamsayı satışlarda 1 ile çeyreklikler kesin hesaplanır
+REPORT_SALES_BIN_WIDTH = 1.0
+# Her rapor çıktısının üretildiği girdi özeti; özet değişmediyse çıktı yeniden üretilmez
+REPORT_DIGESTS_PATH = os.path.join(CACHE_PATH, 'reports', 'digests.json')
+
+# --- Geçmiş (Lag / Kayan Pencere) Özellikleri ---
+# Satış geçmişinden türetilen özellikler en az bu kadar gün önceki satışları kullanır. Tahmin
+# ufkundan (Kaggle test dönemi 48 gün, validasyon 6 hafta) uzun olduğu için validasyon ve
+# tahmin satırları bilinmeyen satışlara hiç bakmaz (sızıntı olmaz).
+HISTORY_MIN_LAG_DAYS = 49
+# Mağazanın açık günlerdeki ortalama satışının hesaplandığı pencereler (gün)
+HISTORY_WINDOWS = [7, 28, 91]
+# Aynı haftanın günündeki satış gecikmeleri (hafta); hepsi HISTORY_MIN_LAG_DAYS'ten uzun olmalı
+HISTORY_LAG_WEEKS = [7, 52]
+HISTORY_SALES_FEATURES = [f'SalesMean{days}' for days in HISTORY_WINDOWS] + \
+    [f'SalesLagWeek{weeks}' for weeks in HISTORY_LAG_WEEKS]
+HISTORY_FEATURES = HISTORY_SALES_FEATURES
+
 # --- Model Özellikleri ve Parametreleri ---
 
 # Modelde kullanılacak özelliklerin listesi
@@ -25,7 +134,7 @@ FEATURES = [
     'Store', 'StoreType', 'Assortment', 'CompetitionDistance', 'CompetitionOpen',
     'Promo', 'Promo2', 'IsPromo2',
     'StateHoliday', 'SchoolHoliday'
-]
+] + HISTORY_FEATURES
 
 # Hedef değişken
 TARGET = 'Sales'
@@ -33,6 +142,19 @@ TARGET = 'Sales'
 # Kategorik olarak ele alınacak özellikler
 CATEGORICAL_FEATURES = ['StoreType', 'Assortment', 'StateHoliday']
 
+# Validasyon için ayrılan son dönem (hafta)
+VALIDATION_WEEKS = 6
+
+
+# --- Dış Bellek (Out-of-core) Eğitim ---
+# Ayarlanırsa eğitim verisi belleğe alınmaz; özellikler işlenmiş veriden tarih aralığı parçaları
+# halinde üretilip XGBoost'a DataIter ile verilir: 'quantile' (sıkıştırılmış QuantileDMatrix
+# bellekte) veya 'extmem' (ExtMemQuantileDMatrix, sayfalar EXTERNAL_MEMORY_CACHE_PATH altında diskte)
+EXTERNAL_MEMORY = None
+# Her parçada yaklaşık bu kadar satır okunur (özellik hesabı için sonraki 31 günün satırları da okunur)
+EXTERNAL_MEMORY_BATCH_ROWS = 500_000
+EXTERNAL_MEMORY_CACHE_PATH = os.path.join(CACHE_PATH, 'external_memory')
+
 
 # --- XGBoost Parametreleri ---
 XGB_PARAMS = {
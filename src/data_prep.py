@@ -1,38 +1,185 @@
+import hashlib
+import io
 import pandas as pd
+import numpy as np
 import os
 
-def merge_data(raw_data_path, processed_data_path):
+from schema import csv_dtypes
+from storage import save_processed_data, next_processed_part
+
+# Satır başına bellek tahmini için okunan örnek satır sayısı
+_SAMPLE_ROWS = 10000
+# Bir parça işlenirken aynı anda bellekte tutulan kopya sayısı (CSV ayrıştırma,
+# birleştirilmiş parça ve Parquet'e yazılan Arrow tablosu)
+_CHUNK_MEMORY_COPIES = 3
+# Ham CSV'nin sonuna eklenen satırları tespit ederken dosyanın değişmediği, okunan
+# kısmın son bu kadar baytının özetiyle doğrulanır
+_CHECKPOINT_TAIL_BYTES = 65536
+
+def _build_store_lookup(store_df):
+    """
+    Builds a direct-index lookup for the store table: lookup[store_id] is the
+    row position of that store in store_df, or -1 if the store is unknown.
+    """
+    store_ids = store_df['Store'].to_numpy()
+    lookup = np.full(store_ids.max() + 1, -1, dtype=np.int64)
+    lookup[store_ids] = np.arange(len(store_ids))
+    return lookup
+
+def _join_store_chunk(rows, store_columns, store_lookup):
+    """
+    Joins a chunk of train/test rows with the store table by array indexing.
+
+    Args:
+        rows (pd.DataFrame): Rows with a 'Store' column.
+        store_columns (pd.DataFrame): The store table without its 'Store' column.
+        store_lookup (np.ndarray): The lookup built by _build_store_lookup.
+
+    Returns:
+        pd.DataFrame: rows followed by the store columns of each row's store.
     """
-    Merges the raw train and store data and saves it to the processed data folder.
+    store_ids = rows['Store'].to_numpy()
+    known = store_ids < len(store_lookup)
+    positions = np.where(known, store_lookup[np.where(known, store_ids, 0)], -1)
+    if (positions < 0).any():
+        unknown = np.unique(store_ids[positions < 0])
+        raise ValueError(f"Stores missing from store.csv: {unknown[:10].tolist()}")
+
+    store_part = store_columns.take(positions).reset_index(drop=True)
+    return pd.concat([rows.reset_index(drop=True), store_part], axis=1)
+
+def _rows_per_chunk(train_csv_path, store_columns, store_lookup, memory_limit_mb):
+    """Estimates how many train rows fit in one chunk under the memory limit."""
+    sample = pd.read_csv(train_csv_path, nrows=_SAMPLE_ROWS, dtype=csv_dtypes())
+    merged_sample = _join_store_chunk(sample, store_columns, store_lookup)
+    bytes_per_row = merged_sample.memory_usage(deep=True).sum() / max(len(merged_sample), 1)
+    rows = int(memory_limit_mb * 1024 ** 2 / (bytes_per_row * _CHUNK_MEMORY_COPIES))
+    return max(rows, 1)
+
+def _merge_in_chunks(train_csv_path, store_df, merged_dataset_path, memory_limit_mb):
+    """Streams train.csv in chunks, joins each with the store table and appends it to the dataset."""
+    store_lookup = _build_store_lookup(store_df)
+    store_columns = store_df.drop(columns='Store')
+    chunksize = _rows_per_chunk(train_csv_path, store_columns, store_lookup, memory_limit_mb)
+
+    num_rows = 0
+    for part_index, train_chunk in enumerate(pd.read_csv(train_csv_path, chunksize=chunksize, dtype=csv_dtypes())):
+        merged_chunk = _join_store_chunk(train_chunk, store_columns, store_lookup)
+        save_processed_data(merged_chunk, merged_dataset_path, part_index=part_index)
+        num_rows += len(merged_chunk)
+    print(f"Merged {num_rows} rows in chunks of {chunksize} rows.")
+
+def merge_data(raw_data_path, processed_data_path, memory_limit_mb=None):
+    """
+    Merges the raw train and store data and saves it to the processed data folder
+    as a Parquet dataset partitioned by year and month.
 
     Args:
         raw_data_path (str): The path to the raw data folder.
         processed_data_path (str): The path to the processed data folder.
+        memory_limit_mb (int, optional): If given, train.csv is streamed in chunks
+            sized to stay under this many megabytes instead of being loaded at once.
+
+    Raises:
+        ValueError: If train.csv has stores that are missing from store.csv
+            (with or without memory_limit_mb).
+
+    Returns:
+        bool: True if the merged dataset was written, False if a raw file was missing.
     """
     train_csv_path = os.path.join(raw_data_path, 'train.csv')
     store_csv_path = os.path.join(raw_data_path, 'store.csv')
-    merged_csv_path = os.path.join(processed_data_path, 'train_merged.csv')
+    merged_dataset_path = os.path.join(processed_data_path, 'train_merged')
 
     if not os.path.exists(processed_data_path):
         os.makedirs(processed_data_path)
 
     try:
-        train_df = pd.read_csv(train_csv_path, low_memory=False)
-        store_df = pd.read_csv(store_csv_path)
+        store_df = pd.read_csv(store_csv_path, dtype=csv_dtypes())
 
-        merged_df = pd.merge(train_df, store_df, on='Store', how='left')
+        if memory_limit_mb is None:
+            train_df = pd.read_csv(train_csv_path, dtype=csv_dtypes())
+            # Parçalı birleştirmeyle aynı birleştirme: store.csv'de olmayan mağazalar hata verir
+            merged_df = _join_store_chunk(train_df, store_df.drop(columns='Store'), _build_store_lookup(store_df))
+            save_processed_data(merged_df, merged_dataset_path)
+        else:
+            _merge_in_chunks(train_csv_path, store_df, merged_dataset_path, memory_limit_mb)
 
-        merged_df.to_csv(merged_csv_path, index=False)
-        print(f"Successfully merged data and saved to {merged_csv_path}")
+        print(f"Successfully merged data and saved to {merged_dataset_path}")
+        return True
 
     except FileNotFoundError as e:
         print(f"Error during data merging: {e}")
         print("Please ensure 'train.csv' and 'store.csv' are in the raw data directory.")
+        return False
+
+def _tail_digest(csv_path, end):
+    with open(csv_path, 'rb') as f:
+        f.seek(max(0, end - _CHECKPOINT_TAIL_BYTES))
+        return hashlib.sha256(f.read(end - f.tell())).hexdigest()
+
+def raw_checkpoint(csv_path):
+    """
+    Records how much of a raw CSV has been consumed: its size and a digest of
+    its last bytes, so that rows appended later can be read on their own.
+    """
+    size = os.path.getsize(csv_path)
+    return {'bytes': size, 'tail_sha256': _tail_digest(csv_path, size)}
+
+def read_appended_rows(csv_path, checkpoint):
+    """
+    Reads only the rows appended to a raw CSV since a checkpoint.
+
+    Args:
+        csv_path (str): The raw CSV (e.g. train.csv).
+        checkpoint (dict): A checkpoint from raw_checkpoint.
+
+    Returns:
+        tuple: (rows, new_checkpoint) where rows has the file's columns
+        (empty if nothing was appended).
+
+    Raises:
+        ValueError: If the file was rewritten or truncated rather than appended to.
+    """
+    size = os.path.getsize(csv_path)
+    offset = checkpoint['bytes']
+    if size < offset or _tail_digest(csv_path, offset) != checkpoint['tail_sha256']:
+        raise ValueError(f"{csv_path} changed before the checkpoint; it was not only appended to.")
+
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = csv_dtypes(columns)
+    if size == offset:
+        return pd.DataFrame({column: pd.Series(dtype=dtypes.get(column, object)) for column in columns}), checkpoint
+    with open(csv_path, 'rb') as f:
+        f.seek(offset)
+        appended = f.read(size - offset)
+    rows = pd.read_csv(io.BytesIO(appended), names=columns, header=None, dtype=dtypes)
+    return rows, {'bytes': size, 'tail_sha256': _tail_digest(csv_path, size)}
+
+def append_processed_rows(rows, raw_data_path, processed_data_path):
+    """
+    Joins new train rows with the store table and appends them to the
+    processed Parquet dataset as a new part, without rewriting existing parts.
+
+    Args:
+        rows (pd.DataFrame): New rows in train.csv layout.
+        raw_data_path (str): The raw data folder (for store.csv).
+        processed_data_path (str): The processed data folder.
+
+    Returns:
+        int: The part index of the new rows (see storage.remove_processed_part).
+    """
+    store_df = pd.read_csv(os.path.join(raw_data_path, 'store.csv'), dtype=csv_dtypes())
+    merged = _join_store_chunk(rows, store_df.drop(columns='Store'), _build_store_lookup(store_df))
+    # Parça numarası mevcut en büyük numaradan sonra gelir; mevcut parçaların üzerine yazılmaz
+    dataset_path = os.path.join(processed_data_path, 'train_merged')
+    part_index = next_processed_part(dataset_path)
+    save_processed_data(merged, dataset_path, part_index=part_index)
+    return part_index
 
 if __name__ == '__main__':
     # This allows the script to be run directly for data preparation
     # Example usage:
     # python src/data_prep.py
-    from config import RAW_DATA_PATH, PROCESSED_DATA_PATH
-    merge_data(RAW_DATA_PATH, PROCESSED_DATA_PATH)
-
+    from config import RAW_DATA_PATH, PROCESSED_DATA_PATH, MERGE_MEMORY_LIMIT_MB
+    merge_data(RAW_DATA_PATH, PROCESSED_DATA_PATH, memory_limit_mb=MERGE_MEMORY_LIMIT_MB)
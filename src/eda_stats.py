@@ -0,0 +1,209 @@
+# Rapor istatistikleri için tek geçişli, birleştirilebilir (mergeable) toplamlar
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from data_prep import _build_store_lookup, _join_store_chunk
+from schema import apply_schema, csv_dtypes
+from storage import _PARTITIONING
+
+class RunningMoments:
+    """Count, mean, variance, min and max of a stream of values (Chan et al. parallel update)."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        batch = RunningMoments()
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min, batch.max = float(values.min()), float(values.max())
+        return self.merge(batch)
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1, as in DataFrame.describe)."""
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else float('nan')
+
+class ValueHistogram:
+    """
+    Fixed-width histogram of non-negative values, usable as a quantile
+    sketch: bin k counts the values in [k * width, (k + 1) * width). With
+    integer values and width 1 (e.g. Sales) every quantile is exact;
+    otherwise its error is below one bin width.
+    """
+    def __init__(self, width=1.0):
+        self.width = width
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        if values.min() < 0:
+            raise ValueError("ValueHistogram only accepts non-negative values.")
+        return self._add(np.bincount((values // self.width).astype(np.int64)))
+
+    def merge(self, other):
+        if other.width != self.width:
+            raise ValueError("Histograms with different bin widths cannot be merged.")
+        return self._add(other.counts)
+
+    def _add(self, counts):
+        if len(counts) > len(self.counts):
+            self.counts = np.concatenate([self.counts, np.zeros(len(counts) - len(self.counts), dtype=np.int64)])
+        self.counts[:len(counts)] += counts
+        return self
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def edges(self):
+        """Left edge of every bin."""
+        return np.arange(len(self.counts)) * self.width
+
+    def _order_statistics(self, ranks):
+        # k. (0 tabanlı) sıradaki değer, kümülatif sayımı k'yı aşan ilk kutunun sol kenarıdır
+        return np.searchsorted(np.cumsum(self.counts), np.asarray(ranks), side='right') * self.width
+
+    def quantiles(self, qs):
+        """Quantiles with linear interpolation between order statistics (pandas' default)."""
+        positions = np.asarray(qs, dtype=np.float64) * (self.count - 1)
+        lower, upper = np.floor(positions), np.ceil(positions)
+        low_values, high_values = self._order_statistics(lower), self._order_statistics(upper)
+        return low_values + (positions - lower) * (high_values - low_values)
+
+    def box_stats(self, label, whisker=1.5):
+        """
+        The statistics Axes.bxp draws for a boxplot. Outliers are given as
+        the distinct bin values beyond the whiskers, which plot the same as
+        every outlying row.
+        """
+        q1, median, q3 = self.quantiles([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        values = self.edges()[self.counts > 0]
+        inside = values[(values >= q1 - whisker * iqr) & (values <= q3 + whisker * iqr)]
+        return {
+            'label': label, 'q1': q1, 'med': median, 'q3': q3,
+            'whislo': inside.min(), 'whishi': inside.max(),
+            'fliers': values[(values < inside.min()) | (values > inside.max())],
+        }
+
+    def kde(self, grid, bandwidth):
+        """Gaussian kernel density of the values at the grid points, computed from the bins."""
+        nonzero = self.counts > 0
+        centers = self.edges()[nonzero] + self.width / 2
+        density = np.zeros(len(grid))
+        # Bellek sınırlı kalsın diye ızgara parçalar halinde hesaplanır
+        for start in range(0, len(grid), 64):
+            z = (grid[start:start + 64, None] - centers[None, :]) / bandwidth
+            density[start:start + 64] = np.exp(-0.5 * z * z) @ self.counts[nonzero]
+        return density / (self.count * bandwidth * np.sqrt(2 * np.pi))
+
+class EdaStats:
+    """
+    The aggregates behind the EDA report, built from one chunked pass:
+    Sales moments, a Sales histogram per StateHoliday value (boxplot), a
+    histogram of positive Sales (distribution plot) and null counts.
+    Two EdaStats built from different chunks merge into the stats of both.
+    """
+    def __init__(self, sales_bin_width=1.0):
+        self.rows = 0
+        self.null_counts = {}
+        self.sales = RunningMoments()
+        self.positive_sales = ValueHistogram(sales_bin_width)
+        self.sales_by_holiday = {}
+        self.sales_bin_width = sales_bin_width
+
+    def update(self, chunk, count_nulls=True):
+        """Adds a chunk with 'Sales' and 'StateHoliday' columns."""
+        self.rows += len(chunk)
+        if count_nulls:
+            for column, nulls in chunk.isna().sum().items():
+                self.null_counts[column] = self.null_counts.get(column, 0) + int(nulls)
+        sales = chunk['Sales'].to_numpy(dtype=np.float64)
+        self.sales.update(sales)
+        self.positive_sales.update(sales[sales > 0])
+        codes, labels = pd.factorize(chunk['StateHoliday'].astype(str))
+        for code, label in enumerate(labels):
+            histogram = self.sales_by_holiday.setdefault(label, ValueHistogram(self.sales_bin_width))
+            histogram.update(sales[codes == code])
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        for column, nulls in other.null_counts.items():
+            self.null_counts[column] = self.null_counts.get(column, 0) + nulls
+        self.sales.merge(other.sales)
+        self.positive_sales.merge(other.positive_sales)
+        for label, histogram in other.sales_by_holiday.items():
+            self.sales_by_holiday.setdefault(label, ValueHistogram(self.sales_bin_width)).merge(histogram)
+        return self
+
+    def sales_histogram(self):
+        """All Sales values as one histogram (the union of the per-holiday histograms)."""
+        total = ValueHistogram(self.sales_bin_width)
+        for histogram in self.sales_by_holiday.values():
+            total.merge(histogram)
+        return total
+
+    def describe_sales(self):
+        """The Sales rows of DataFrame.describe(), as a pd.Series."""
+        quartiles = self.sales_histogram().quantiles([0.25, 0.5, 0.75])
+        return pd.Series({
+            'count': float(self.sales.count), 'mean': self.sales.mean, 'std': self.sales.std,
+            'min': self.sales.min, '25%': quartiles[0], '50%': quartiles[1], '75%': quartiles[2],
+            'max': self.sales.max,
+        }, name='Sales')
+
+def iter_processed_chunks(dataset_path, columns, batch_rows):
+    """Yields the columns of the processed Parquet dataset in record batches of at most batch_rows."""
+    dataset = ds.dataset(dataset_path, format='parquet', partitioning=_PARTITIONING)
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_rows):
+        yield apply_schema(batch.to_pandas())
+
+def iter_raw_merged_chunks(train_csv_path, store_csv_path, chunk_rows):
+    """Yields train.csv joined with store.csv, chunk_rows rows at a time."""
+    store_df = pd.read_csv(store_csv_path, dtype=csv_dtypes())
+    store_lookup = _build_store_lookup(store_df)
+    store_columns = store_df.drop(columns='Store')
+    for chunk in pd.read_csv(train_csv_path, chunksize=chunk_rows, dtype=csv_dtypes()):
+        yield _join_store_chunk(chunk, store_columns, store_lookup)
+
+def collect_eda_stats(chunks, count_nulls=True, sales_bin_width=1.0):
+    """
+    Builds the EDA aggregates in one pass over an iterable of chunks; only
+    one chunk is held in memory at a time.
+
+    Args:
+        chunks (iterable): DataFrames with at least 'Sales' and 'StateHoliday'.
+        count_nulls (bool): Count the nulls of every column of the chunks
+            (not needed when they come from the Parquet footers).
+        sales_bin_width (float): Bin width of the Sales histograms.
+
+    Returns:
+        EdaStats: The merged aggregates.
+    """
+    stats = EdaStats(sales_bin_width)
+    for chunk in chunks:
+        stats.update(chunk, count_nulls)
+    return stats
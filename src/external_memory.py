@@ -0,0 +1,188 @@
+# Eğitim verisini belleğe almadan, işlenmiş veriden parça parça özellik üreterek XGBoost eğitimi
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from config import (
+    FEATURES, TARGET, VALIDATION_WEEKS,
+    EXTERNAL_MEMORY_BATCH_ROWS, EXTERNAL_MEMORY_CACHE_PATH
+)
+from eda_stats import ValueHistogram, iter_processed_chunks
+from features import build_feature_matrix
+from history import (
+    HISTORY_COLUMNS, LOOKBACK_DAYS, empty_history_state, build_history_state, extend_history_state
+)
+from storage import load_processed_data
+from store_index import build_store_index, weighted_median
+
+EXTERNAL_MEMORY_MODES = ['quantile', 'extmem']
+
+def scan_processed_data(dataset_path, batch_rows=EXTERNAL_MEMORY_BATCH_ROWS):
+    """
+    Reads the few columns the batch plan needs in one chunked pass: rows per
+    store and per day, the last day with sales and the StateHoliday values.
+
+    Returns:
+        dict: 'store_rows' (rows of each store id), 'day_rows' (pd.Series of
+        rows per date), 'last_sales_date' and 'state_holiday_classes'.
+    """
+    store_rows = ValueHistogram(1)
+    day_rows = pd.Series(dtype=np.int64)
+    last_sales_date = None
+    state_holidays = set()
+    columns = ['Store', 'Date', 'Open', 'Sales', 'StateHoliday']
+    for chunk in iter_processed_chunks(dataset_path, columns, batch_rows):
+        store_rows.update(chunk['Store'].to_numpy())
+        day_rows = day_rows.add(chunk['Date'].value_counts(), fill_value=0)
+        sold = chunk.loc[(chunk['Open'] == 1) & (chunk['Sales'] > 0), 'Date']
+        if len(sold):
+            last_sales_date = sold.max() if last_sales_date is None else max(last_sales_date, sold.max())
+        state_holidays.update(chunk['StateHoliday'].astype(str).unique())
+    if last_sales_date is None:
+        raise ValueError(f"No rows with sales in {dataset_path}.")
+    return {
+        'store_rows': store_rows.counts,
+        'day_rows': day_rows.sort_index().astype(np.int64),
+        'last_sales_date': last_sales_date,
+        'state_holiday_classes': sorted(state_holidays),
+    }
+
+def date_batches(day_rows, batch_rows):
+    """Splits consecutive dates into (first, last) date ranges of about batch_rows rows each."""
+    batch_ids = (np.cumsum(day_rows.to_numpy()) - 1) // batch_rows
+    dates = day_rows.index
+    starts = np.flatnonzero(np.r_[True, batch_ids[1:] != batch_ids[:-1]])
+    ends = np.r_[starts[1:], len(dates)] - 1
+    return [(dates[start], dates[end]) for start, end in zip(starts, ends)]
+
+class FeatureBatchIter(xgb.DataIter):
+    """
+    Feeds the training rows of the processed dataset to XGBoost one date
+    range at a time. Each batch is read from disk and its features are built
+    with features.build_feature_matrix from the history state of the
+    previous batches, so only one batch and the last LOOKBACK_DAYS of
+    history are in memory.
+    """
+    def __init__(self, dataset_path, batches, store_index, encoders, train_end, history_cutoff,
+                 feature_names=FEATURES, cache_prefix=None):
+        self.dataset_path = dataset_path
+        self.batches = batches
+        self.store_index = store_index
+        self.encoders = encoders
+        self.train_end = train_end
+        self.history_cutoff = history_cutoff
+        self.feature_names = feature_names
+        self._position = 0
+        self._state = empty_history_state()
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._position = 0
+        self._state = empty_history_state()
+
+    def next(self, input_data):
+        if self._position == len(self.batches):
+            return False
+        first, last = self.batches[self._position]
+        rows = load_processed_data(self.dataset_path, columns=HISTORY_COLUMNS, start_date=first, end_date=last)
+        X = build_feature_matrix(rows, self.store_index, self.encoders, self.feature_names,
+                                 self._state, self.history_cutoff)
+        self._state = extend_history_state(self._state, rows)
+        # Sadece mağazalar açıkken ve satış varken olan eğitim dönemi satırları
+        keep = ((rows['Open'] == 1) & (rows['Sales'] > 0) & (rows['Date'] < self.train_end)).to_numpy()
+        input_data(data=X[keep], label=rows.loc[keep, TARGET].to_numpy(dtype=np.float32))
+        self._position += 1
+        return True
+
+def _validation_features(dataset_path, validation_start, store_index, encoders, history_cutoff,
+                         feature_names=FEATURES):
+    """The validation rows' features, from the history of the LOOKBACK_DAYS before them."""
+    state = build_history_state(load_processed_data(
+        dataset_path, columns=HISTORY_COLUMNS, start_date=validation_start - pd.Timedelta(days=LOOKBACK_DAYS),
+        end_date=validation_start - pd.Timedelta(days=1)))
+    rows = load_processed_data(dataset_path, columns=HISTORY_COLUMNS, start_date=validation_start)
+    X = build_feature_matrix(rows, store_index, encoders, feature_names, state, history_cutoff)
+    # Kapalı günler modele verilmez
+    keep = ((rows['Open'] == 1) & (rows['Sales'] > 0)).to_numpy()
+    return X[keep].reset_index(drop=True), rows.loc[keep, TARGET].to_numpy(dtype=np.float32)
+
+def build_external_matrices(dataset_path, store_df, mode='quantile', batch_rows=EXTERNAL_MEMORY_BATCH_ROWS,
+                            cache_path=EXTERNAL_MEMORY_CACHE_PATH):
+    """
+    Builds the train/validation matrices of the pipeline without loading the
+    training data: the train rows are streamed through FeatureBatchIter into
+    a QuantileDMatrix (mode 'quantile': the histogram-binned matrix, about
+    one byte per value, in memory) or an ExtMemQuantileDMatrix (mode
+    'extmem': its pages cached on disk under cache_path). Peak memory is
+    bounded by batch_rows, the last year of history per store and the
+    validation period. The hist tree method is required to train on them.
+
+    Args:
+        dataset_path (str): The processed Parquet dataset.
+        store_df (pd.DataFrame): store.csv.
+        mode (str): One of EXTERNAL_MEMORY_MODES.
+        batch_rows (int): Approximate rows per batch.
+        cache_path (str): Page cache directory of mode 'extmem' (cleared first).
+
+    Returns:
+        tuple: (dtrain, dval, artifacts) as in the in-memory pipeline; dval is
+        an ordinary DMatrix of the VALIDATION_WEEKS validation rows.
+    """
+    if mode not in EXTERNAL_MEMORY_MODES:
+        raise ValueError(f"Unknown external memory mode {mode!r}; expected one of {EXTERNAL_MEMORY_MODES}.")
+    plan = _training_plan(dataset_path, store_df, batch_rows)
+    cache_prefix = None
+    if mode == 'extmem':
+        if os.path.exists(cache_path):
+            shutil.rmtree(cache_path)
+        os.makedirs(cache_path)
+        cache_prefix = os.path.join(cache_path, 'train')
+    iterator = FeatureBatchIter(dataset_path, plan['batches'], plan['index'], plan['encoders'],
+                                plan['validation_start'], plan['history_cutoff'], cache_prefix=cache_prefix)
+    print(f"Streaming {plan['train_rows']} rows in {len(plan['batches'])} batches ({mode}).")
+    if mode == 'extmem':
+        dtrain = xgb.ExtMemQuantileDMatrix(iterator)
+    else:
+        dtrain = xgb.QuantileDMatrix(iterator)
+
+    X_val, y_val = _validation_features(dataset_path, plan['validation_start'], plan['index'], plan['encoders'],
+                                        plan['history_cutoff'])
+    dval = xgb.DMatrix(X_val, label=y_val)
+    print(f"Training set size: {dtrain.num_row()}")
+    print(f"Validation set size: {dval.num_row()}")
+    return dtrain, dval, {'encoders': plan['encoders'], 'imputation': plan['imputation']}
+
+def _training_plan(dataset_path, store_df, batch_rows):
+    """
+    The inputs of FeatureBatchIter from one scan of the dataset: the
+    validation start and history cutoff, the imputation constants, the
+    encoder classes, the store index and the date batches of the train rows.
+    """
+    scan = scan_processed_data(dataset_path, batch_rows)
+    validation_start = scan['last_sales_date'] - pd.DateOffset(weeks=VALIDATION_WEEKS)
+
+    # Eksik CompetitionDistance, bellek içi pipeline'daki gibi tüm satırların medyanıyla doldurulur
+    distance = store_df.set_index('Store')['CompetitionDistance'].reindex(np.arange(len(scan['store_rows'])))
+    imputation = {'CompetitionDistance': weighted_median(distance.to_numpy(dtype=np.float64), scan['store_rows'])}
+    # Kodlama sınıfları, bellek içi pipeline'daki gibi yalnızca verisi olan mağazalardan gelir
+    present = store_df[np.isin(store_df['Store'].to_numpy(), np.flatnonzero(scan['store_rows']))]
+    encoders = {
+        'StoreType': sorted(present['StoreType'].astype(str).unique()),
+        'Assortment': sorted(present['Assortment'].astype(str).unique()),
+        'StateHoliday': scan['state_holiday_classes'],
+    }
+    index = build_store_index(present, competition_distance_fill=imputation['CompetitionDistance'],
+                              category_classes=encoders)
+
+    day_rows = scan['day_rows'][scan['day_rows'].index < validation_start]
+    return {
+        'validation_start': validation_start,
+        'history_cutoff': validation_start - pd.Timedelta(days=1),
+        'imputation': imputation,
+        'encoders': encoders,
+        'index': index,
+        'batches': date_batches(day_rows, batch_rows),
+        'train_rows': int(day_rows.sum()),
+    }
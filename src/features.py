@@ -1,69 +1,171 @@
+import numpy as np
 import pandas as pd
 
-def _create_date_features(df):
-    """Creates time-based features from the 'Date' column."""
-    df['Year'] = df['Date'].dt.year
-    df['Month'] = df['Date'].dt.month
-    df['Day'] = df['Date'].dt.day
-    df['DayOfWeek'] = df['Date'].dt.dayofweek
-    df['WeekOfYear'] = df['Date'].dt.isocalendar().week.astype(int)
-    return df
+from config import FEATURES, HISTORY_FEATURES
+from history import history_features
+from schema import COLUMN_SCHEMA
+from store_index import build_store_index, lookup_store_features, weighted_median
+
+# Birleştirilmiş veride store.csv'den gelen sütunlar
+STORE_COLUMNS = [
+    'Store', 'StoreType', 'Assortment', 'CompetitionDistance',
+    'CompetitionOpenSinceMonth', 'CompetitionOpenSinceYear',
+    'Promo2', 'Promo2SinceWeek', 'Promo2SinceYear', 'PromoInterval'
+]
+
+# Eğitim verisinde StateHoliday için görülen sınıflar (LabelEncoder'ın sıralı sınıfları)
+STATE_HOLIDAY_CLASSES = np.array(['0', 'a', 'b', 'c'])
 
-def _create_competition_features(df):
-    """Creates features related to competitors."""
-    df['CompetitionOpenSinceMonth'].fillna(0, inplace=True)
-    df['CompetitionOpenSinceYear'].fillna(0, inplace=True)
-    df['CompetitionOpen'] = (df['Year'] - df['CompetitionOpenSinceYear']) * 12 + \
-                            (df['Month'] - df['CompetitionOpenSinceMonth'])
-    df['CompetitionOpen'] = df['CompetitionOpen'].apply(lambda x: max(x, 0))
-    df['CompetitionDistance'].fillna(df['CompetitionDistance'].median(), inplace=True)
+def _calendar(days):
+    """The calendar features of each day of a datetime64[D] array, in the schema's narrow dtypes."""
+    months = days.astype('datetime64[M]')
+    years = days.astype('datetime64[Y]')
+    day_of_week = (days.astype(np.int64) + 3) % 7  # 1970-01-01 bir Perşembe günüdür
+
+    # ISO hafta numarası: haftanın Perşembe gününün ait olduğu yıl içindeki sırası
+    thursdays = days - day_of_week + 3
+    iso_year_start = thursdays.astype('datetime64[Y]').astype('datetime64[D]')
+    return {
+        'Year': (years.astype(np.int64) + 1970).astype(COLUMN_SCHEMA['Year']),
+        'Month': ((months - years).astype(np.int64) + 1).astype(COLUMN_SCHEMA['Month']),
+        'Day': ((days - months).astype(np.int64) + 1).astype(COLUMN_SCHEMA['Day']),
+        'DayOfWeek': day_of_week.astype(COLUMN_SCHEMA['DayOfWeek']),
+        'WeekOfYear': ((thursdays - iso_year_start).astype(np.int64) // 7 + 1).astype(COLUMN_SCHEMA['WeekOfYear']),
+    }
+
+def _date_dimension(dates):
+    """
+    The calendar of every day from the first to the last of dates and the
+    position of each row's day in it: the day number relative to the first
+    day is already a dense integer code, so no hashing or sorting is needed.
+    """
+    days = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+    if len(days) == 0:
+        return _calendar(np.empty(0, dtype='datetime64[D]')), days
+    first = days.min()
+    calendar = _calendar(np.arange(first, days.max() + 1).astype('datetime64[D]'))
+    return calendar, days - first
+
+def _create_date_features(df, calendar, date_codes):
+    """Creates the time-based features by broadcasting the calendar of the distinct days to the rows."""
+    for feature, values in calendar.items():
+        df[feature] = values[date_codes]
     return df
 
-def _is_promo2_active(row):
-    """Helper function to check if Promo2 is active for a given row."""
-    if row['Promo2'] == 0:
-        return 0
-    
-    promo2_start_year = int(row['Promo2SinceYear'])
-    promo2_start_week = int(row['Promo2SinceWeek'])
-    current_year = row['Year']
-    current_week = row['WeekOfYear']
-
-    if current_year < promo2_start_year:
-        return 0
-    if current_year == promo2_start_year and current_week < promo2_start_week:
-        return 0
-
-    month_str = row['Date'].strftime('%b')
-    if month_str in row['PromoInterval']:
-        return 1
-    else:
-        return 0
-
-def _create_promo2_features(df):
-    """Creates features related to the ongoing Promo2."""
-    df['Promo2SinceWeek'].fillna(0, inplace=True)
-    df['Promo2SinceYear'].fillna(0, inplace=True)
-    df['PromoInterval'].fillna('', inplace=True)
-    df['IsPromo2'] = df.apply(_is_promo2_active, axis=1)
+def _store_rows(store_ids):
+    """Row count and one row position of every store id (any row of a store carries its columns)."""
+    row_of_store = np.full(store_ids.max() + 1, -1, dtype=np.int64)
+    row_of_store[store_ids] = np.arange(len(store_ids))
+    return np.bincount(store_ids, minlength=len(row_of_store)), row_of_store
+
+def _create_store_features(df, calendar, date_codes, competition_distance_fill=None):
+    """
+    Creates the competition and Promo2 features from the store columns.
+    competition_distance_fill replaces the median of df's rows (e.g. the
+    median of all rows when df is one shard of them).
+    """
+    # Mağaza bilgileri her satırda tekrarlanır; indeks mağaza başına bir satırdan bir kez kurulur
+    store_ids = df['Store'].to_numpy().astype(np.int64)
+    row_counts, row_of_store = _store_rows(store_ids)
+    stores = df[STORE_COLUMNS].iloc[row_of_store[row_counts > 0]]
+    # Eksik mesafe tüm satırların medyanıyla doldurulur; medyan mağaza başına satır sayısıyla ağırlıklı
+    distance = np.full(len(row_counts), np.nan)
+    distance[stores['Store'].to_numpy()] = stores['CompetitionDistance'].to_numpy(dtype=np.float64, na_value=np.nan)
+    if competition_distance_fill is None:
+        competition_distance_fill = weighted_median(distance, row_counts)
+    store_index = build_store_index(stores, competition_distance_fill=competition_distance_fill)
+    store_features = lookup_store_features(
+        store_index, store_ids, calendar['Year'], calendar['Month'], calendar['WeekOfYear'], date_codes
+    )
+    for feature in ('CompetitionDistance', 'CompetitionOpen', 'IsPromo2'):
+        df[feature] = store_features[feature].astype(COLUMN_SCHEMA[feature])
     return df
 
-def engineer_features(df):
+def encode_state_holiday(values, classes=STATE_HOLIDAY_CLASSES):
+    """Encodes StateHoliday values with the training-time LabelEncoder classes."""
+    classes = np.asarray(classes, dtype=str)
+    values = pd.Series(values).astype(str).to_numpy()
+    codes = np.minimum(np.searchsorted(classes, values), len(classes) - 1)
+    unknown = classes[codes] != values
+    if unknown.any():
+        raise ValueError(f"Unknown StateHoliday values: {np.unique(values[unknown]).tolist()}")
+    return codes
+
+def build_feature_matrix(rows, store_index, encoders=None, feature_names=FEATURES, history=None,
+                         history_cutoff=None):
+    """
+    Builds the encoded model features for scoring directly from a store index,
+    without merging the store table.
+
+    Args:
+        rows (pd.DataFrame): Rows with 'Store', 'Date', 'Promo', 'StateHoliday'
+            and 'SchoolHoliday' columns.
+        store_index (dict): The index built by store_index.build_store_index.
+        encoders (dict, optional): Training-time encoder classes by feature
+            (e.g. from a model bundle). StoreType/Assortment are already
+            encoded in the store index; only 'StateHoliday' is read here.
+        feature_names (list): The model features, in training order.
+        history (dict, optional): The history state of the days before the
+            rows (e.g. ModelBundle.history); required when feature_names
+            include history features.
+        history_cutoff (str or datetime, optional): Last date whose sales the
+            history features may use (see history.history_features).
+
+    Returns:
+        pd.DataFrame: The model features in training order.
+    """
+    df = pd.DataFrame({'Date': pd.to_datetime(rows['Date']).to_numpy()})
+    calendar, date_codes = _date_dimension(df['Date'])
+    df = _create_date_features(df, calendar, date_codes)
+    store_features = lookup_store_features(
+        store_index, rows['Store'].to_numpy(),
+        calendar['Year'], calendar['Month'], calendar['WeekOfYear'], date_codes
+    )
+    for feature, values in store_features.items():
+        df[feature] = values
+    df['Store'] = rows['Store'].to_numpy()
+    df['Promo'] = rows['Promo'].to_numpy()
+    df['SchoolHoliday'] = rows['SchoolHoliday'].to_numpy()
+    state_holiday_classes = (encoders or {}).get('StateHoliday', STATE_HOLIDAY_CLASSES)
+    df['StateHoliday'] = encode_state_holiday(rows['StateHoliday'], state_holiday_classes)
+    if any(feature in HISTORY_FEATURES for feature in feature_names):
+        if history is None:
+            raise ValueError("The model uses history features; a history state (ModelBundle.history) is required.")
+        # Tarihler yukarıda zaten ayrıştırıldı; geçmiş hesabına ayrıştırılmış halleri verilir
+        history_rows = rows.assign(Date=df['Date'].to_numpy())
+        for feature, values in history_features(history_rows, history, history_cutoff).items():
+            df[feature] = values.to_numpy()
+    # Kaldırılmış özelliklerle eğitilmiş eski paketler yeniden eğitilmeli
+    missing = [feature for feature in feature_names if feature not in df.columns]
+    if missing:
+        raise ValueError(f"The model uses features this code no longer computes: {missing}; retrain the model.")
+    return df[list(feature_names)]
+
+def engineer_features(df, verbose=True, history_cutoff=None, competition_distance_fill=None):
     """
     Main function to engineer all features for the Rossmann sales model.
 
     Args:
         df (pd.DataFrame): The input dataframe (merged train or test data).
+        verbose (bool): Print a message when done.
+        history_cutoff (str or datetime, optional): Last date whose sales the
+            history features may use (the end of the training period).
+        competition_distance_fill (float, optional): Value of missing
+            CompetitionDistance. Defaults to the median over df's rows.
 
     Returns:
         pd.DataFrame: The dataframe with engineered features.
     """
-    df['Date'] = pd.to_datetime(df['Date'])
-    
-    df = _create_date_features(df)
-    df = _create_competition_features(df)
-    df = _create_promo2_features(df)
-    
-    print("Feature engineering complete.")
-    return df
+    if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+        df['Date'] = pd.to_datetime(df['Date'])
 
+    # Takvim ve mağaza özellikleri satır başına değil, farklı gün ve mağaza başına bir kez hesaplanır
+    calendar, date_codes = _date_dimension(df['Date'])
+    df = _create_date_features(df, calendar, date_codes)
+    df = _create_store_features(df, calendar, date_codes, competition_distance_fill)
+    for feature, values in history_features(df, cutoff=history_cutoff).items():
+        df[feature] = values
+
+    if verbose:
+        print("Feature engineering complete.")
+    return df
@@ -0,0 +1,222 @@
+# Mağaza bazlı geçmiş özellikleri (kayan ortalama, aynı gün gecikmesi) ve tahmin/artımlı
+# güncelleme için saklanan geçmiş durumu
+import numpy as np
+import pandas as pd
+
+from config import (
+    HISTORY_MIN_LAG_DAYS, HISTORY_WINDOWS, HISTORY_LAG_WEEKS, HISTORY_FEATURES
+)
+from schema import COLUMN_SCHEMA
+from storage import load_processed_data
+from store_index import save_store_index, load_store_index
+
+# Geçmiş özellikleri ve model özellikleri için okunan ham sütunlar (Sales ve Open tahmin
+# satırlarında olmayabilir)
+HISTORY_COLUMNS = ['Store', 'Date', 'Sales', 'Open', 'Promo', 'StateHoliday', 'SchoolHoliday']
+
+# Özelliklerin en geriye baktığı gün sayısı; geçmiş durumu bu kadar günle sınırlanır
+LOOKBACK_DAYS = max(HISTORY_MIN_LAG_DAYS + max(HISTORY_WINDOWS) - 1, 7 * max(HISTORY_LAG_WEEKS))
+
+# Sıralama anahtarı: mağaza no üst 32 bitte, 1970'ten beri gün sayısı alt 32 bitte
+_DAY_BITS = 32
+
+if min(HISTORY_LAG_WEEKS) * 7 < HISTORY_MIN_LAG_DAYS:
+    raise ValueError("HISTORY_LAG_WEEKS must not be shorter than HISTORY_MIN_LAG_DAYS.")
+
+def _row_arrays(rows):
+    """The history columns of rows as arrays; sales is NaN where unknown, closed or zero."""
+    days = pd.to_datetime(rows['Date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+    if 'Sales' in rows.columns:
+        sales = pd.to_numeric(rows['Sales']).to_numpy(dtype=np.float64, na_value=np.nan)
+        known = sales > 0
+        if 'Open' in rows.columns:
+            known &= rows['Open'].to_numpy(dtype=np.float64, na_value=np.nan) == 1
+        sales = np.where(known, sales, np.nan)
+    else:
+        sales = np.full(len(rows), np.nan)
+    return {
+        'store': rows['Store'].to_numpy().astype(np.int64),
+        'day': days,
+        'sales': sales,
+    }
+
+def _keys(arrays):
+    return (arrays['store'].astype(np.int64) << _DAY_BITS) | arrays['day'].astype(np.int64)
+
+def _store_rows(state, stores):
+    """Positions of the state records of the given stores (the state is sorted by store)."""
+    offsets = state['offsets']
+    stores = stores[stores < len(offsets) - 1]
+    starts, ends = offsets[stores], offsets[stores + 1]
+    lengths = ends - starts
+    # Her mağazanın [start, end) aralığı tek bir arange ile birleştirilir
+    return np.repeat(starts - np.cumsum(np.r_[0, lengths[:-1]]), lengths) + np.arange(lengths.sum())
+
+def _merge(arrays, state=None, stores=None):
+    """
+    Merges record arrays into the stored history of the given stores as one
+    array set sorted by (Store, Date), one record per store and day. For a
+    day with several records the first record with known sales wins, new
+    records before stored ones, so rows without sales (e.g. the rows to
+    predict) never hide stored sales. Returns the merged timeline and the
+    timeline position of every record of arrays.
+    """
+    size = len(arrays['store'])
+    if state is not None:
+        selected = _store_rows(state, stores)
+        # Yeni kayıtlar önce gelir; kararlı sıralamada aynı gün için yeni değer kalır
+        arrays = {name: np.concatenate([values, state[name][selected].astype(values.dtype)])
+                  for name, values in arrays.items()}
+    keys = _keys(arrays)
+    # Aynı anahtarda satışı bilinen kayıtlar öne alınır (son anahtar lexsort'ta birincil)
+    order = np.lexsort((np.isnan(arrays['sales']), keys))
+    keys = keys[order]
+    first = np.r_[True, keys[1:] != keys[:-1]]
+    timeline = {name: values[order][first] for name, values in arrays.items()}
+    # Sıralamanın tersiyle her girdi kaydının (tekrarlarda ilk kaydın) konumu
+    positions = np.empty(len(order), dtype=np.int64)
+    positions[order] = np.cumsum(first) - 1
+    return timeline, positions[:size]
+
+def _timeline(rows, state=None):
+    """The merged timeline of the rows' stores and the timeline position of every row."""
+    arrays = _row_arrays(rows)
+    return _merge(arrays, state, np.unique(arrays['store']))
+
+def _timeline_features(timeline, cutoff_day=None):
+    """
+    Computes every history feature for every timeline record. The sales are
+    laid out on a dense store x calendar-day grid, so window sums and lags
+    are plain index arithmetic on its cumulative sums, in O(records + grid).
+    """
+    store, day = timeline['store'], timeline['day']
+    sales = timeline['sales']
+    known = ~np.isnan(sales)
+    if cutoff_day is not None:
+        # Kesim tarihinden sonraki satışlar hiçbir özellikte kullanılmaz
+        known &= day <= cutoff_day
+
+    # Zaman çizelgesi mağazaya göre sıralı: mağaza kodu, mağaza değişimlerinin birikimli toplamı
+    store_code = np.cumsum(np.r_[0, store[1:] != store[:-1]])
+    first_day = day.min()
+    span = int(day.max() - first_day + 1)
+    store_base = store_code * span
+    cell = store_base + (day - first_day)
+    grid_size = (store_code[-1] + 1) * span
+    sales_sum = np.r_[0.0, np.cumsum(np.bincount(cell, weights=np.where(known, sales, 0.0), minlength=grid_size))]
+    known_count = np.r_[0, np.cumsum(np.bincount(cell, weights=known, minlength=grid_size))]
+
+    features = {}
+    for window in HISTORY_WINDOWS:
+        # [gün - gecikme - pencere + 1, gün - gecikme] aralığındaki açık günler; aralık mağazanın
+        # ilk gününden önceye taşmasın diye kırpılır
+        end = day - HISTORY_MIN_LAG_DAYS - first_day + 1
+        start = np.maximum(end - window, 0)
+        end = np.maximum(end, 0)
+        count = known_count[store_base + end] - known_count[store_base + start]
+        total = sales_sum[store_base + end] - sales_sum[store_base + start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            features[f'SalesMean{window}'] = np.where(count > 0, total / count, np.nan)
+
+    dense_sales = np.full(grid_size, np.nan)
+    dense_sales[cell[known]] = sales[known]
+    for weeks in HISTORY_LAG_WEEKS:
+        offset = day - 7 * weeks - first_day
+        features[f'SalesLagWeek{weeks}'] = np.where(
+            offset >= 0, dense_sales[store_base + np.maximum(offset, 0)], np.nan)
+    return features
+
+def history_features(rows, state=None, cutoff=None):
+    """
+    Computes the history features of HISTORY_FEATURES for each row in one
+    sort by (Store, Date): rolling open-day sales means and same-weekday
+    sales lags, at least HISTORY_MIN_LAG_DAYS old, from cumulative sums over
+    the calendar days of each store. A row's features depend only on its
+    store and date and on the known sales of the state and the rows, so
+    rows without sales (the rows to predict) get the same features whatever
+    other rows are scored with them.
+
+    Args:
+        rows (pd.DataFrame): Rows with 'Store', 'Date' and, when known, 'Sales' and 'Open'.
+        state (dict, optional): Stored history (see build_history_state) of
+            the days before the rows, e.g. from a model bundle.
+        cutoff (str or datetime, optional): Sales after this date are ignored,
+            so rows after it (the validation period) see no sales of their own period.
+
+    Returns:
+        pd.DataFrame: The HISTORY_FEATURES columns, aligned with rows.
+    """
+    if len(rows) == 0:
+        return pd.DataFrame({name: np.empty(0, dtype=COLUMN_SCHEMA[name]) for name in HISTORY_FEATURES},
+                            index=rows.index)
+    timeline, positions = _timeline(rows, state)
+    cutoff_day = None if cutoff is None else pd.Timestamp(cutoff).to_datetime64().astype('datetime64[D]').astype(np.int64)
+    features = _timeline_features(timeline, cutoff_day)
+    return pd.DataFrame({
+        name: features[name][positions].astype(COLUMN_SCHEMA[name]) for name in HISTORY_FEATURES
+    }, index=rows.index)
+
+def _to_state(timeline):
+    """Trims a timeline to the last LOOKBACK_DAYS and stores it in compact dtypes."""
+    keep = timeline['day'] > timeline['day'].max() - LOOKBACK_DAYS
+    store = timeline['store'][keep]
+    return {
+        'store': store.astype(np.int16),
+        'day': timeline['day'][keep].astype(np.int32),
+        'sales': timeline['sales'][keep].astype(np.float32),
+        # offsets[s]:offsets[s + 1] mağaza s'nin kayıtları
+        'offsets': np.searchsorted(store, np.arange(store.max() + 2)),
+    }
+
+def empty_history_state():
+    """A history state without any days, for rows at the start of the data."""
+    return {
+        'store': np.empty(0, dtype=np.int16),
+        'day': np.empty(0, dtype=np.int32),
+        'sales': np.empty(0, dtype=np.float32),
+        'offsets': np.zeros(1, dtype=np.int64),
+    }
+
+def build_history_state(rows):
+    """
+    Builds the history state the features of later days need: the last
+    LOOKBACK_DAYS of sales per store, sorted by
+    (Store, Date), as a dict of arrays.
+
+    Args:
+        rows (pd.DataFrame): Rows with HISTORY_COLUMNS (e.g. the merged train data).
+    """
+    timeline, _ = _timeline(rows)
+    return _to_state(timeline)
+
+def extend_history_state(state, rows):
+    """
+    Adds newly appended days to a history state and drops the days that fall
+    out of LOOKBACK_DAYS, without rereading the full history.
+
+    Args:
+        state (dict): A state from build_history_state or extend_history_state.
+        rows (pd.DataFrame): The new rows, with HISTORY_COLUMNS.
+
+    Returns:
+        dict: The new state; the given state is not modified.
+    """
+    arrays = _row_arrays(rows)
+    # Yeni satırı olmayan mağazaların kayıtları da korunur
+    stores = np.union1d(np.arange(len(state['offsets']) - 1), arrays['store'])
+    return _to_state(_merge(arrays, state, stores)[0])
+
+def history_state_from_dataset(dataset_path):
+    """Builds the history state from the last LOOKBACK_DAYS of the processed Parquet dataset."""
+    last_date = load_processed_data(dataset_path, columns=['Date'])['Date'].max()
+    rows = load_processed_data(dataset_path, columns=HISTORY_COLUMNS,
+                               start_date=last_date - pd.Timedelta(days=LOOKBACK_DAYS))
+    return build_history_state(rows)
+
+def save_history_state(state, state_path):
+    """Saves a history state as one .npy file per array (the store index format)."""
+    save_store_index(state, state_path)
+
+def load_history_state(state_path, mmap=True):
+    """Loads a history state saved by save_history_state."""
+    return load_store_index(state_path, mmap=mmap)
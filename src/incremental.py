@@ -0,0 +1,245 @@
+# Yeni günlerin satışlarıyla mevcut modeli artımlı (incremental) olarak güncelleme
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from config import (
+    RAW_DATA_PATH, PROCESSED_DATA_PATH, PROCESSED_TRAIN_DATASET, MODEL_BUNDLE_PATH, XGB_PARAMS, TARGET,
+    INCREMENTAL_MODE, INCREMENTAL_WINDOW_WEEKS, INCREMENTAL_HOLDOUT_DAYS, INCREMENTAL_ROUNDS,
+    INCREMENTAL_MAX_DEGRADATION, INCREMENTAL_REFIT, INCREMENTAL_LOG_PATH, MODEL_REGISTRY_PATH,
+    MODEL_REGISTRY_PUBLISH
+)
+from data_prep import read_appended_rows, append_processed_rows
+from features import build_feature_matrix
+from history import extend_history_state
+from metrics import evaluation_report, rmspe_score
+from model import train_booster, save_model_bundle, load_model_bundle
+from pipeline import run_training_pipeline
+from registry import publish_bundle
+from storage import load_processed_data, remove_processed_part
+
+INCREMENTAL_MODES = ['continue', 'refresh']
+
+# Özellik üretimi için gereken ham sütunlar
+_WINDOW_COLUMNS = ['Store', 'Date', 'Sales', 'Open', 'Promo', 'StateHoliday', 'SchoolHoliday']
+
+def _window_rows(new_rows, window_weeks):
+    """
+    Returns the recent rows: the last window_weeks of the processed dataset
+    plus the new rows.
+    """
+    new_rows = new_rows[_WINDOW_COLUMNS].copy()
+    new_rows['Date'] = pd.to_datetime(new_rows['Date'])
+    start_date = new_rows['Date'].max() - pd.DateOffset(weeks=window_weeks)
+    history = load_processed_data(PROCESSED_TRAIN_DATASET, columns=_WINDOW_COLUMNS, start_date=start_date)
+    # Kategorik ve metin StateHoliday değerleri aynı sütunda birleşsin diye
+    history['StateHoliday'] = history['StateHoliday'].astype(str)
+    new_rows['StateHoliday'] = new_rows['StateHoliday'].astype(str)
+    return pd.concat([history, new_rows], ignore_index=True)
+
+def _update_booster(booster, dtrain, dval, params, mode, rounds):
+    """Continues boosting (mode 'continue') or recomputes the leaf values (mode 'refresh') on dtrain."""
+    if mode == 'continue':
+        return train_booster(dtrain, dval, params, num_boost_round=rounds, early_stopping_rounds=None,
+                             verbose_eval=False, xgb_model=booster)
+    # Ağaç yapıları korunur, yaprak değerleri yeni veriye göre yeniden hesaplanır
+    refresh_params = {**params, 'process_type': 'update', 'updater': 'refresh', 'refresh_leaf': True}
+    return train_booster(dtrain, dval, refresh_params, num_boost_round=booster.num_boosted_rounds(),
+                         early_stopping_rounds=None, verbose_eval=False, xgb_model=booster)
+
+def _log_run(record, log_path):
+    os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    with open(log_path, 'a') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+
+def _full_retrain(record, reason, params, bundle_path, log_path, publish):
+    print(f"\nFalling back to a full retrain: {reason}")
+    start = time.perf_counter()
+    run_training_pipeline(params=params, publish=publish, bundle_path=bundle_path)
+    record.update({'action': 'full_retrain', 'reason': reason,
+                   'full_retrain_seconds': time.perf_counter() - start})
+    _log_run(record, log_path)
+    return record
+
+def run_incremental_update(mode=INCREMENTAL_MODE, window_weeks=INCREMENTAL_WINDOW_WEEKS,
+                           holdout_days=INCREMENTAL_HOLDOUT_DAYS, rounds=INCREMENTAL_ROUNDS,
+                           max_degradation=INCREMENTAL_MAX_DEGRADATION, fallback=True,
+                           bundle_path=MODEL_BUNDLE_PATH, log_path=INCREMENTAL_LOG_PATH,
+                           publish=MODEL_REGISTRY_PUBLISH, refit=INCREMENTAL_REFIT):
+    """
+    Updates the saved model with the rows appended to train.csv since it was
+    trained, instead of rerunning the whole pipeline.
+
+    Only the appended rows are read from train.csv. Features are built for
+    the recent window (the last window_weeks of the processed dataset plus
+    the new rows) from the bundle's store index and encoders. The newest
+    holdout_days are held out; the model is updated on the rest of the window
+    and both the current and the updated model are scored on the holdout.
+    The update is kept only if it is not more than max_degradation worse;
+    otherwise (and when the update is not possible) the full pipeline runs.
+    A kept update is repeated on the whole window, holdout included, before
+    it is saved (refit). The new rows are appended to the processed dataset
+    before the bundle records them as consumed, so a failed append leaves
+    the checkpoint where it was. Every run is appended to log_path with its
+    timings and scores.
+
+    Args:
+        mode (str): 'continue' adds `rounds` trees to the model; 'refresh'
+            keeps the trees and recomputes their leaf values on the window.
+        window_weeks (int): Weeks of recent history the model is updated on.
+        holdout_days (int): Newest days used to validate the update.
+        rounds (int): Trees added in 'continue' mode.
+        max_degradation (float): Allowed relative increase of the holdout RMSPE.
+        fallback (bool): Run the full pipeline when the update is rejected or
+            not possible; if False the current model is kept.
+        bundle_path (str): The model bundle to update.
+        log_path (str): JSON Lines log of the runs.
+        publish (bool): Publish the updated bundle to the model registry.
+        refit (bool): Repeat the validated update on the whole window; if
+            False the saved model has not seen the holdout days.
+
+    Returns:
+        dict: The log record of the run.
+    """
+    if mode not in INCREMENTAL_MODES:
+        raise ValueError(f"Unknown mode {mode!r}; expected one of {INCREMENTAL_MODES}.")
+    start = time.perf_counter()
+    bundle = load_model_bundle(bundle_path)
+    params = bundle.metadata.get('params') or XGB_PARAMS
+    record = {'run_at': pd.Timestamp.now().isoformat(timespec='seconds'), 'mode': mode,
+              'previous_pipeline_seconds': bundle.metadata.get('pipeline_seconds')}
+
+    def _give_up(reason):
+        if fallback:
+            return _full_retrain(record, reason, params, bundle_path, log_path, publish)
+        print(f"\nKeeping the current model: {reason}")
+        record.update({'action': 'kept', 'reason': reason})
+        _log_run(record, log_path)
+        return record
+
+    # 1. Yeni satırları okuma
+    print("--- Step 1: Reading Appended Rows ---")
+    checkpoint = bundle.metadata.get('raw_checkpoint')
+    if bundle.segmentation:
+        return _give_up("segmented bundles are only retrained in full")
+    if checkpoint is None:
+        return _give_up("the bundle has no raw data checkpoint")
+    try:
+        new_rows, new_checkpoint = read_appended_rows(os.path.join(RAW_DATA_PATH, 'train.csv'), checkpoint)
+    except ValueError as e:
+        return _give_up(str(e))
+    record['new_rows'] = len(new_rows)
+    if new_rows.empty:
+        print("No new rows since the model was trained.")
+        return record
+    timings = {'read': time.perf_counter() - start}
+    print(f"Read {len(new_rows)} new rows ({new_rows['Date'].min()} .. {new_rows['Date'].max()}).")
+
+    # 2. Son pencere için özellikler
+    print("\n--- Step 2: Building Features for the Recent Window ---")
+    step_start = time.perf_counter()
+    try:
+        window = _window_rows(new_rows, window_weeks)
+        X = build_feature_matrix(window, bundle.store_index, bundle.encoders, bundle.features, bundle.history)
+    except (FileNotFoundError, ValueError) as e:
+        return _give_up(str(e))
+    # Model yalnızca açık ve satış olan günlerden öğrenir
+    keep = ((window['Open'] == 1) & (window['Sales'] > 0)).to_numpy()
+    window, X = window[keep].reset_index(drop=True), X[keep].reset_index(drop=True)
+    y = window[TARGET].to_numpy()
+    holdout = (window['Date'] > window['Date'].max() - pd.Timedelta(days=holdout_days)).to_numpy()
+    if holdout.all() or not holdout.any():
+        return _give_up("the window has no rows on one side of the holdout split")
+    timings['features'] = time.perf_counter() - step_start
+    record.update({'window_rows': int((~holdout).sum()), 'holdout_rows': int(holdout.sum())})
+
+    # 3. Modeli güncelleme ve doğrulama
+    print(f"\n--- Step 3: Updating the Model ({mode}) ---")
+    step_start = time.perf_counter()
+    dtrain = xgb.DMatrix(X[~holdout], label=y[~holdout])
+    dval = xgb.DMatrix(X[holdout], label=y[holdout])
+    model = _update_booster(bundle.booster, dtrain, dval, params, mode, rounds)
+    timings['update'] = time.perf_counter() - step_start
+
+    rmspe_before = rmspe_score(y[holdout], bundle.predict(X[holdout]))
+    report = evaluation_report(X[holdout], y[holdout], model.inplace_predict(X[holdout]), bundle.encoders)
+    rmspe_after = report['overall']['rmspe']
+    record.update({'holdout_rmspe_before': float(rmspe_before), 'holdout_rmspe_after': float(rmspe_after)})
+    print(f"Holdout RMSPE: current model {rmspe_before:.4f}, updated model {rmspe_after:.4f}")
+    if rmspe_after > rmspe_before * (1 + max_degradation):
+        record['timings'] = timings
+        return _give_up(f"holdout RMSPE degraded from {rmspe_before:.4f} to {rmspe_after:.4f}")
+
+    if refit:
+        # Doğrulanan güncelleme, en yeni günler de öğrenilsin diye tüm pencere üzerinde tekrarlanır
+        step_start = time.perf_counter()
+        model = _update_booster(bundle.booster, xgb.DMatrix(X, label=y), dval, params, mode, rounds)
+        timings['refit'] = time.perf_counter() - step_start
+
+    # 4. Yeni satırları işlenmiş veriye ekleme ve güncellenen modeli kaydetme
+    print("\n--- Step 4: Saving the Updated Model ---")
+    step_start = time.perf_counter()
+    # Satırlar önce eklenir; ekleme başarısız olursa paketteki kontrol noktası ilerlemez
+    part_index = append_processed_rows(new_rows, RAW_DATA_PATH, PROCESSED_DATA_PATH)
+    # Mağaza indeksi eski paketten bellek eşlemeli okunuyor; paket değiştirilmeden önce kopyalanır
+    store_index = {key: np.array(value) for key, value in bundle.store_index.items()}
+    # Geçmiş durumu tüm geçmiş yeniden okunmadan yeni günlerle genişletilir
+    history = extend_history_state(bundle.history, new_rows) if bundle.history is not None else None
+    previous = bundle.metadata.get('incremental', {})
+    metadata = {
+        **bundle.metadata,
+        'raw_checkpoint': new_checkpoint,
+        'incremental': {
+            'updates': previous.get('updates', 0) + 1,
+            'mode': mode,
+            'data_end_date': str(window['Date'].max().date()),
+            'holdout_rmspe': float(rmspe_after),
+            'refit': refit,
+        },
+    }
+    try:
+        save_model_bundle(model, bundle_path, bundle.features, bundle.encoders, bundle.imputation,
+                          metadata=metadata, store_index=store_index, metrics=report, history=history)
+    except Exception:
+        # Paket kaydedilemezse eklenen satırlar geri alınır; sonraki çalıştırma onları yeniden okur
+        remove_processed_part(PROCESSED_TRAIN_DATASET, part_index)
+        raise
+    if publish:
+        publish_bundle(bundle_path, MODEL_REGISTRY_PATH)
+    timings['save'] = time.perf_counter() - step_start
+    timings['total'] = time.perf_counter() - start
+
+    record.update({'action': 'updated', 'timings': timings})
+    if record['previous_pipeline_seconds']:
+        record['speedup'] = record['previous_pipeline_seconds'] / timings['total']
+        print(f"Updated in {timings['total']:.1f}s "
+              f"(full pipeline: {record['previous_pipeline_seconds']:.1f}s, {record['speedup']:.0f}x).")
+    _log_run(record, log_path)
+    return record
+
+if __name__ == '__main__':
+    # Örnek kullanım (train.csv'ye yeni günler eklendikten sonra, örn. her gece):
+    # python src/incremental.py
+    # python src/incremental.py --mode refresh --window-weeks 8
+    parser = argparse.ArgumentParser(description="Incremental update of the sales model with newly appended rows.")
+    parser.add_argument('--mode', choices=INCREMENTAL_MODES, default=INCREMENTAL_MODE,
+                        help="'continue' adds trees, 'refresh' recomputes the leaf values of the existing trees.")
+    parser.add_argument('--window-weeks', type=int, default=INCREMENTAL_WINDOW_WEEKS)
+    parser.add_argument('--holdout-days', type=int, default=INCREMENTAL_HOLDOUT_DAYS)
+    parser.add_argument('--rounds', type=int, default=INCREMENTAL_ROUNDS, help="Trees added in continue mode.")
+    parser.add_argument('--max-degradation', type=float, default=INCREMENTAL_MAX_DEGRADATION,
+                        help="Allowed relative increase of the holdout RMSPE before a full retrain.")
+    parser.add_argument('--no-fallback', action='store_true',
+                        help="Keep the current model instead of running the full pipeline.")
+    parser.add_argument('--no-refit', action='store_true',
+                        help="Save the validated update without repeating it on the holdout days.")
+    parser.add_argument('--no-publish', action='store_true',
+                        help="Save the updated bundle without publishing it to the model registry.")
+    args = parser.parse_args()
+    run_incremental_update(args.mode, args.window_weeks, args.holdout_days, args.rounds,
+                           args.max_degradation, fallback=not args.no_fallback,
+                           publish=not args.no_publish, refit=not args.no_refit)
@@ -1 +1,250 @@
 # Eğitilmiş modelden tahmin alma mantığı
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import RAW_DATA_PATH, MODEL_BUNDLE_PATH
+from features import build_feature_matrix
+from model import load_model_bundle
+from registry import ModelWatcher, resolve_bundle_path
+from store_index import build_store_index
+
+# Girdi dosyasından tek seferde okunan satır sayısı
+DEFAULT_CHUNK_SIZE = 100000
+
+# Process pool modunda her işçinin kullandığı model paketi ve mağaza indeksi
+_worker_state = {}
+
+def load_scoring_index(bundle, raw_data_path=RAW_DATA_PATH):
+    """
+    Returns the store index saved in the model bundle, or builds one from
+    store.csv with the bundle's encoders and imputation constants if the
+    bundle has none.
+    """
+    if bundle.store_index is not None:
+        return bundle.store_index
+    return build_store_index(
+        pd.read_csv(os.path.join(raw_data_path, 'store.csv')),
+        competition_distance_fill=bundle.imputation.get('CompetitionDistance'),
+        category_classes=bundle.encoders
+    )
+
+def predict_sales(bundle, rows, store_index):
+    """
+    Predicts daily sales for the given rows with a single booster call
+    (one per segment for a segmented bundle).
+    Rows of closed stores (Open == 0) are predicted as 0. History features
+    come only from the bundle's history state, never from a 'Sales' column
+    of the rows, so a row's prediction does not depend on the rows scored
+    with it (chunk size, worker shards).
+
+    Args:
+        bundle (model.ModelBundle): The trained model bundle.
+        rows (pd.DataFrame): Rows as accepted by features.build_feature_matrix,
+            optionally with 'Open'.
+        store_index (dict): The store index (see load_scoring_index).
+
+    Returns:
+        np.ndarray: The predicted sales of each row.
+    """
+    X = build_feature_matrix(rows.drop(columns='Sales', errors='ignore'), store_index, bundle.encoders,
+                             bundle.features, bundle.history)
+    predictions = bundle.predict(X)
+    if 'Open' in rows.columns:
+        predictions = np.where(rows['Open'].to_numpy() == 0, 0, predictions)
+    return predictions
+
+def make_store_date_grid(store_ids, start_date, days, promo=0):
+    """
+    Builds a store x date grid of open days to forecast.
+
+    Args:
+        store_ids (array-like): The stores to include.
+        start_date (str or datetime): The first date of the horizon.
+        days (int): The length of the horizon in days.
+        promo (int): The Promo value used for every row.
+
+    Returns:
+        pd.DataFrame: One row per store and date.
+    """
+    store_ids = np.asarray(store_ids)
+    dates = pd.date_range(start_date, periods=days, freq='D')
+    return pd.DataFrame({
+        'Store': np.repeat(store_ids, len(dates)),
+        'Date': np.tile(dates.to_numpy(), len(store_ids)),
+        'Open': 1,
+        'Promo': promo,
+        'StateHoliday': '0',
+        'SchoolHoliday': 0,
+    })
+
+def _init_worker(model_path, raw_data_path):
+    bundle = load_model_bundle(model_path)
+    # Paralellik işçi sayısından gelir; her işçi tek thread kullanır
+    bundle.set_booster_params({'nthread': 1})
+    _worker_state['bundle'] = bundle
+    _worker_state['store_index'] = load_scoring_index(bundle, raw_data_path)
+    _worker_state['raw_data_path'] = raw_data_path
+
+def _score_shard(task):
+    bundle_path, rows = task
+    # Registry'de yeni bir sürüm devreye alındıysa işçi de o sürümü yükler
+    if _worker_state['bundle'].path != bundle_path:
+        _init_worker(bundle_path, _worker_state['raw_data_path'])
+    return predict_sales(_worker_state['bundle'], rows, _worker_state['store_index'])
+
+def _shard_by_store(rows, num_stores, workers):
+    """Splits the row positions of a chunk into contiguous Store ranges, one per worker."""
+    boundaries = np.linspace(0, num_stores, workers + 1)[1:-1]
+    shard_ids = np.searchsorted(boundaries, rows['Store'].to_numpy(), side='right')
+    return [np.flatnonzero(shard_ids == shard) for shard in range(workers)]
+
+def _iter_input_chunks(input_path, chunksize):
+    if input_path.endswith('.parquet'):
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_path, chunksize=chunksize)
+
+def _output_frame(rows, predictions):
+    """Kaggle submission columns if the input has an Id, otherwise Store/Date/Sales."""
+    if 'Id' in rows.columns:
+        return pd.DataFrame({'Id': rows['Id'].to_numpy(), 'Sales': predictions})
+    return pd.DataFrame({
+        'Store': rows['Store'].to_numpy(),
+        'Date': pd.to_datetime(rows['Date']).to_numpy(),
+        'Sales': predictions,
+    })
+
+def score_batches(chunks, output_path, model_path=MODEL_BUNDLE_PATH, raw_data_path=RAW_DATA_PATH, workers=1,
+                  watch=False):
+    """
+    Scores a stream of row chunks and writes the predictions incrementally.
+
+    Args:
+        chunks (iterable): DataFrames of rows as accepted by predict_sales.
+        output_path (str): A .csv (Kaggle-style when rows have an Id) or .parquet file.
+        model_path (str): The model bundle directory, or a model registry
+            (its current version is used).
+        raw_data_path (str): The folder containing store.csv, used if the bundle has no store index.
+        workers (int): Number of processes. Above 1, each chunk is sharded by
+            Store range across a process pool.
+        watch (bool): Follow the registry's current version while scoring:
+            a newly published version is loaded and warmed up in the
+            background and used from the next chunk on.
+
+    Returns:
+        dict: Timing summary in seconds plus row count, throughput and the
+        model versions used.
+    """
+    timings = {'load': 0.0, 'read': 0.0, 'score': 0.0, 'write': 0.0}
+    start = time.perf_counter()
+    watcher = ModelWatcher(model_path).start() if watch else None
+    bundle = watcher.bundle if watcher else load_model_bundle(resolve_bundle_path(model_path))
+    store_index = load_scoring_index(bundle, raw_data_path)
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(bundle.path, raw_data_path))
+    else:
+        # Booster'ı yükleme süresine dahil etmek için şimdi yükle
+        bundle.booster
+    timings['load'] = time.perf_counter() - start
+    model_versions = [bundle.path]
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    num_rows = 0
+    parquet_writer = None
+    chunks = iter(chunks)
+    try:
+        while True:
+            t = time.perf_counter()
+            rows = next(chunks, None)
+            timings['read'] += time.perf_counter() - t
+            if rows is None:
+                break
+
+            t = time.perf_counter()
+            if watcher is not None and watcher.bundle is not bundle:
+                bundle = watcher.bundle
+                store_index = load_scoring_index(bundle, raw_data_path)
+                model_versions.append(bundle.path)
+            if pool is None:
+                predictions = predict_sales(bundle, rows, store_index)
+            else:
+                shards = _shard_by_store(rows, len(store_index['known']), workers)
+                predictions = np.empty(len(rows), dtype=np.float32)
+                shard_results = pool.map(_score_shard, [(bundle.path, rows.iloc[positions]) for positions in shards])
+                for positions, shard_predictions in zip(shards, shard_results):
+                    predictions[positions] = shard_predictions
+            timings['score'] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            output = _output_frame(rows, predictions)
+            if output_path.endswith('.parquet'):
+                table = pa.Table.from_pandas(output, preserve_index=False)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(output_path, table.schema)
+                parquet_writer.write_table(table)
+            else:
+                output.to_csv(output_path, mode='w' if num_rows == 0 else 'a', header=num_rows == 0, index=False)
+            timings['write'] += time.perf_counter() - t
+            num_rows += len(rows)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+        if pool is not None:
+            pool.shutdown()
+        if watcher is not None:
+            watcher.stop()
+
+    timings['total'] = time.perf_counter() - start
+    timings['rows'] = num_rows
+    timings['rows_per_second'] = num_rows / timings['total'] if timings['total'] > 0 else 0.0
+    timings['model_versions'] = model_versions
+    return timings
+
+def _print_summary(timings, output_path):
+    print(f"Scored {timings['rows']} rows -> {output_path}")
+    for step in ('load', 'read', 'score', 'write', 'total'):
+        print(f"  {step:<6} {timings[step]:8.3f}s")
+    print(f"  {timings['rows_per_second']:,.0f} rows/s")
+    if len(timings['model_versions']) > 1:
+        print(f"  models: {' -> '.join(timings['model_versions'])}")
+
+if __name__ == '__main__':
+    # Örnek kullanım:
+    # python src/inference.py --input data/raw/test.csv --output submission.csv
+    # python src/inference.py --grid 2015-08-01 48 --output forecast.parquet --workers 4
+    # python src/inference.py --input data/raw/test.csv --output submission.csv --model models/registry --watch
+    parser = argparse.ArgumentParser(description="Batch scoring with the trained Rossmann sales model.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help="test.csv-like file (.csv or .parquet) to score.")
+    source.add_argument('--grid', nargs=2, metavar=('START_DATE', 'DAYS'),
+                        help="Score every store over DAYS days starting at START_DATE.")
+    parser.add_argument('--promo', type=int, choices=[0, 1], default=0, help="Promo value for --grid rows.")
+    parser.add_argument('--output', required=True, help="Output .csv or .parquet file.")
+    parser.add_argument('--model', default=MODEL_BUNDLE_PATH, help="Model bundle directory.")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk.")
+    parser.add_argument('--workers', type=int, default=1, help="Processes; shards each chunk by Store.")
+    parser.add_argument('--watch', action='store_true',
+                        help="With a model registry as --model, switch to newly published versions while scoring.")
+    args = parser.parse_args()
+
+    if args.input:
+        input_chunks = _iter_input_chunks(args.input, args.chunksize)
+    else:
+        store_index = load_scoring_index(load_model_bundle(resolve_bundle_path(args.model)))
+        grid = make_store_date_grid(np.flatnonzero(store_index['known']), args.grid[0], int(args.grid[1]), args.promo)
+        input_chunks = (grid.iloc[i:i + args.chunksize] for i in range(0, len(grid), args.chunksize))
+
+    summary = score_batches(input_chunks, args.output, model_path=args.model, workers=args.workers)
+    _print_summary(summary, args.output)
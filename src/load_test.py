@@ -0,0 +1,115 @@
+# Tahmin servisi (server.py) için yük testi
+import argparse
+import asyncio
+import time
+import aiohttp
+import numpy as np
+import pandas as pd
+
+from config import MODEL_BUNDLE_PATH, SERVER_HOST, SERVER_PORT
+from inference import load_scoring_index
+from model import load_model_bundle
+
+DEFAULT_CONCURRENCY = [1, 2, 4, 8, 16, 32, 64]
+
+def _make_payloads(store_ids, num_requests, rows_per_request, start_date, seed=42):
+    """Random store/date rows, one JSON payload per request."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start_date, periods=42, freq='D').strftime('%Y-%m-%d').to_numpy()
+    payloads = []
+    for _ in range(num_requests):
+        payloads.append({'rows': [
+            {
+                'Store': int(store),
+                'Date': str(date),
+                'Promo': int(promo),
+                'SchoolHoliday': int(school),
+            }
+            for store, date, promo, school in zip(
+                rng.choice(store_ids, rows_per_request), rng.choice(dates, rows_per_request),
+                rng.integers(0, 2, rows_per_request), rng.integers(0, 2, rows_per_request)
+            )
+        ]})
+    return payloads
+
+async def _client(session, url, queue, latencies, failures):
+    while True:
+        try:
+            payload = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        start = time.perf_counter()
+        async with session.post(url, json=payload) as response:
+            await response.read()
+            if response.status != 200:
+                failures.append(response.status)
+        latencies.append(time.perf_counter() - start)
+
+async def _get_metrics(session, base_url):
+    async with session.get(f'{base_url}/metrics') as response:
+        return await response.json()
+
+async def run_level(session, base_url, payloads, concurrency):
+    """
+    Sends the payloads with a fixed number of concurrent clients (closed loop).
+
+    Returns:
+        dict: Throughput, client-side latency percentiles and the mean server batch size.
+    """
+    queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+    latencies, failures = [], []
+
+    before = await _get_metrics(session, base_url)
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _client(session, f'{base_url}/predict', queue, latencies, failures) for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    after = await _get_metrics(session, base_url)
+
+    batches = after['batches'] - before['batches']
+    num_rows = sum(len(payload['rows']) for payload in payloads)
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        'concurrency': concurrency,
+        'requests_per_second': len(payloads) / elapsed,
+        'rows_per_second': num_rows / elapsed,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'mean_batch_rows': (after['rows'] - before['rows']) / batches if batches else 0.0,
+        'failures': len(failures),
+    }
+
+async def run_load_test(base_url, payloads, concurrency_levels):
+    results = []
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max(concurrency_levels))) as session:
+        # Isınma: bağlantıları aç, booster'ı ilk kez çalıştır
+        await run_level(session, base_url, payloads[:max(concurrency_levels)], max(concurrency_levels))
+        for concurrency in concurrency_levels:
+            results.append(await run_level(session, base_url, payloads, concurrency))
+    return results
+
+def _print_results(results):
+    print(f"{'clients':>7} {'req/s':>9} {'rows/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'batch rows':>10} {'failed':>6}")
+    for r in results:
+        print(f"{r['concurrency']:>7} {r['requests_per_second']:>9,.0f} {r['rows_per_second']:>10,.0f} "
+              f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['mean_batch_rows']:>10.1f} {r['failures']:>6}")
+
+if __name__ == '__main__':
+    # Örnek kullanım (önce servisi başlatın: python src/server.py):
+    # python src/load_test.py --requests 2000 --concurrency 1 4 16 64
+    parser = argparse.ArgumentParser(description="Load test for the prediction service.")
+    parser.add_argument('--url', default=f'http://{SERVER_HOST}:{SERVER_PORT}', help="Base URL of the service.")
+    parser.add_argument('--requests', type=int, default=1000, help="Requests per concurrency level.")
+    parser.add_argument('--rows-per-request', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=DEFAULT_CONCURRENCY,
+                        help="Numbers of concurrent clients to test.")
+    parser.add_argument('--start-date', default='2015-08-01', help="First date of the random request rows.")
+    parser.add_argument('--model', default=MODEL_BUNDLE_PATH, help="Model bundle used to pick valid store ids.")
+    args = parser.parse_args()
+
+    store_ids = np.flatnonzero(load_scoring_index(load_model_bundle(args.model))['known'])
+    payloads = _make_payloads(store_ids, args.requests, args.rows_per_request, args.start_date)
+    _print_results(asyncio.run(run_load_test(args.url.rstrip('/'), payloads, args.concurrency)))
@@ -0,0 +1,77 @@
+# Pipeline aşamalarının bellek kullanımını raporlama
+import os
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def rss_mb():
+    """Current resident set size of the process in MB, or None if unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_mb():
+    """Peak resident set size of the process in MB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux kilobayt, macOS bayt döndürür
+    return peak / 1024 ** 2 if os.uname().sysname == 'Darwin' else peak / 1024
+
+def frame_mb(df):
+    """Memory footprint of a DataFrame in MB, including the contents of object columns."""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def report_memory(stage, df=None):
+    """Prints the RSS, peak RSS and (optionally) the DataFrame footprint after a stage."""
+    def _format(value):
+        return 'n/a' if value is None else f"{value:,.0f} MB"
+
+    message = f"[memory] {stage}: RSS {_format(rss_mb())}, peak {_format(peak_rss_mb())}"
+    if df is not None:
+        message += f", frame {frame_mb(df):,.1f} MB ({len(df)} rows x {df.shape[1]} columns)"
+    print(message)
+
+class PeakRssSampler:
+    """
+    Context manager that samples the RSS in a background thread and records
+    the peak reached inside the block (ru_maxrss only grows over the whole
+    process, so it cannot attribute a peak to one stage).
+
+    Example:
+        with PeakRssSampler() as sampler:
+            run_stage()
+        print(sampler.peak_mb)
+    """
+    def __init__(self, interval_seconds=0.005):
+        self.interval_seconds = interval_seconds
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        current = rss_mb()
+        if current is not None:
+            self.peak_mb = current if self.peak_mb is None else max(self.peak_mb, current)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
@@ -0,0 +1,164 @@
+# Tahmin hatası metrikleri: RMSPE, RMSE, MAPE ve bias; genel ve segment kırılımlı
+import json
+import os
+import numpy as np
+
+# Sıfır satışlı satırlarda yüzde hata bu değere bölünür
+ZERO_TARGET = 1e-6
+
+# Metriklerin kırıldığı özellikler (kodlanmış model özellikleri)
+BREAKDOWN_FEATURES = ['Store', 'StoreType', 'DayOfWeek', 'Promo', 'StateHoliday']
+
+METRICS_FILE = 'metrics.json'
+
+# Satır başına toplanan terimler; tüm metrikler bu toplamlardan hesaplanır
+_SUM_TERMS = ['error', 'squared_error', 'squared_percentage_error', 'absolute_percentage_error', 'target']
+
+def _row_terms(y_true, y_pred):
+    """The per-row terms of every metric, computed once in float64."""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    error = np.asarray(y_pred, dtype=np.float64) - y_true
+    percentage_error = error / np.where(y_true == 0, ZERO_TARGET, y_true)
+    return {
+        'error': error,
+        'squared_error': error * error,
+        'squared_percentage_error': percentage_error * percentage_error,
+        'absolute_percentage_error': np.abs(percentage_error),
+        'target': y_true,
+    }
+
+def _finalize(count, sums):
+    """Turns row counts and term sums (scalars or per-group arrays) into the metrics."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'rows': count,
+            'rmspe': np.sqrt(sums['squared_percentage_error'] / count),
+            'rmse': np.sqrt(sums['squared_error'] / count),
+            'mape': sums['absolute_percentage_error'] / count,
+            # Pozitif bias tahminlerin ortalamada fazla olduğunu gösterir
+            'bias': sums['error'] / count,
+            'bias_pct': sums['error'] / sums['target'],
+        }
+
+def _to_python(metrics):
+    return {key: int(value) if key == 'rows' else float(value) for key, value in metrics.items()}
+
+def rmspe_score(y_true, y_pred):
+    """Root mean squared percentage error; zero targets count as ZERO_TARGET."""
+    percentage_error = _row_terms(y_true, y_pred)['squared_percentage_error']
+    return float(np.sqrt(percentage_error.mean()))
+
+def regression_metrics(y_true, y_pred):
+    """
+    Computes RMSPE, RMSE, MAPE and bias in one pass over the predictions.
+
+    Returns:
+        dict: 'rows', 'rmspe', 'rmse', 'mape', 'bias' (mean of prediction -
+        target) and 'bias_pct' (total error over total target).
+    """
+    terms = _row_terms(y_true, y_pred)
+    return _to_python(_finalize(len(terms['error']), {name: terms[name].sum() for name in _SUM_TERMS}))
+
+def _group_codes(values):
+    """Non-negative integer group codes for np.bincount and the value of each code."""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer) and (len(values) == 0 or values.min() >= 0):
+        # Küçük tamsayılar (mağaza no, gün, kodlanmış kategori) doğrudan kod olarak kullanılır
+        return values, None
+    uniques, codes = np.unique(values, return_inverse=True)
+    return codes, uniques
+
+def grouped_metrics(groups, y_true, y_pred, labels=None, terms=None):
+    """
+    Computes the metrics of every group with np.bincount reductions.
+
+    Args:
+        groups (array-like): The group of each row.
+        y_true, y_pred (array-like): Targets and predictions.
+        labels (list, optional): Display label of each integer group code
+            (e.g. the encoder classes of a categorical feature).
+        terms (dict, optional): Precomputed per-row terms, to share one pass
+            between several breakdowns.
+
+    Returns:
+        dict: {label: metrics} for the groups that have rows.
+    """
+    terms = terms if terms is not None else _row_terms(y_true, y_pred)
+    codes, uniques = _group_codes(groups)
+    counts = np.bincount(codes)
+    sums = {name: np.bincount(codes, weights=terms[name], minlength=len(counts)) for name in _SUM_TERMS}
+    metrics = _finalize(counts, sums)
+
+    result = {}
+    for code in np.flatnonzero(counts):
+        value = uniques[code] if uniques is not None else code
+        label = labels[value] if labels is not None and 0 <= value < len(labels) else value
+        result[str(label)] = _to_python({name: metric[code] for name, metric in metrics.items()})
+    return result
+
+def evaluation_report(X, y_true, y_pred, encoders=None, breakdown=BREAKDOWN_FEATURES):
+    """
+    Computes the overall metrics and their breakdown by each feature in
+    breakdown, sharing one pass of per-row terms.
+
+    Args:
+        X (pd.DataFrame): The encoded model features of the rows.
+        y_true, y_pred (array-like): Targets and predictions.
+        encoders (dict, optional): Encoder classes, used to label encoded categories.
+        breakdown (list): Features to break the metrics down by.
+
+    Returns:
+        dict: {'overall': metrics, 'breakdown': {feature: {label: metrics}}}.
+    """
+    terms = _row_terms(y_true, y_pred)
+    encoders = encoders or {}
+    return {
+        'overall': _to_python(_finalize(len(terms['error']), {name: terms[name].sum() for name in _SUM_TERMS})),
+        'breakdown': {
+            feature: grouped_metrics(X[feature].to_numpy(), None, None, encoders.get(feature), terms)
+            for feature in breakdown if feature in X.columns
+        },
+    }
+
+class RMSPEMetric:
+    """
+    RMSPE as an xgb.train custom_metric. The labels of each DMatrix are read
+    once and their inverses kept, so a boosting round neither copies nor
+    modifies the label array; it only does arithmetic on the predictions.
+    """
+    def __init__(self):
+        self._labels = {}
+
+    def __call__(self, predt, dmatrix):
+        key = dmatrix.handle.value
+        if key not in self._labels:
+            labels = dmatrix.get_label().astype(np.float64)
+            self._labels[key] = (labels, 1.0 / np.where(labels == 0, ZERO_TARGET, labels))
+        labels, inverse = self._labels[key]
+        percentage_error = (labels - predt) * inverse
+        return 'rmspe', float(np.sqrt(np.dot(percentage_error, percentage_error) / len(labels)))
+
+def print_metrics(report, title='Validation'):
+    """Prints the overall metrics, the breakdown RMSPEs and the worst stores."""
+    overall = report['overall']
+    print(f"{title} RMSPE: {overall['rmspe']:.4f}, RMSE: {overall['rmse']:.1f}, "
+          f"MAPE: {overall['mape']:.4f}, bias: {overall['bias']:+.1f} ({overall['bias_pct']:+.2%})")
+    for feature, groups in report['breakdown'].items():
+        if feature == 'Store':
+            worst = sorted(groups.items(), key=lambda item: item[1]['rmspe'], reverse=True)[:5]
+            print(f"  Worst stores by RMSPE: " + ', '.join(f"{store} ({m['rmspe']:.3f})" for store, m in worst))
+            continue
+        print(f"  RMSPE by {feature}: " + ', '.join(f"{label}={m['rmspe']:.3f}" for label, m in groups.items()))
+
+def save_metrics(report, directory):
+    """Writes the report as metrics.json in directory (e.g. a model bundle)."""
+    with open(os.path.join(directory, METRICS_FILE), 'w') as f:
+        json.dump(report, f, indent=2)
+
+def load_metrics(directory):
+    """Reads metrics.json from directory, or returns None if it has none."""
+    path = os.path.join(directory, METRICS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
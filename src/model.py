@@ -1,16 +1,37 @@
 import xgboost as xgb
 import numpy as np
 import pandas as pd
-import joblib
+import json
 import os
+import shutil
+import threading
+import time
 
-def _rmsp_error_xgb(y_pred, y_true):
-    """Custom RMSPE metric for XGBoost evaluation."""
-    y_true = y_true.get_label()
-    y_true[y_true == 0] = 1e-6 # Avoid division by zero
-    percentage_error = (y_true - y_pred) / y_true
-    rmspe = np.sqrt(np.mean(np.square(percentage_error)))
-    return 'rmspe', rmspe
+from config import COMPILED_PREDICT_MAX_ROWS
+from metrics import (
+    BREAKDOWN_FEATURES, RMSPEMetric, evaluation_report, print_metrics, save_metrics, load_metrics
+)
+from history import save_history_state, load_history_state
+from store_index import save_store_index, load_store_index
+from tree_predictor import compile_booster, predict_compiled, save_compiled_trees, load_compiled_trees
+
+# Model paketinin (bundle) dosya düzeni sürümü; düzen değişirse artırılır:
+# 1: model.ubj, manifest.json, store_index/
+# 2: segments/ (segment modelleri ve manifest'te 'segmentation')
+# 3: history/ (geçmiş özellikleri için son günlerin durumu)
+# 4: compiled_trees/ (küçük batch'ler için derlenmiş ağaçlar)
+BUNDLE_FORMAT_VERSION = 4
+# Eski düzenler yeni düzenin alt kümesidir; eksik klasörler o parçaların olmadığı anlamına gelir
+MIN_BUNDLE_FORMAT_VERSION = 1
+_BOOSTER_FILE = 'model.ubj'
+_MANIFEST_FILE = 'manifest.json'
+_STORE_INDEX_DIR = 'store_index'
+_HISTORY_DIR = 'history'
+# Global booster'ın NumPy dizilerine derlenmiş hali (küçük batch'ler için)
+_COMPILED_TREES_DIR = 'compiled_trees'
+# Segment modelleri ve mağaza -> segment eşlemesi bu klasörde tutulur
+_SEGMENTS_DIR = 'segments'
+_STORE_SEGMENT_FILE = 'store_segment.npy'
 
 def train_model(X_train, y_train, X_val, y_val, params):
     """
@@ -28,56 +49,339 @@ def train_model(X_train, y_train, X_val, y_val, params):
     """
     dtrain = xgb.DMatrix(X_train, label=y_train)
     dval = xgb.DMatrix(X_val, label=y_val)
-    
+    return train_booster(dtrain, dval, params)
+
+def train_booster(dtrain, dval, params, num_boost_round=1000, early_stopping_rounds=50, verbose_eval=100,
+                  callbacks=None, xgb_model=None):
+    """
+    Trains an XGBoost model on already built DMatrix objects, early-stopping
+    on the validation RMSPE.
+
+    Args:
+        dtrain (xgb.DMatrix): Training features and labels.
+        dval (xgb.DMatrix): Validation features and labels.
+        params (dict): XGBoost parameters.
+        num_boost_round (int): Maximum number of boosting rounds.
+        early_stopping_rounds (int): Rounds without RMSPE improvement before stopping.
+        verbose_eval (int or bool): Print the evaluation every this many rounds.
+        callbacks (list, optional): Extra xgb.callback.TrainingCallback objects.
+        xgb_model (xgb.Booster, optional): A trained model to continue from;
+            num_boost_round trees are added to (or, with the 'refresh'
+            updater, recomputed in) a copy of it.
+
+    Returns:
+        xgb.Booster: The trained XGBoost model.
+    """
     watchlist = [(dtrain, 'train'), (dval, 'eval')]
-    
+
     model = xgb.train(
         params,
         dtrain,
-        num_boost_round=1000,
+        num_boost_round=num_boost_round,
         evals=watchlist,
-        custom_metric=_rmsp_error_xgb,
+        custom_metric=RMSPEMetric(),
         maximize=False,
-        early_stopping_rounds=50,
-        verbose_eval=100
+        early_stopping_rounds=early_stopping_rounds,
+        verbose_eval=verbose_eval,
+        callbacks=callbacks,
+        xgb_model=xgb_model
     )
     return model
 
-def evaluate_model(model, X_val, y_val):
+def evaluate_model(model, dval, encoders=None):
     """
-    Evaluates the model on the validation set using RMSPE.
+    Evaluates the model on the validation set: RMSPE, RMSE, MAPE and bias,
+    overall and broken down by store, store type, weekday, promo and holiday.
 
     Args:
         model (xgb.Booster): The trained model.
-        X_val (pd.DataFrame): Validation features.
-        y_val (pd.Series): Validation target.
+        dval (xgb.DMatrix): Validation features and labels.
+        encoders (dict, optional): Encoder classes, used to label the categories.
+
+    Returns:
+        dict: The report of metrics.evaluation_report.
     """
-    dval = xgb.DMatrix(X_val)
     y_pred = model.predict(dval)
-    
-    # Use a separate RMSPE calculation for the final validation score
-    y_true_np = y_val.to_numpy()
-    y_true_np[y_true_np == 0] = 1e-6
 
-    rmspe = np.sqrt(np.mean(np.square((y_true_np - y_pred) / y_true_np)))
-    
-    print(f'Final Validation RMSPE: {rmspe:.4f}')
-    return rmspe
+    # Kırılım sütunları DMatrix'ten okunur; doğrulama tablosunun yeniden kurulması gerekmez
+    names = dval.feature_names or []
+    columns = [feature for feature in BREAKDOWN_FEATURES if feature in names]
+    data = dval.get_data()[:, [names.index(feature) for feature in columns]].toarray()
+    X = pd.DataFrame(data.astype(np.int64), columns=columns)
+
+    report = evaluation_report(X, dval.get_label(), y_pred, encoders)
+    print_metrics(report, 'Final Validation')
+    return report
 
-def save_model(model, model_path, model_name):
+def route_predict(store_segment, X, booster_for_segment):
     """
-    Saves the trained model to a file.
+    Predicts with one model per segment. Rows are grouped by segment with a
+    single stable sort and each group is scored with one inplace_predict call,
+    so the Python loop runs over segments, not rows.
+
+    Args:
+        store_segment (np.ndarray): Segment code of each store id (-1: no segment).
+        X (pd.DataFrame): Model features, including 'Store'.
+        booster_for_segment (callable): Returns the booster for a segment code.
+
+    Returns:
+        np.ndarray: The predictions, aligned with X.
+    """
+    predictions = np.empty(len(X), dtype=np.float32)
+    if len(X) == 0:
+        return predictions
+    segment = store_segment[X['Store'].to_numpy()]
+    order = np.argsort(segment, kind='stable')
+    sorted_segment = segment[order]
+    starts = np.flatnonzero(np.r_[True, sorted_segment[1:] != sorted_segment[:-1]])
+    ends = np.r_[starts[1:], len(order)]
+    for start, end in zip(starts, ends):
+        rows = order[start:end]
+        predictions[rows] = booster_for_segment(int(sorted_segment[start])).inplace_predict(X.iloc[rows])
+    return predictions
+
+def save_model_bundle(model, bundle_path, features, encoders, imputation, metadata=None, store_index=None,
+                      segments=None, metrics=None, history=None):
+    """
+    Saves the trained model as a bundle directory: the booster in XGBoost's
+    native UBJSON format, a manifest with the feature list, the categorical
+    encoding tables, the imputation constants and training metadata, and
+    the global booster compiled to NumPy arrays (see tree_predictor) and
+    optionally the store index, the history state and segment models. The
+    bundle is written to a temporary directory first and then moved into place.
 
     Args:
         model (xgb.Booster): The trained model.
-        model_path (str): The directory to save the model in.
-        model_name (str): The name of the model file.
+        bundle_path (str): The bundle directory.
+        features (list): The model features, in training order.
+        encoders (dict): The LabelEncoder classes of each categorical feature.
+        imputation (dict): Constants used to fill missing values.
+        metadata (dict, optional): Training metadata (scores, sizes, parameters).
+        store_index (dict, optional): The store index built with the same encoders.
+        segments (dict, optional): Segment models from segments.train_segment_models:
+            'key', 'labels', 'store_segment', 'models' ({code: xgb.Booster}) and
+            'metrics'. Stores of segments without a model use the global model.
+        metrics (dict, optional): Validation report of metrics.evaluation_report,
+            saved as metrics.json for the report script.
+        history (dict, optional): History state of history.build_history_state,
+            needed to score models with history features.
+    """
+    tmp_path = f"{bundle_path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    model.save_model(os.path.join(tmp_path, _BOOSTER_FILE))
+    _save_compiled(model, tmp_path)
+    if store_index is not None:
+        save_store_index(store_index, os.path.join(tmp_path, _STORE_INDEX_DIR))
+    if metrics is not None:
+        save_metrics(metrics, tmp_path)
+    if history is not None:
+        save_history_state(history, os.path.join(tmp_path, _HISTORY_DIR))
+    segmentation = None
+    if segments is not None:
+        segments_path = os.path.join(tmp_path, _SEGMENTS_DIR)
+        os.makedirs(segments_path)
+        np.save(os.path.join(segments_path, _STORE_SEGMENT_FILE), segments['store_segment'])
+        segment_files = {}
+        for code, booster in segments['models'].items():
+            segment_files[str(code)] = f'segment_{code}.ubj'
+            booster.save_model(os.path.join(segments_path, segment_files[str(code)]))
+        segmentation = {
+            'key': segments['key'],
+            'labels': list(segments['labels']),
+            'models': segment_files,
+            'metrics': segments.get('metrics', {}),
+        }
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'xgboost_version': xgb.__version__,
+        'features': list(features),
+        'encoders': {feature: [str(c) for c in classes] for feature, classes in encoders.items()},
+        'imputation': imputation,
+        'metadata': metadata or {},
+        'segmentation': segmentation,
+    }
+    with open(os.path.join(tmp_path, _MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+    if os.path.exists(bundle_path):
+        shutil.rmtree(bundle_path)
+    os.replace(tmp_path, bundle_path)
+    print(f"Model saved to {bundle_path}")
+
+def _save_compiled(booster, bundle_path):
+    try:
+        save_compiled_trees(compile_booster(booster), os.path.join(bundle_path, _COMPILED_TREES_DIR))
+    except ValueError as e:
+        # Derlenemeyen modeller (örn. kategorik bölmeler) her zaman booster ile tahmin edilir
+        print(f"Compiled trees not saved: {e}")
+
+def export_compiled_trees(bundle):
+    """Compiles the global booster of an existing bundle and saves it into the bundle."""
+    _save_compiled(bundle.booster, bundle.path)
+    bundle._compiled_trees = None
+    print(f"Compiled trees saved to {os.path.join(bundle.path, _COMPILED_TREES_DIR)}")
+
+class ModelBundle:
     """
-    if not os.path.exists(model_path):
-        os.makedirs(model_path)
-    
-    file_path = os.path.join(model_path, model_name)
-    joblib.dump(model, file_path)
-    print(f"Model saved to {file_path}")
+    A saved model bundle. Only the manifest is read when the bundle is opened;
+    the boosters are loaded on first use and the store index is memory-mapped.
+    """
+
+    def __init__(self, bundle_path, manifest):
+        self.path = bundle_path
+        self.manifest = manifest
+        self._booster = None
+        self._segment_boosters = {}
+        self._store_segment = None
+        self._store_index = None
+        self._history = None
+        self._compiled_trees = None
+        self._booster_params = {}
+        self._lock = threading.Lock()
+
+    def _load_booster(self, booster_path):
+        booster = xgb.Booster()
+        booster.load_model(booster_path)
+        if self._booster_params:
+            booster.set_param(self._booster_params)
+        return booster
+
+    @property
+    def format_version(self):
+        """The layout version the bundle was saved with (see BUNDLE_FORMAT_VERSION)."""
+        return self.manifest['format_version']
+
+    @property
+    def features(self):
+        return self.manifest['features']
+
+    @property
+    def encoders(self):
+        return self.manifest['encoders']
+
+    @property
+    def imputation(self):
+        return self.manifest['imputation']
+
+    @property
+    def metadata(self):
+        return self.manifest['metadata']
+
+    @property
+    def metrics(self):
+        """The saved validation report (see metrics.evaluation_report), or None."""
+        return load_metrics(self.path)
+
+    @property
+    def segmentation(self):
+        """The segmentation section of the manifest, or None for a single global model."""
+        return self.manifest.get('segmentation')
+
+    @property
+    def booster(self):
+        """The global booster."""
+        with self._lock:
+            if self._booster is None:
+                self._booster = self._load_booster(os.path.join(self.path, _BOOSTER_FILE))
+        return self._booster
+
+    def set_booster_params(self, params):
+        """Sets XGBoost parameters (e.g. nthread) on every loaded and later loaded booster."""
+        with self._lock:
+            self._booster_params.update(params)
+            for booster in [self._booster] + list(self._segment_boosters.values()):
+                if booster is not None:
+                    booster.set_param(params)
 
+    def segment_booster(self, code):
+        """The booster of a segment, or the global booster if the segment has no model."""
+        file_name = self.segmentation['models'].get(str(code))
+        if file_name is None:
+            return self.booster
+        with self._lock:
+            if code not in self._segment_boosters:
+                self._segment_boosters[code] = self._load_booster(
+                    os.path.join(self.path, _SEGMENTS_DIR, file_name)
+                )
+        return self._segment_boosters[code]
 
+    def predict(self, X):
+        """
+        Predicts the encoded feature rows, routing them to the segment models
+        when the bundle has them. Batches of up to COMPILED_PREDICT_MAX_ROWS
+        rows of a global model are scored with the compiled trees, without
+        XGBoost's per-call overhead.
+
+        Args:
+            X (pd.DataFrame): Model features in bundle.features order.
+
+        Returns:
+            np.ndarray: The predictions.
+        """
+        if not self.segmentation:
+            if len(X) <= COMPILED_PREDICT_MAX_ROWS and self.compiled_trees is not None:
+                return predict_compiled(self.compiled_trees, X)
+            return self.booster.inplace_predict(X)
+        if self._store_segment is None:
+            self._store_segment = np.load(
+                os.path.join(self.path, _SEGMENTS_DIR, _STORE_SEGMENT_FILE), mmap_mode='r'
+            )
+        return route_predict(self._store_segment, X, self.segment_booster)
+
+    @property
+    def store_index(self):
+        """The bundled store index, or None if the bundle was saved without one."""
+        index_path = os.path.join(self.path, _STORE_INDEX_DIR)
+        if self._store_index is None and os.path.exists(index_path):
+            self._store_index = load_store_index(index_path, mmap=True)
+        return self._store_index
+
+    @property
+    def history(self):
+        """The bundled history state of the last days, or None if the bundle was saved without one."""
+        history_path = os.path.join(self.path, _HISTORY_DIR)
+        if self._history is None and os.path.exists(history_path):
+            self._history = load_history_state(history_path, mmap=True)
+        return self._history
+
+    @property
+    def compiled_trees(self):
+        """The global booster compiled to NumPy arrays (see tree_predictor), or None if it has none."""
+        trees_path = os.path.join(self.path, _COMPILED_TREES_DIR)
+        if self._compiled_trees is None and os.path.exists(trees_path):
+            # Diziler küçük (düğüm başına ~20 bayt); bellek eşlemesiz okunması her adımı hızlandırır
+            self._compiled_trees = load_compiled_trees(trees_path, mmap=False)
+        return self._compiled_trees
+
+def load_model_bundle(bundle_path):
+    """
+    Opens a model bundle saved by save_model_bundle. Bundles of older
+    layouts (BUNDLE_FORMAT_VERSION) open as well; the parts their layout
+    did not have are absent.
+
+    Args:
+        bundle_path (str): The bundle directory.
+
+    Returns:
+        ModelBundle: The bundle; the booster is loaded lazily.
+
+    Raises:
+        ValueError: If the bundle's format is unknown or newer than BUNDLE_FORMAT_VERSION.
+    """
+    manifest_path = os.path.join(bundle_path, _MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"Model bundle not found: {bundle_path}")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    format_version = manifest.get('format_version')
+    if not isinstance(format_version, int) or format_version < MIN_BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model bundle format {format_version} "
+                         f"(expected {MIN_BUNDLE_FORMAT_VERSION}-{BUNDLE_FORMAT_VERSION}): {bundle_path}")
+    if format_version > BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Model bundle format {format_version} is newer than this code supports "
+                         f"({BUNDLE_FORMAT_VERSION}): {bundle_path}")
+    return ModelBundle(bundle_path, manifest)
@@ -0,0 +1,280 @@
+# Ham verinin mağaza aralıklarına (shard) bölünüp birleştirme, özellik mühendisliği ve kodlamanın süreç havuzunda yapılması
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from config import (
+    FEATURES, TARGET, TRAIN_COLUMNS, CATEGORICAL_FEATURES, VALIDATION_WEEKS,
+    PREP_WORKERS, PREP_SHARDS_PER_WORKER, PREP_BLOCK_BYTES
+)
+from data_prep import _build_store_lookup, _join_store_chunk
+from features import engineer_features
+from schema import COLUMN_SCHEMA, ENCODED_DTYPE, csv_dtypes, apply_schema
+from storage import save_processed_data
+from store_index import weighted_median
+
+# Pipeline'ın özellik tablosunda tutulan sütunlar
+OUTPUT_COLUMNS = ['Date', 'Open'] + FEATURES + [TARGET]
+# Süreçler arasındaki bloklar (Arrow IPC) ve çıktı sütunları (.npy) bellek tabanlı dosya sisteminde
+# tutulur; her süreç bunları kopyalamadan eşler (yoksa sistemin geçici klasörü kullanılır)
+_SHARED_PATH = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+_worker_state = {}
+
+def _prefetched(load, items):
+    """
+    Yields load(item) for every item, loading the next item in a background
+    thread while the caller works on the current one (file reads, CSV
+    parsing and Arrow conversions release the GIL).
+    """
+    if not items:
+        return
+    with ThreadPoolExecutor(1) as reader:
+        pending = reader.submit(load, items[0])
+        for item in items[1:]:
+            current = pending.result()
+            pending = reader.submit(load, item)
+            yield current
+        yield pending.result()
+
+def _csv_blocks(csv_path, block_bytes):
+    """Splits the data rows of a CSV into (start, end) byte ranges of about block_bytes, each ending at a line end."""
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        f.readline()
+        offsets = [f.tell()]
+        while offsets[-1] < size:
+            f.seek(offsets[-1] + block_bytes)
+            f.readline()
+            offsets.append(min(f.tell(), size))
+    return list(zip(offsets[:-1], offsets[1:]))
+
+def _shard_starts(store_df, shards):
+    """The first store id of each of about `shards` store ranges with the same number of stores."""
+    store_ids = np.sort(store_df['Store'].to_numpy())
+    positions = np.linspace(0, len(store_ids), shards, endpoint=False).astype(np.int64)
+    return np.unique(store_ids[positions])
+
+def _output_dtype(column):
+    if column == 'Date':
+        return np.dtype('datetime64[ns]')
+    if column in CATEGORICAL_FEATURES:
+        return np.dtype(ENCODED_DTYPE)
+    return np.dtype(COLUMN_SCHEMA[column])
+
+def _init_worker(csv_path, store_df, shard_starts, work_dir):
+    columns = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    _worker_state.update({
+        'csv_path': csv_path,
+        'columns': columns,
+        'dtypes': csv_dtypes(columns),
+        'store_columns': store_df.drop(columns='Store'),
+        'store_lookup': _build_store_lookup(store_df),
+        'shard_starts': shard_starts,
+        'work_dir': work_dir,
+    })
+
+def _read_block(span):
+    with open(_worker_state['csv_path'], 'rb') as f:
+        f.seek(span[0])
+        return f.read(span[1] - span[0])
+
+def _split_blocks(task):
+    """
+    Parses and merges a run of consecutive CSV blocks. The rows of each block
+    are sorted by shard, with their row number in the block, and written as
+    an Arrow IPC file; the result lists the file, where each shard's rows
+    start in it and the statistics the
+    whole dataset is needed for (rows per store, last sales day, StateHoliday values).
+    """
+    first_block, spans = task
+    state = _worker_state
+    results = []
+    for i, data in enumerate(_prefetched(_read_block, spans)):
+        rows = pd.read_csv(io.BytesIO(data), names=state['columns'], header=None, dtype=state['dtypes'])
+        merged = _join_store_chunk(rows, state['store_columns'], state['store_lookup'])
+        merged['Date'] = pd.to_datetime(merged['Date']).astype('datetime64[ns]')
+        merged['_row'] = np.arange(len(merged), dtype=np.int64)
+
+        store_ids = merged['Store'].to_numpy()
+        shard = np.searchsorted(state['shard_starts'], store_ids, side='right') - 1
+        order = np.argsort(shard, kind='stable')
+        merged = merged.take(order)
+        offsets = np.searchsorted(shard[order], np.arange(len(state['shard_starts']) + 1))
+
+        path = os.path.join(state['work_dir'], f'block-{first_block + i:05d}.arrow')
+        table = pa.Table.from_pandas(merged, preserve_index=False)
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        sold = merged.loc[(merged['Open'] == 1) & (merged['Sales'] > 0), 'Date']
+        results.append({
+            'path': path,
+            'offsets': offsets,
+            'store_rows': np.bincount(store_ids, minlength=len(state['store_lookup'])),
+            'last_sales_date': sold.max() if len(sold) else None,
+            'state_holidays': {str(c) for c in merged['StateHoliday'].cat.remove_unused_categories().cat.categories},
+        })
+    return results
+
+def _read_shard(slices):
+    """
+    The merged rows of one shard and their row numbers in train.csv; the
+    Arrow blocks are memory-mapped and sliced without copying.
+    """
+    tables, rows = [], []
+    for path, start, stop, first_row in slices:
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all().slice(start, stop - start)
+        rows.append(table.column('_row').to_numpy() + first_row)
+        tables.append(table.drop_columns(['_row']))
+    return apply_schema(pa.concat_tables(tables).to_pandas()), np.concatenate(rows)
+
+def _encode(values, classes):
+    """Label-encodes a categorical column with the given sorted classes, converting only its categories to strings."""
+    values = values.cat.remove_unused_categories()
+    values = values.cat.rename_categories([str(c) for c in values.cat.categories])
+    return values.cat.set_categories(classes).cat.codes.astype(ENCODED_DTYPE)
+
+def _process_shards(task):
+    """
+    Writes the merged rows of a run of shards to the processed dataset and
+    fills their rows of the shared output columns with their encoded features.
+    """
+    shards, params = task
+    outputs = {column: np.load(path, mmap_mode='r+') for column, path in params['outputs'].items()}
+    for (shard, _), (merged, rows) in zip(shards, _prefetched(_read_shard, [slices for _, slices in shards])):
+        save_processed_data(merged, params['dataset_path'], part_index=shard + 1)
+        df = engineer_features(merged[TRAIN_COLUMNS], verbose=False, history_cutoff=params['history_cutoff'],
+                               competition_distance_fill=params['competition_distance_fill'])
+        # Sınıflar tüm veriden belirlenir; her parçada aynı kodlar kullanılır
+        for feature, classes in params['encoders'].items():
+            df[feature] = _encode(df[feature], classes)
+        # Satırlar train.csv'deki yerlerine yazılır; sonuç süreç sayısından bağımsızdır
+        for column, output in outputs.items():
+            output[rows] = df[column].to_numpy()
+    return len(shards)
+
+def run_parallel_preprocessing(raw_data_path, dataset_path, workers=PREP_WORKERS,
+                               shards_per_worker=PREP_SHARDS_PER_WORKER, block_bytes=PREP_BLOCK_BYTES):
+    """
+    Runs steps 1-4 of the pipeline (merge, load, feature engineering and
+    encoding) in a process pool. train.csv is read in line-aligned blocks,
+    each process parsing and merging a run of them and splitting the rows
+    by store range; then each process builds the features of whole store
+    ranges (the history features need every day of a store). Blocks pass
+    between processes as memory-mapped Arrow files and every process writes
+    its rows straight to their train.csv positions in output columns
+    allocated once in shared memory, so nothing is pickled and the shards
+    are not concatenated by copying.
+    Each process reads its next block or shard in a thread while it
+    computes the current one. The median imputation, the encoder classes
+    and the history cutoff come from the whole dataset, so the result is the
+    serial pipeline's (up to row order) whatever the number of workers.
+
+    Args:
+        raw_data_path (str): The folder with train.csv and store.csv.
+        dataset_path (str): The processed Parquet dataset (rewritten).
+        workers (int): Processes; 1 runs everything in this process.
+        shards_per_worker (int): Store ranges per process.
+        block_bytes (int): Approximate size of the train.csv blocks.
+
+    Returns:
+        tuple: (df, artifacts) where df has OUTPUT_COLUMNS in train.csv row
+        order and artifacts holds the encoder classes and imputation constants.
+    """
+    start_time = time.perf_counter()
+    csv_path = os.path.join(raw_data_path, 'train.csv')
+    store_df = pd.read_csv(os.path.join(raw_data_path, 'store.csv'), dtype=csv_dtypes())
+    workers = max(1, workers)
+    shard_starts = _shard_starts(store_df, workers * shards_per_worker)
+    blocks = _csv_blocks(csv_path, block_bytes)
+
+    work_dir = tempfile.mkdtemp(prefix='rossmann-prep-', dir=_SHARED_PATH)
+    initargs = (csv_path, store_df, shard_starts, work_dir)
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) if workers > 1 else None
+    try:
+        if pool is None:
+            _init_worker(*initargs)
+        run = pool.map if pool else map
+
+        # 1. Ayrıştırma ve birleştirme: her süreç ardışık blokları okur, satırları mağaza aralığına göre ayırır
+        block_tasks = [(int(part[0]), [blocks[i] for i in part])
+                       for part in np.array_split(np.arange(len(blocks)), workers) if len(part)]
+        block_results = [result for results in run(_split_blocks, block_tasks) for result in results]
+
+        store_rows = np.sum([result['store_rows'] for result in block_results], axis=0)
+        sales_dates = [result['last_sales_date'] for result in block_results if result['last_sales_date'] is not None]
+        if not sales_dates:
+            raise ValueError(f"No rows with sales in {csv_path}.")
+        validation_start = max(sales_dates) - pd.DateOffset(weeks=VALIDATION_WEEKS)
+        # Eksik CompetitionDistance seri pipeline'daki gibi tüm satırların medyanıyla doldurulur
+        distance = store_df.set_index('Store')['CompetitionDistance'].reindex(np.arange(len(store_rows)))
+        imputation = {'CompetitionDistance': weighted_median(distance.to_numpy(dtype=np.float64), store_rows)}
+        present = store_df[store_rows[store_df['Store'].to_numpy()] > 0]
+        encoders = {
+            'StoreType': sorted(present['StoreType'].astype(str).unique()),
+            'Assortment': sorted(present['Assortment'].astype(str).unique()),
+            'StateHoliday': sorted(set().union(*(result['state_holidays'] for result in block_results))),
+        }
+
+        # Her mağaza aralığının blok dilimleri; bloğun ilk satırının train.csv'deki sırası ile
+        block_rows = [int(result['offsets'][-1]) for result in block_results]
+        first_rows = np.r_[0, np.cumsum(block_rows)[:-1]]
+        num_rows = sum(block_rows)
+        shards = []
+        for shard in range(len(shard_starts)):
+            slices = [(result['path'], int(result['offsets'][shard]), int(result['offsets'][shard + 1]), int(first_row))
+                      for result, first_row in zip(block_results, first_rows)
+                      if result['offsets'][shard + 1] > result['offsets'][shard]]
+            if slices:
+                shards.append((shard, slices))
+        outputs = {}
+        for column in OUTPUT_COLUMNS:
+            path = os.path.join(work_dir, f'{column}.npy')
+            outputs[column] = np.lib.format.open_memmap(path, mode='w+', dtype=_output_dtype(column), shape=(num_rows,))
+
+        # 2. Özellikler: her süreç ardışık mağaza aralıklarını işler ve çıktı sütunlarındaki satırlarını doldurur
+        if os.path.exists(dataset_path):
+            shutil.rmtree(dataset_path)
+        params = {
+            'dataset_path': dataset_path,
+            'outputs': {column: output.filename for column, output in outputs.items()},
+            'history_cutoff': validation_start - pd.Timedelta(days=1),
+            'competition_distance_fill': imputation['CompetitionDistance'],
+            'encoders': encoders,
+        }
+        shard_tasks = [([shards[i] for i in part], params)
+                       for part in np.array_split(np.arange(len(shards)), workers) if len(part)]
+        list(run(_process_shards, shard_tasks))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        _worker_state.clear()
+        # Eşlenmiş dosyalar silinse de eşlemeler (çıktı sütunları) geçerli kalır
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    df = pd.DataFrame(outputs, copy=False)
+    print(f"Preprocessed {num_rows} rows in {len(blocks)} blocks and {len(shards)} store ranges "
+          f"with {workers} worker(s) in {time.perf_counter() - start_time:.1f}s.")
+    return df, {'encoders': encoders, 'imputation': imputation}
+
+if __name__ == '__main__':
+    # Örnek kullanım:
+    # python src/parallel_prep.py --workers 8     # işlenmiş veri setini 8 süreçle yeniden üretir
+    from config import RAW_DATA_PATH, PROCESSED_TRAIN_DATASET
+
+    parser = argparse.ArgumentParser(description="Merge train.csv/store.csv and engineer features in a process pool.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processes.")
+    parser.add_argument('--shards-per-worker', type=int, default=PREP_SHARDS_PER_WORKER)
+    parser.add_argument('--block-mb', type=int, default=PREP_BLOCK_BYTES // 1024 ** 2,
+                        help="Size of the train.csv blocks (MB).")
+    args = parser.parse_args()
+    run_parallel_preprocessing(RAW_DATA_PATH, PROCESSED_TRAIN_DATASET, args.workers,
+                               args.shards_per_worker, args.block_mb * 1024 ** 2)
@@ -1,76 +1,503 @@
+import argparse
+import json
+import os
+import time
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+import xgboost as xgb
 import warnings
 
 # Proje içi modüller
 from config import (
-    RAW_DATA_PATH, PROCESSED_DATA_PATH, PROCESSED_TRAIN_FILE,
-    MODEL_PATH, MODEL_NAME, FEATURES, TARGET, CATEGORICAL_FEATURES, XGB_PARAMS
+    RAW_DATA_PATH, PROCESSED_DATA_PATH, PROCESSED_TRAIN_DATASET, TRAIN_COLUMNS, MERGE_MEMORY_LIMIT_MB,
+    FEATURES, TARGET, CATEGORICAL_FEATURES, XGB_PARAMS,
+    CACHE_PATH, CACHE_MAX_SIZE_MB, VALIDATION_WEEKS, MODEL_BUNDLE_PATH,
+    SEGMENT_BY, STORE_CLUSTERS_PATH, HISTORY_MIN_LAG_DAYS, HISTORY_WINDOWS, HISTORY_LAG_WEEKS,
+    EXTERNAL_MEMORY, EXTERNAL_MEMORY_BATCH_ROWS, PREP_WORKERS,
+    MODEL_REGISTRY_PATH, MODEL_REGISTRY_PUBLISH
 )
-from data_prep import merge_data
+import cache
+import data_prep
+import features
+import history
+import parallel_prep
+import schema
+import storage
+import store_index
+import tracing
+from data_prep import merge_data, raw_checkpoint
+from external_memory import EXTERNAL_MEMORY_MODES, build_external_matrices
+from storage import load_processed_data
 from features import engineer_features
-from model import train_model, evaluate_model, save_model
+from history import history_state_from_dataset
+from parallel_prep import run_parallel_preprocessing
+from metrics import rmspe_score
+from model import train_booster, evaluate_model, save_model_bundle, route_predict
+from registry import publish_bundle
+from store_index import build_store_index
+from memory import report_memory
+from segments import SEGMENT_KEYS, store_segments, train_segment_models
 
 warnings.filterwarnings('ignore', category=UserWarning, module='pandas')
 
-def run_training_pipeline():
+# Önbelleğe alınan aşamalar
+CACHE_STAGES = ['merge', 'features', 'dmatrix']
+
+# Birleştirilmiş veri setinin hangi girdilerden üretildiğini kaydeden dosya
+# ('_' ile başladığı için pyarrow veri seti okurken yok sayar)
+_MERGE_KEY_FILE = '_merge_key'
+
+def _encode_categorical_features(df):
     """
-    Runs the complete model training pipeline from data prep to model saving.
+    Label-encodes the categorical features in place and returns the encoder
+    classes. The codes match LabelEncoder's (position in the sorted classes)
+    but come from the category codes, without converting values to strings.
     """
+    encoders = {}
+    for feature in CATEGORICAL_FEATURES:
+        values = df[feature]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(str).astype('category')
+        values = values.cat.remove_unused_categories()
+        values = values.cat.rename_categories([str(c) for c in values.cat.categories])
+        classes = sorted(values.cat.categories)
+        df[feature] = values.cat.reorder_categories(classes).cat.codes.astype(schema.ENCODED_DTYPE)
+        encoders[feature] = classes
+    return df, encoders
+
+def _stage_keys():
+    """
+    Computes the cache key of every stage from the raw file digests and the
+    code/config each stage depends on. Each key includes the previous one.
+    """
+    raw_digests = {}
+    for name in ('train.csv', 'store.csv'):
+        raw_path = os.path.join(RAW_DATA_PATH, name)
+        raw_digests[name] = cache.file_digest(raw_path) if os.path.exists(raw_path) else None
+    merge_key = cache.cache_key(
+        raw_digests, cache.source_digest(data_prep), cache.source_digest(storage), cache.source_digest(schema)
+    )
+    features_key = cache.cache_key(
+        merge_key, TRAIN_COLUMNS, FEATURES, CATEGORICAL_FEATURES, TARGET, VALIDATION_WEEKS,
+        [HISTORY_MIN_LAG_DAYS, HISTORY_WINDOWS, HISTORY_LAG_WEEKS],
+        cache.source_digest(features), cache.source_digest(history), cache.source_digest(store_index),
+        cache.source_digest(parallel_prep), cache.source_digest(_encode_categorical_features)
+    )
+    # DMatrix ikili dosyaları, onları yazan XGBoost sürümüne bağlıdır
+    dmatrix_key = cache.cache_key(
+        features_key, VALIDATION_WEEKS, xgb.__version__,
+        cache.source_digest(_validation_start), cache.source_digest(_split_train_validation)
+    )
+    return {'merge': merge_key, 'features': features_key, 'dmatrix': dmatrix_key}
+
+def _read_merge_key():
+    key_path = os.path.join(PROCESSED_TRAIN_DATASET, _MERGE_KEY_FILE)
+    if not os.path.exists(key_path):
+        return None
+    with open(key_path) as f:
+        return f.read().strip()
+
+def _write_merge_key(key):
+    with open(os.path.join(PROCESSED_TRAIN_DATASET, _MERGE_KEY_FILE), 'w') as f:
+        f.write(key)
+
+def _prepare_processed_data(keys, force_stages):
+    """Runs step 1 (merging train.csv and store.csv) unless the raw data is unchanged."""
     # 1. Veri Hazırlama
     print("--- Step 1: Data Preparation ---")
-    merge_data(RAW_DATA_PATH, PROCESSED_DATA_PATH)
-    
+    if 'merge' not in force_stages and _read_merge_key() == keys['merge']:
+        print(f"Raw data unchanged, reusing {PROCESSED_TRAIN_DATASET}.")
+    else:
+        with tracing.stage('merge'):
+            merged = merge_data(RAW_DATA_PATH, PROCESSED_DATA_PATH, memory_limit_mb=MERGE_MEMORY_LIMIT_MB)
+        # Anahtar yalnızca birleştirme başarılıysa yazılır; eski veri yeni anahtarla işaretlenmez
+        if merged:
+            _write_merge_key(keys['merge'])
+        report_memory('merge')
+
+def _cache_features(keys, df, artifacts):
+    cache.save_entry(
+        CACHE_PATH, 'features', keys['features'],
+        lambda path: df.to_parquet(os.path.join(path, 'features.parquet'), index=False),
+        metadata={'rows': len(df), 'artifacts': artifacts}
+    )
+
+def _build_features_parallel(keys, prep_workers):
+    """Runs steps 1-4 in a process pool over store ranges (see parallel_prep.run_parallel_preprocessing)."""
+    print(f"\n--- Steps 1-4: Parallel Preprocessing ({prep_workers} workers) ---")
+    if not os.path.exists(os.path.join(RAW_DATA_PATH, 'train.csv')):
+        print(f"Error: train.csv not found in {RAW_DATA_PATH}. Exiting pipeline.")
+        return None, None
+    with tracing.stage('prep', workers=prep_workers) as span:
+        df, artifacts = run_parallel_preprocessing(RAW_DATA_PATH, PROCESSED_TRAIN_DATASET, prep_workers)
+        span.set(rows=len(df))
+    _write_merge_key(keys['merge'])
+    report_memory('prep', df)
+    _cache_features(keys, df, artifacts)
+    return df, artifacts
+
+def _build_features(keys, force_stages, prep_workers=PREP_WORKERS):
+    """
+    Runs steps 1-4 (merge, load, feature engineering, encoding) unless cached.
+    Returns the encoded frame and the artifacts the model bundle needs
+    (encoder classes and imputation constants). With prep_workers > 1 the
+    steps run in that many processes and the processed dataset is rebuilt
+    from the raw data.
+    """
+    if 'features' not in force_stages:
+        entry_path = cache.lookup_entry(CACHE_PATH, 'features', keys['features'])
+        if entry_path:
+            print("\n--- Steps 1-4: Loaded engineered features from cache ---")
+            artifacts = cache.read_manifest(entry_path)['artifacts']
+            with tracing.stage('load', cached=True) as span:
+                df = pd.read_parquet(os.path.join(entry_path, 'features.parquet'))
+                span.set(rows=len(df))
+            return df, artifacts
+    if prep_workers > 1:
+        return _build_features_parallel(keys, prep_workers)
+
+    _prepare_processed_data(keys, force_stages)
+
     # 2. Veriyi Yükleme
     print("\n--- Step 2: Loading Processed Data ---")
     try:
-        df = pd.read_csv(PROCESSED_TRAIN_FILE, low_memory=False)
-        print(f"Loaded {PROCESSED_TRAIN_FILE} successfully.")
+        with tracing.stage('load') as span:
+            df = load_processed_data(PROCESSED_TRAIN_DATASET, columns=TRAIN_COLUMNS)
+            span.set(rows=len(df))
+        print(f"Loaded {PROCESSED_TRAIN_DATASET} successfully.")
+        report_memory('load', df)
     except FileNotFoundError:
-        print(f"Error: {PROCESSED_TRAIN_FILE} not found. Exiting pipeline.")
-        return
+        print(f"Error: {PROCESSED_TRAIN_DATASET} not found. Exiting pipeline.")
+        return None, None
 
     # 3. Feature Engineering
     print("\n--- Step 3: Feature Engineering ---")
-    df = engineer_features(df)
+    # engineer_features eksik CompetitionDistance'ı tüm satırların medyanıyla doldurur
+    imputation = {'CompetitionDistance': float(df['CompetitionDistance'].median())}
+    # Geçmiş özellikleri yalnızca eğitim dönemindeki satışları kullanır
+    history_cutoff = _validation_start(df) - pd.Timedelta(days=1)
+    with tracing.stage('features', rows=len(df)):
+        df = engineer_features(df, history_cutoff=history_cutoff)
+    report_memory('features', df)
 
     # 4. Kategorik Veri Kodlama
     print("\n--- Step 4: Encoding Categorical Features ---")
-    for feature in CATEGORICAL_FEATURES:
-        le = LabelEncoder()
-        df[feature] = le.fit_transform(df[feature].astype(str))
+    with tracing.stage('encoding', rows=len(df)):
+        df, encoders = _encode_categorical_features(df)
     print("Categorical features encoded.")
+    report_memory('encoding', df)
 
-    # 5. Eğitim ve Validasyon Setlerini Ayırma
-    print("\n--- Step 5: Splitting Data into Train/Validation Sets ---")
+    artifacts = {'encoders': encoders, 'imputation': imputation}
+    df = df[['Date', 'Open'] + FEATURES + [TARGET]]
+    _cache_features(keys, df, artifacts)
+    return df, artifacts
+
+def _training_rows(df):
+    """Keeps the rows the model learns from."""
     # Sadece mağazalar açıkken ve satış varken olan veriyi al
-    df_train = df[(df['Open'] == 1) & (df['Sales'] > 0)]
-    
+    return df[(df['Open'] == 1) & (df['Sales'] > 0)]
+
+def _validation_start(df):
+    """First date of the validation period: the last VALIDATION_WEEKS before the last sales day."""
+    keep = (df['Open'] == 1) & (df['Sales'] > 0)
+    return df.loc[keep, 'Date'].max() - pd.DateOffset(weeks=VALIDATION_WEEKS)
+
+def _split_train_validation(df):
+    """Splits the encoded frame into the train and the last VALIDATION_WEEKS of validation data."""
+    # Sadece mağazalar açıkken ve satış varken olan veriyi al; ara tablo kopyalanmaz,
+    # her küme tek bir .loc ile seçilir
+    keep = (df['Open'] == 1) & (df['Sales'] > 0)
+
     # Zaman bazlı ayırma
-    validation_date = df_train['Date'].max() - pd.DateOffset(weeks=6)
-    train_indices = df_train['Date'] < validation_date
-    val_indices = df_train['Date'] >= validation_date
+    validation_date = _validation_start(df)
+    train_indices = keep & (df['Date'] < validation_date)
+    val_indices = keep & (df['Date'] >= validation_date)
 
-    X_train, y_train = df_train[train_indices][FEATURES], df_train[train_indices][TARGET]
-    X_val, y_val = df_train[val_indices][FEATURES], df_train[val_indices][TARGET]
+    X_train, y_train = df.loc[train_indices, FEATURES], df.loc[train_indices, TARGET]
+    X_val, y_val = df.loc[val_indices, FEATURES], df.loc[val_indices, TARGET]
     print(f"Training set size: {len(X_train)}")
     print(f"Validation set size: {len(X_val)}")
+    return X_train, y_train, X_val, y_val
+
+def load_training_rows(force=False):
+    """
+    Returns the encoded training rows (open days with sales) before the
+    train/validation split, reusing the cached engineered features.
+
+    Args:
+        force (bool): Recompute the merge and feature stages.
+
+    Returns:
+        tuple: (df, keys) where df has 'Date', FEATURES and TARGET and keys
+        are the stage cache keys, or (None, keys) if the processed data is missing.
+    """
+    keys = _stage_keys()
+    df, _ = _build_features(keys, {'merge', 'features'} if force else set())
+    if df is None:
+        return None, keys
+    return _training_rows(df), keys
+
+def load_train_validation(force=False):
+    """
+    Returns the train/validation split used by the pipeline, reusing the
+    cached engineered features when the inputs are unchanged.
+
+    Args:
+        force (bool): Recompute the merge and feature stages.
+
+    Returns:
+        tuple: (X_train, y_train, X_val, y_val, keys) where keys are the stage cache keys,
+        or None if the processed data is missing.
+    """
+    keys = _stage_keys()
+    df, _ = _build_features(keys, {'merge', 'features'} if force else set())
+    if df is None:
+        return None
+    return _split_train_validation(df) + (keys,)
+
+def _build_dmatrices(keys, force_stages, prep_workers=PREP_WORKERS):
+    """Runs steps 1-5 and builds the train/validation DMatrix objects unless cached."""
+    if 'dmatrix' not in force_stages:
+        entry_path = cache.lookup_entry(CACHE_PATH, 'dmatrix', keys['dmatrix'])
+        if entry_path:
+            print("--- Steps 1-5: Loaded train/validation DMatrix from cache ---")
+            artifacts = cache.read_manifest(entry_path)['artifacts']
+            with tracing.stage('dmatrix', cached=True) as span:
+                dtrain = xgb.DMatrix(os.path.join(entry_path, 'train.buffer'))
+                dval = xgb.DMatrix(os.path.join(entry_path, 'val.buffer'))
+                span.set(train_rows=dtrain.num_row(), val_rows=dval.num_row())
+            return dtrain, dval, artifacts
+
+    df, artifacts = _build_features(keys, force_stages, prep_workers)
+    if df is None:
+        return None
+
+    # 5. Eğitim ve Validasyon Setlerini Ayırma
+    print("\n--- Step 5: Splitting Data into Train/Validation Sets ---")
+    with tracing.stage('split', rows=len(df)) as span:
+        X_train, y_train, X_val, y_val = _split_train_validation(df)
+        span.set(train_rows=len(X_train), val_rows=len(X_val))
+
+    with tracing.stage('dmatrix', train_rows=len(X_train), val_rows=len(X_val)):
+        dtrain = xgb.DMatrix(X_train, label=y_train)
+        dval = xgb.DMatrix(X_val, label=y_val)
+    report_memory('dmatrix', X_train)
+
+    def _write_buffers(path):
+        dtrain.save_binary(os.path.join(path, 'train.buffer'))
+        dval.save_binary(os.path.join(path, 'val.buffer'))
+
+    cache.save_entry(
+        CACHE_PATH, 'dmatrix', keys['dmatrix'], _write_buffers,
+        metadata={'train_rows': len(X_train), 'val_rows': len(X_val), 'artifacts': artifacts}
+    )
+    return dtrain, dval, artifacts
+
+def _build_external_matrices(keys, force_stages, mode, batch_rows):
+    """
+    Runs step 1 and streams the features of steps 2-5 batch by batch into
+    the train/validation matrices (see external_memory.build_external_matrices),
+    without loading the training data.
+    """
+    _prepare_processed_data(keys, force_stages)
+    if not os.path.exists(PROCESSED_TRAIN_DATASET):
+        print(f"Error: {PROCESSED_TRAIN_DATASET} not found. Exiting pipeline.")
+        return None
+
+    print(f"\n--- Steps 2-5: Streaming Features in Batches ({mode}) ---")
+    with tracing.stage('external_memory', mode=mode, batch_rows=batch_rows) as span:
+        dtrain, dval, artifacts = build_external_matrices(
+            PROCESSED_TRAIN_DATASET, pd.read_csv(os.path.join(RAW_DATA_PATH, 'store.csv')), mode, batch_rows
+        )
+        span.set(train_rows=dtrain.num_row(), val_rows=dval.num_row())
+    report_memory('dmatrix')
+    return dtrain, dval, artifacts
+
+def load_params_file(params_path):
+    """Reads XGBoost parameters exported by tuning.py (or a plain parameter dict) from JSON."""
+    with open(params_path) as f:
+        params = json.load(f)
+    return params.get('params', params)
+
+def _train_segments(model, store_index, segment_by, params, clusters_path=STORE_CLUSTERS_PATH, workers=None):
+    """Trains the segment models and compares their routed validation RMSPE with the global model's."""
+    X_train, y_train, X_val, y_val, _ = load_train_validation()
+    store_segment, labels = store_segments(store_index, segment_by, clusters_path)
+    models, metrics = train_segment_models(X_train, y_train, X_val, y_val, store_segment, params, workers)
+    for code, segment_metrics in sorted(metrics.items()):
+        print(f"{segment_by}={labels[code]}: RMSPE {segment_metrics['rmspe']:.4f} "
+              f"({segment_metrics['train_rows']} train rows, {segment_metrics['seconds']:.1f}s)")
+
+    routed = route_predict(store_segment, X_val, lambda code: models.get(code, model))
+    rmspe = rmspe_score(y_val, routed)
+    print(f"Segmented Validation RMSPE: {rmspe:.4f}")
+    return {
+        'key': segment_by,
+        'labels': labels,
+        'store_segment': store_segment,
+        'models': models,
+        'metrics': {'validation_rmspe': float(rmspe),
+                    'segments': {str(code): m for code, m in metrics.items()}},
+    }
+
+def _training_store_index(artifacts):
+    """
+    Builds the store index saved with the model from the stores of the
+    training data, the ones the encoders were fitted on.
+    """
+    store_df = pd.read_csv(os.path.join(RAW_DATA_PATH, 'store.csv'))
+    # Eğitim verisinde olmayan mağazaların kategorileri kodlayıcılarda bulunmayabilir
+    stores = load_processed_data(PROCESSED_TRAIN_DATASET, columns=['Store'])['Store'].unique()
+    return build_store_index(
+        store_df[store_df['Store'].isin(stores)],
+        competition_distance_fill=artifacts['imputation']['CompetitionDistance'],
+        category_classes=artifacts['encoders']
+    )
+
+def run_training_pipeline(force=False, invalidate=None, params=None, segment_by=SEGMENT_BY,
+                          clusters_path=STORE_CLUSTERS_PATH, workers=None, external_memory=EXTERNAL_MEMORY,
+                          batch_rows=EXTERNAL_MEMORY_BATCH_ROWS, prep_workers=PREP_WORKERS,
+                          publish=MODEL_REGISTRY_PUBLISH, bundle_path=MODEL_BUNDLE_PATH):
+    """
+    Runs the complete model training pipeline from data prep to model saving.
+    Stage outputs are cached under CACHE_PATH, keyed by the raw data digests
+    and the code/config that produced them, so unchanged stages are skipped.
+
+    Args:
+        force (bool): Recompute every stage, ignoring the cache.
+        invalidate (list, optional): Stage names (any of CACHE_STAGES) whose
+            cache entries are dropped before the run, together with the
+            entries of every later stage.
+        params (dict, optional): XGBoost parameters. Defaults to XGB_PARAMS.
+        segment_by (str, optional): Also train one model per segment (any of
+            SEGMENT_KEYS); predictions are routed to them by store.
+        clusters_path (str): Store -> cluster CSV used by segment_by='StoreCluster'.
+        workers (int, optional): Processes for the segment models.
+        external_memory (str, optional): Train without loading the training
+            data (any of EXTERNAL_MEMORY_MODES): features are built in
+            batches of about batch_rows rows and streamed to XGBoost. The
+            feature and DMatrix caches are not used in this mode.
+        batch_rows (int): Rows per batch of external_memory.
+        prep_workers (int): Processes for steps 1-4 (merge, feature
+            engineering and encoding, sharded by store range); 1 runs them serially.
+        publish (bool): Publish the saved bundle to the model registry as
+            its current version, which running apps swap in.
+        bundle_path (str): The directory the model bundle is saved to.
+    """
+    params = params or XGB_PARAMS
+    if external_memory:
+        if segment_by:
+            raise ValueError("Segment models need the training rows in memory; "
+                             "they cannot be combined with external_memory.")
+        # Akıtılan (streamed) matrisler yalnızca histogram yöntemiyle eğitilebilir
+        params = {**params, 'tree_method': 'hist'}
+    start = time.perf_counter()
+    # incremental.py bu noktadan sonra train.csv'ye eklenen satırları okur
+    train_csv_path = os.path.join(RAW_DATA_PATH, 'train.csv')
+    checkpoint = raw_checkpoint(train_csv_path) if os.path.exists(train_csv_path) else None
+    if force:
+        force_stages = set(CACHE_STAGES)
+    elif invalidate:
+        # Bir aşama yeniden hesaplanınca ondan sonraki aşamalar da yeniden hesaplanır
+        first_stage = min(CACHE_STAGES.index(stage) for stage in invalidate)
+        force_stages = set(CACHE_STAGES[first_stage:])
+        cache.invalidate_stages(CACHE_PATH, sorted(force_stages - {'merge'}))
+    else:
+        force_stages = set()
+
+    keys = _stage_keys()
+    if external_memory:
+        matrices = _build_external_matrices(keys, force_stages, external_memory, batch_rows)
+    else:
+        matrices = _build_dmatrices(keys, force_stages, prep_workers)
+    if matrices is None:
+        return
+    dtrain, dval, artifacts = matrices
 
     # 6. Model Eğitimi
     print("\n--- Step 6: Model Training ---")
-    model = train_model(X_train, y_train, X_val, y_val, XGB_PARAMS)
+    callbacks = tracing.boosting_callbacks()
+    with tracing.stage('boosting', train_rows=dtrain.num_row()) as span:
+        model = train_booster(dtrain, dval, params, callbacks=callbacks)
+        tracing.record_boosting(span, callbacks)
+    report_memory('training')
 
     # 7. Model Değerlendirme
     print("\n--- Step 7: Model Evaluation ---")
-    evaluate_model(model, X_val, y_val)
-    
+    with tracing.stage('evaluation', rows=dval.num_row()):
+        report = evaluate_model(model, dval, artifacts['encoders'])
+    rmspe = report['overall']['rmspe']
+
+    store_index = _training_store_index(artifacts)
+    segments = None
+    if segment_by:
+        print(f"\n--- Step 7b: Segment Models by {segment_by} ---")
+        with tracing.stage('segments', segment_by=segment_by):
+            segments = _train_segments(model, store_index, segment_by, params, clusters_path, workers)
+
     # 8. Modeli Kaydetme
     print("\n--- Step 8: Saving Model ---")
-    save_model(model, MODEL_PATH, MODEL_NAME)
-    
+    metadata = {
+        'validation_rmspe': float(rmspe),
+        'best_iteration': model.best_iteration,
+        'train_rows': dtrain.num_row(),
+        'validation_rows': dval.num_row(),
+        'validation_weeks': VALIDATION_WEEKS,
+        'external_memory': external_memory,
+        'params': params,
+        'data_key': keys['dmatrix'],
+        'raw_checkpoint': checkpoint,
+        'pipeline_seconds': time.perf_counter() - start,
+    }
+    with tracing.stage('save'):
+        # Tahmin ve artımlı güncelleme için son günlerin satış geçmişi
+        history_state = history_state_from_dataset(PROCESSED_TRAIN_DATASET)
+        save_model_bundle(
+            model, bundle_path, FEATURES, artifacts['encoders'], artifacts['imputation'],
+            metadata=metadata, store_index=store_index, segments=segments, metrics=report,
+            history=history_state
+        )
+        if publish:
+            publish_bundle(bundle_path, MODEL_REGISTRY_PATH)
+
+    # Önbellek, bu çalıştırmanın girdileri kullanıldıktan sonra sınırına indirilir
+    cache.evict_entries(CACHE_PATH, CACHE_MAX_SIZE_MB)
     print("\n--- Pipeline Finished Successfully! ---")
 
 
 if __name__ == '__main__':
-    run_training_pipeline()
-
+    parser = argparse.ArgumentParser(description="Rossmann sales model training pipeline.")
+    parser.add_argument('--force', action='store_true', help="Recompute every stage, ignoring the cache.")
+    parser.add_argument('--invalidate', nargs='+', choices=CACHE_STAGES, metavar='STAGE',
+                        help=f"Drop cached results of the given stages and the ones after them ({', '.join(CACHE_STAGES)}).")
+    parser.add_argument('--params', metavar='PATH',
+                        help="JSON file of XGBoost parameters (e.g. exported by tuning.py) used instead of XGB_PARAMS.")
+    parser.add_argument('--segment-by', choices=SEGMENT_KEYS, default=SEGMENT_BY,
+                        help="Also train one model per segment; predictions are routed to them by store.")
+    parser.add_argument('--store-clusters', default=STORE_CLUSTERS_PATH, metavar='PATH',
+                        help="CSV with Store and Cluster columns for --segment-by StoreCluster.")
+    parser.add_argument('--workers', type=int, default=None, help="Processes for the segment models.")
+    parser.add_argument('--external-memory', choices=EXTERNAL_MEMORY_MODES, default=EXTERNAL_MEMORY,
+                        help="Stream feature batches from disk instead of loading the training data: "
+                             "'quantile' (binned matrix in memory) or 'extmem' (pages cached on disk).")
+    parser.add_argument('--batch-rows', type=int, default=EXTERNAL_MEMORY_BATCH_ROWS,
+                        help="Rows per batch with --external-memory.")
+    parser.add_argument('--prep-workers', type=int, default=PREP_WORKERS,
+                        help="Processes for merging and feature engineering (sharded by store range).")
+    parser.add_argument('--no-publish', action='store_true',
+                        help="Save the model bundle without publishing it to the model registry.")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="Write per-stage timings, CPU time, peak RSS delta, rows and I/O bytes to this file.")
+    parser.add_argument('--trace-format', choices=tracing.TRACE_FORMATS, default='json',
+                        help="'json' (one JSON record per stage) or 'chrome' (chrome://tracing / Perfetto).")
+    parser.add_argument('--profile', metavar='DIR', help="Run each stage under cProfile and dump its stats to DIR.")
+    args = parser.parse_args()
+    params = load_params_file(args.params) if args.params else None
+    if args.trace or args.profile:
+        tracing.start_tracing(args.trace, args.trace_format, args.profile)
+    try:
+        run_training_pipeline(force=args.force, invalidate=args.invalidate, params=params,
+                              segment_by=args.segment_by, clusters_path=args.store_clusters, workers=args.workers,
+                              external_memory=args.external_memory, batch_rows=args.batch_rows,
+                              prep_workers=args.prep_workers, publish=not args.no_publish)
+    finally:
+        tracing.stop_tracing()
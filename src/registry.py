@@ -0,0 +1,286 @@
+# Sürümlü model kayıt defteri (registry): sağlama toplamları, atomik "güncel sürüm" işaretçisi ve sıcak model değişimi
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from cache import file_digest
+from config import (
+    MODEL_REGISTRY_PATH, MODEL_REGISTRY_KEEP_VERSIONS, MODEL_REGISTRY_POLL_SECONDS, COMPILED_PREDICT_MAX_ROWS
+)
+from model import load_model_bundle
+
+# Güncel sürümü gösteren işaretçi; yeni içerik geçici dosyaya yazılıp os.replace ile değiştirilir
+_POINTER_FILE = 'CURRENT.json'
+_VERSIONS_DIR = 'versions'
+# Her sürüm klasöründeki dosyaların SHA-256 özetleri
+_CHECKSUMS_FILE = 'checksums.json'
+
+def is_registry(path):
+    """True if path is a model registry (has a current-version pointer)."""
+    return os.path.exists(os.path.join(path, _POINTER_FILE))
+
+def version_path(registry_path, version):
+    return os.path.join(registry_path, _VERSIONS_DIR, version)
+
+def list_versions(registry_path):
+    """The published versions, oldest first."""
+    versions_dir = os.path.join(registry_path, _VERSIONS_DIR)
+    if not os.path.exists(versions_dir):
+        return []
+    return sorted(name for name in os.listdir(versions_dir) if name.startswith('v') and name[1:].isdigit())
+
+def read_pointer(registry_path):
+    """The current-version pointer ({'version', 'previous', 'updated_at'}), or None if there is none."""
+    pointer_path = os.path.join(registry_path, _POINTER_FILE)
+    if not os.path.exists(pointer_path):
+        return None
+    with open(pointer_path) as f:
+        return json.load(f)
+
+def resolve_bundle_path(path):
+    """The bundle directory of the current version if path is a registry, otherwise path itself."""
+    pointer = read_pointer(path)
+    return version_path(path, pointer['version']) if pointer else path
+
+def bundle_checksums(bundle_path):
+    """SHA-256 digest of every file of a bundle, by path relative to the bundle."""
+    checksums = {}
+    for root, _, files in os.walk(bundle_path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            relative = os.path.relpath(file_path, bundle_path).replace(os.sep, '/')
+            if relative != _CHECKSUMS_FILE:
+                checksums[relative] = file_digest(file_path)
+    return dict(sorted(checksums.items()))
+
+def verify_version(registry_path, version):
+    """
+    Checks the files of a version against the checksums saved when it was
+    published.
+
+    Raises:
+        ValueError: If a file is missing, added or changed.
+    """
+    path = version_path(registry_path, version)
+    with open(os.path.join(path, _CHECKSUMS_FILE)) as f:
+        expected = json.load(f)
+    actual = bundle_checksums(path)
+    changed = sorted(name for name in expected.keys() | actual.keys() if expected.get(name) != actual.get(name))
+    if changed:
+        raise ValueError(f"Model version {version} does not match its checksums: {changed[:5]}")
+
+def set_current(registry_path, version):
+    """
+    Makes a published version the current one by atomically replacing the
+    pointer file; the version it replaces is recorded as 'previous'.
+    """
+    if version not in list_versions(registry_path):
+        raise ValueError(f"Unknown model version {version!r} in {registry_path}.")
+    pointer = read_pointer(registry_path)
+    previous = pointer['version'] if pointer else None
+    if previous == version:
+        return
+    tmp_path = os.path.join(registry_path, f'.{_POINTER_FILE}.tmp-{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': version, 'previous': previous,
+                   'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S')}, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(registry_path, _POINTER_FILE))
+    print(f"Current model version: {version} (previous: {previous}).")
+
+def rollback(registry_path):
+    """Points the registry back to the previous version (calling it again flips forward again)."""
+    pointer = read_pointer(registry_path)
+    if not pointer or not pointer.get('previous'):
+        raise ValueError(f"No previous model version to roll back to in {registry_path}.")
+    set_current(registry_path, pointer['previous'])
+    return pointer['previous']
+
+def _prune(registry_path, keep):
+    """Removes all but the `keep` newest versions, never the current or the previous one."""
+    pointer = read_pointer(registry_path) or {}
+    protected = {pointer.get('version'), pointer.get('previous')}
+    versions = list_versions(registry_path)
+    for version in versions[:max(len(versions) - keep, 0)]:
+        if version not in protected:
+            shutil.rmtree(version_path(registry_path, version), ignore_errors=True)
+
+def publish_bundle(bundle_path, registry_path=MODEL_REGISTRY_PATH, make_current=True,
+                   keep=MODEL_REGISTRY_KEEP_VERSIONS):
+    """
+    Copies a saved model bundle into the registry as the next version, with
+    the checksums of its files, and makes it the current version. The copy
+    is moved into place only when complete, so a version directory is
+    never seen half-written.
+
+    Args:
+        bundle_path (str): A bundle saved by model.save_model_bundle.
+        registry_path (str): The registry directory (created if missing).
+        make_current (bool): Also point the registry to the new version.
+        keep (int): Newest versions kept; older ones are removed.
+
+    Returns:
+        str: The new version (e.g. 'v0003').
+    """
+    versions = list_versions(registry_path)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+    versions_dir = os.path.join(registry_path, _VERSIONS_DIR)
+    os.makedirs(versions_dir, exist_ok=True)
+    tmp_path = os.path.join(versions_dir, f'.{version}.tmp-{os.getpid()}')
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    shutil.copytree(bundle_path, tmp_path)
+    with open(os.path.join(tmp_path, _CHECKSUMS_FILE), 'w') as f:
+        json.dump(bundle_checksums(tmp_path), f, indent=2)
+    os.replace(tmp_path, version_path(registry_path, version))
+    print(f"Model published to {version_path(registry_path, version)}")
+    if make_current:
+        set_current(registry_path, version)
+    _prune(registry_path, keep)
+    return version
+
+def warm_up(bundle):
+    """
+    Loads everything a prediction reads from a bundle (boosters, store
+    index, history, compiled trees) and runs one prediction on the compiled
+    trees and one on the booster, so the first real request pays no load.
+    """
+    # Tembel yüklenen parçalar şimdi yüklenir
+    bundle.store_index
+    bundle.history
+    for code in (bundle.segmentation or {}).get('models', {}):
+        bundle.segment_booster(int(code))
+    for rows in (1, COMPILED_PREDICT_MAX_ROWS + 1):
+        bundle.predict(pd.DataFrame(np.zeros((rows, len(bundle.features)), dtype=np.float32),
+                                    columns=bundle.features))
+
+class ModelWatcher:
+    """
+    Serves the current model of a registry (or a plain bundle directory,
+    which is never swapped) and follows the registry's pointer. A background
+    thread polls the pointer; when it moves, the new version is verified
+    against its checksums, loaded and warmed up, and only then swapped in.
+    Callers take `bundle` once per request and keep using that object, so a
+    swap never blocks a request or changes the model under it.
+    """
+
+    def __init__(self, path, poll_seconds=MODEL_REGISTRY_POLL_SECONDS, on_swap=None):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.on_swap = on_swap
+        self._stop = threading.Event()
+        self._thread = None
+        self._failed_version = None
+        pointer = read_pointer(path)
+        version = pointer['version'] if pointer else None
+        self._current = (version, self._load(version))
+
+    @property
+    def version(self):
+        """The current version, or None for a plain bundle."""
+        return self._current[0]
+
+    @property
+    def bundle(self):
+        """The current model.ModelBundle."""
+        return self._current[1]
+
+    def _load(self, version):
+        if version is None:
+            bundle = load_model_bundle(self.path)
+        else:
+            verify_version(self.path, version)
+            bundle = load_model_bundle(version_path(self.path, version))
+        warm_up(bundle)
+        return bundle
+
+    def check(self):
+        """
+        Swaps in the registry's current version if the pointer moved since
+        the last check. Returns True if the model was swapped.
+        """
+        pointer = read_pointer(self.path)
+        if pointer is None or pointer['version'] in (self.version, self._failed_version):
+            return False
+        version = pointer['version']
+        start = time.perf_counter()
+        try:
+            bundle = self._load(version)
+        except (OSError, ValueError):
+            # Bozuk sürüm her kontrolde yeniden denenmez; işaretçi değişince tekrar bakılır
+            self._failed_version = version
+            raise
+        previous = self.version
+        # Tek bir atamayla değiştirilir; okuyanlar ya eski ya yeni (sürüm, paket) çiftini görür
+        self._current = (version, bundle)
+        print(f"Model {previous} -> {version} swapped in after {time.perf_counter() - start:.2f}s "
+              f"of loading and warm-up.")
+        if self.on_swap is not None:
+            self.on_swap(version, bundle)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check()
+            except (OSError, ValueError) as e:
+                print(f"Model version not swapped in, keeping {self.version}: {e}")
+
+    def start(self):
+        """Starts polling the pointer in a daemon thread (a no-op for a plain bundle)."""
+        if self._thread is None and is_registry(self.path):
+            self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+if __name__ == '__main__':
+    # Örnek kullanım:
+    # python src/registry.py list                               # sürümler ve güncel sürüm
+    # python src/registry.py publish models/xgb_sales_model     # paketi yeni sürüm olarak yayınla
+    # python src/registry.py promote v0002                      # belirli bir sürüme geç
+    # python src/registry.py rollback                           # bir önceki sürüme dön
+    # python src/registry.py verify v0003                       # sağlama toplamlarını doğrula
+    parser = argparse.ArgumentParser(description="Versioned model registry with an atomic current-version pointer.")
+    parser.add_argument('--registry', default=MODEL_REGISTRY_PATH, help="Registry directory.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="List the versions and the current one.")
+    publish_parser = commands.add_parser('publish', help="Publish a bundle as the next (current) version.")
+    publish_parser.add_argument('bundle', help="Model bundle directory.")
+    publish_parser.add_argument('--no-promote', action='store_true', help="Do not make it the current version.")
+    promote_parser = commands.add_parser('promote', help="Make a version the current one.")
+    promote_parser.add_argument('version')
+    commands.add_parser('rollback', help="Go back to the previous version.")
+    verify_parser = commands.add_parser('verify', help="Check a version against its checksums.")
+    verify_parser.add_argument('version', nargs='?', help="Defaults to the current version.")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        pointer = read_pointer(args.registry) or {}
+        for name in list_versions(args.registry):
+            with open(os.path.join(version_path(args.registry, name), 'manifest.json')) as f:
+                manifest = json.load(f)
+            rmspe = manifest['metadata'].get('validation_rmspe')
+            print(f"{'*' if name == pointer.get('version') else ' '} {name}  {manifest['created_at']}  "
+                  f"RMSPE {rmspe if rmspe is None else f'{rmspe:.4f}'}")
+    elif args.command == 'publish':
+        publish_bundle(args.bundle, args.registry, make_current=not args.no_promote)
+    elif args.command == 'promote':
+        set_current(args.registry, args.version)
+    elif args.command == 'rollback':
+        rollback(args.registry)
+    else:
+        version = args.version or read_pointer(args.registry)['version']
+        verify_version(args.registry, version)
+        print(f"{version}: checksums match.")
@@ -0,0 +1,66 @@
+# Ham, birleştirilmiş ve türetilmiş sütunların en dar doğru veri tipleri
+from config import HISTORY_SALES_FEATURES
+
+COLUMN_SCHEMA = {
+    # train.csv
+    'Store': 'int16',
+    'DayOfWeek': 'int8',
+    'Sales': 'int32',
+    'Customers': 'int16',
+    'Open': 'int8',
+    'Promo': 'int8',
+    'StateHoliday': 'category',
+    'SchoolHoliday': 'int8',
+    # store.csv (eksik değer içeren sayısal sütunlar float32)
+    'StoreType': 'category',
+    'Assortment': 'category',
+    'CompetitionDistance': 'float32',
+    'CompetitionOpenSinceMonth': 'float32',
+    'CompetitionOpenSinceYear': 'float32',
+    'Promo2': 'int8',
+    'Promo2SinceWeek': 'float32',
+    'Promo2SinceYear': 'float32',
+    'PromoInterval': 'category',
+    # engineer_features ile türetilen sütunlar
+    'Year': 'int16',
+    'Month': 'int8',
+    'Day': 'int8',
+    'WeekOfYear': 'int8',
+    'CompetitionOpen': 'int16',
+    'IsPromo2': 'int8',
+    # history.py ile türetilen geçmiş özellikleri (satış ortalamaları ve gecikmeleri)
+    **{feature: 'float32' for feature in HISTORY_SALES_FEATURES},
+}
+
+# Label-encode edilmiş kategorik sütunların tipi
+ENCODED_DTYPE = 'int8'
+
+# Ham veride hem 0 hem '0' olarak gelebilen, kategoriye çevrilmeden önce metne dönüştürülen sütunlar
+_STRING_CODED_COLUMNS = {'StateHoliday'}
+
+def csv_dtypes(columns=None):
+    """Returns the read_csv dtype argument for the schema columns (all of them if columns is None)."""
+    return {
+        column: dtype for column, dtype in COLUMN_SCHEMA.items()
+        if columns is None or column in columns
+    }
+
+def apply_schema(df):
+    """
+    Casts the schema columns of a frame to their schema dtype in place.
+    Columns already at the right dtype are left untouched.
+
+    Args:
+        df (pd.DataFrame): Any frame; columns outside the schema are ignored.
+
+    Returns:
+        pd.DataFrame: The same frame.
+    """
+    for column, dtype in COLUMN_SCHEMA.items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        values = df[column]
+        if dtype == 'category' and column in _STRING_CODED_COLUMNS:
+            values = values.astype(str)
+        df[column] = values.astype(dtype)
+    return df
@@ -0,0 +1,142 @@
+# Segment bazlı (mağaza tipi, ürün çeşitliliği veya mağaza kümesi) çoklu model eğitimi
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from config import FEATURES, STORE_CLUSTERS_PATH, SEGMENT_MIN_ROWS
+from model import train_booster
+
+SEGMENT_KEYS = ['StoreType', 'Assortment', 'StoreCluster']
+
+# Process pool modunda her işçinin bellek eşlemeli (memory-mapped) eğitim verisi
+_worker_state = {}
+
+def store_segments(store_index, segment_by, clusters_path=STORE_CLUSTERS_PATH):
+    """
+    Maps every store id to a segment code.
+
+    Args:
+        store_index (dict): The store index of the model.
+        segment_by (str): One of SEGMENT_KEYS.
+        clusters_path (str): CSV with 'Store' and 'Cluster' columns, for 'StoreCluster'.
+
+    Returns:
+        tuple: (store_segment, labels) where store_segment[store_id] is the
+        segment code (-1 for stores without a segment) and labels[code] its name.
+    """
+    if segment_by == 'StoreType':
+        return store_index['store_type'].astype(np.int32), [str(c) for c in store_index['store_type_classes']]
+    if segment_by == 'Assortment':
+        return store_index['assortment'].astype(np.int32), [str(c) for c in store_index['assortment_classes']]
+    if segment_by == 'StoreCluster':
+        clusters = pd.read_csv(clusters_path)
+        codes, labels = pd.factorize(clusters['Cluster'], sort=True)
+        store_segment = np.full(len(store_index['known']), -1, dtype=np.int32)
+        store_ids = clusters['Store'].to_numpy()
+        in_index = store_ids < len(store_segment)
+        store_segment[store_ids[in_index]] = codes[in_index]
+        return store_segment, [str(label) for label in labels]
+    raise ValueError(f"Unknown segment key {segment_by!r}; expected one of {SEGMENT_KEYS}.")
+
+def _sorted_by_segment(X, y, store_segment):
+    """Sorts rows by segment once and returns the sorted arrays with each segment's row range."""
+    segment = store_segment[X['Store'].to_numpy()]
+    order = np.argsort(segment, kind='stable')
+    sorted_segment = segment[order]
+    codes = np.unique(sorted_segment)
+    ranges = {
+        int(code): (int(np.searchsorted(sorted_segment, code, side='left')),
+                    int(np.searchsorted(sorted_segment, code, side='right')))
+        for code in codes
+    }
+    return X.to_numpy(dtype=np.float32)[order], y.to_numpy(dtype=np.float32)[order], ranges
+
+def _init_worker(data_dir, nthread):
+    _worker_state['arrays'] = {
+        name: np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r')
+        for name in ('X_train', 'y_train', 'X_val', 'y_val')
+    }
+    _worker_state['nthread'] = nthread
+
+def _train_segment(task):
+    code, train_range, val_range, params = task
+    start = time.perf_counter()
+    arrays, nthread = _worker_state['arrays'], _worker_state['nthread']
+    dtrain = xgb.DMatrix(arrays['X_train'][slice(*train_range)], label=arrays['y_train'][slice(*train_range)],
+                         feature_names=FEATURES, nthread=nthread)
+    dval = xgb.DMatrix(arrays['X_val'][slice(*val_range)], label=arrays['y_val'][slice(*val_range)],
+                       feature_names=FEATURES, nthread=nthread)
+    booster = train_booster(dtrain, dval, {**params, 'nthread': nthread}, verbose_eval=False)
+    # Booster işlemler arasında UBJSON baytları olarak taşınır
+    return code, booster.save_raw('ubj'), {
+        'rmspe': float(booster.best_score),
+        'best_iteration': int(booster.best_iteration),
+        'train_rows': train_range[1] - train_range[0],
+        'val_rows': val_range[1] - val_range[0],
+        'seconds': time.perf_counter() - start,
+    }
+
+def train_segment_models(X_train, y_train, X_val, y_val, store_segment, params, workers=None,
+                         min_rows=SEGMENT_MIN_ROWS):
+    """
+    Fits one model per segment concurrently. The train and validation rows are
+    sorted by segment once and written as read-only arrays that every worker
+    memory-maps; each segment model trains on its row range.
+
+    Args:
+        X_train, y_train, X_val, y_val: The pipeline's train/validation split.
+        store_segment (np.ndarray): Segment code of each store id (see store_segments).
+        params (dict): XGBoost parameters.
+        workers (int, optional): Processes. Defaults to min(CPU count, segments);
+            each worker gets cpu_count // workers XGBoost threads.
+        min_rows (int): Segments with fewer training rows (or no validation
+            rows) get no model and fall back to the global model.
+
+    Returns:
+        tuple: ({code: xgb.Booster}, {code: metrics dict}).
+    """
+    X_train_sorted, y_train_sorted, train_ranges = _sorted_by_segment(X_train, y_train, store_segment)
+    X_val_sorted, y_val_sorted, val_ranges = _sorted_by_segment(X_val, y_val, store_segment)
+    tasks = [
+        (code, train_range, val_ranges[code], params)
+        for code, train_range in train_ranges.items()
+        if code >= 0 and train_range[1] - train_range[0] >= min_rows and code in val_ranges
+    ]
+    skipped = sorted(set(train_ranges) - {task[0] for task in tasks})
+    if skipped:
+        print(f"Segments {skipped} use the global model (fewer than {min_rows} rows or no segment).")
+    if not tasks:
+        return {}, {}
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(workers or cpu_count, len(tasks)))
+    nthread = max(1, cpu_count // workers)
+    print(f"Training {len(tasks)} segment models with {workers} worker(s) x {nthread} thread(s).")
+
+    data_dir = tempfile.mkdtemp(prefix='rossmann-segments-')
+    try:
+        for name, array in (('X_train', X_train_sorted), ('y_train', y_train_sorted),
+                            ('X_val', X_val_sorted), ('y_val', y_val_sorted)):
+            np.save(os.path.join(data_dir, f'{name}.npy'), array)
+        if workers > 1:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data_dir, nthread)) as pool:
+                results = list(pool.map(_train_segment, tasks))
+        else:
+            _init_worker(data_dir, nthread)
+            results = [_train_segment(task) for task in tasks]
+            _worker_state.clear()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    models, metrics = {}, {}
+    for code, raw_model, segment_metrics in results:
+        booster = xgb.Booster()
+        booster.load_model(bytearray(raw_model))
+        models[code] = booster
+        metrics[code] = segment_metrics
+    return models, metrics
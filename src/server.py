@@ -0,0 +1,333 @@
+# Eğitilmiş modeli HTTP üzerinden sunan tahmin servisi
+import argparse
+import asyncio
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+from config import MODEL_BUNDLE_PATH, SERVER_HOST, SERVER_PORT, SERVER_MAX_BATCH_ROWS, SERVER_MAX_WAIT_MS
+from features import build_feature_matrix, encode_state_holiday
+from inference import load_scoring_index
+from model import load_model_bundle
+from registry import resolve_bundle_path
+
+# İstekte verilmeyen sütunların varsayılanları (make_store_date_grid ile aynı)
+_ROW_DEFAULTS = {'Open': 1, 'Promo': 0, 'StateHoliday': '0', 'SchoolHoliday': 0}
+_ROW_COLUMNS = ['Store', 'Date'] + list(_ROW_DEFAULTS)
+# Yalnızca 0 veya 1 olabilen sütunlar
+_FLAG_COLUMNS = ['Open', 'Promo', 'SchoolHoliday']
+# Gecikme yüzdelikleri son bu kadar istek üzerinden hesaplanır
+_LATENCY_WINDOW = 10000
+
+class ServerMetrics:
+    """Counters for the /metrics endpoint: batch size histogram and request latencies."""
+
+    def __init__(self, max_batch_rows):
+        # Batch boyutu histogramı için 2'nin kuvvetleri şeklinde üst sınırlar
+        self.batch_size_buckets = [1 << i for i in range(int(np.log2(max(max_batch_rows, 1))) + 1)]
+        if self.batch_size_buckets[-1] < max_batch_rows:
+            self.batch_size_buckets.append(max_batch_rows)
+        self.batch_size_counts = [0] * (len(self.batch_size_buckets) + 1)
+        self.latencies = collections.deque(maxlen=_LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.rows = 0
+
+    def record_batch(self, num_rows):
+        self.batches += 1
+        self.rows += num_rows
+        self.batch_size_counts[int(np.searchsorted(self.batch_size_buckets, num_rows))] += 1
+
+    def record_request(self, seconds, failed=False):
+        self.requests += 1
+        self.errors += int(failed)
+        self.latencies.append(seconds)
+
+    def snapshot(self, queue_depth):
+        latencies_ms = np.asarray(self.latencies) * 1000
+        histogram = {f"le_{bound}": count for bound, count in zip(self.batch_size_buckets, self.batch_size_counts)}
+        histogram['gt_max'] = self.batch_size_counts[-1]
+        return {
+            'queue_depth': queue_depth,
+            'requests': self.requests,
+            'errors': self.errors,
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch_rows': self.rows / self.batches if self.batches else 0.0,
+            'batch_size_histogram': histogram,
+            'latency_ms': {
+                'p50': float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else None,
+                'p99': float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else None,
+                'window': len(latencies_ms),
+            },
+        }
+
+class MicroBatcher:
+    """
+    Coalesces concurrent prediction requests into batches. The first queued
+    request opens a batch; requests arriving within max_wait_ms are added
+    until the batch reaches max_batch_rows, and the whole batch is scored with
+    a single predict_fn call on a worker thread.
+
+    predict_fn receives the list of the batch's request rows and returns one
+    result per request: its predictions, or the exception it failed with.
+    A request's failure is only reported to that request; if predict_fn
+    itself raises, the requests of the batch are scored one by one.
+    """
+
+    def __init__(self, predict_fn, max_batch_rows, max_wait_ms, metrics):
+        self.predict_fn = predict_fn
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics
+        self._queue = asyncio.Queue()
+        # Sığmadığı için bir sonraki batch'e bırakılan istek
+        self._carry = None
+        # Booster çağrıları tek bir thread'de sırayla yapılır; bu sırada gelen
+        # istekler kuyrukta birikir ve bir sonraki batch büyür
+        self._executor = ThreadPoolExecutor(1)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() + (self._carry is not None)
+
+    async def submit(self, rows):
+        """Queues the rows of one request and waits for their predictions."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, future))
+        return await future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        if self._carry is not None:
+            batch, self._carry = [self._carry], None
+        else:
+            batch = [await self._queue.get()]
+        num_rows = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+
+        while num_rows < self.max_batch_rows:
+            try:
+                if self._queue.empty():
+                    item = await asyncio.wait_for(self._queue.get(), max(deadline - loop.time(), 0))
+                else:
+                    item = self._queue.get_nowait()
+            except asyncio.TimeoutError:
+                break
+            if num_rows + len(item[0]) > self.max_batch_rows:
+                self._carry = item
+                break
+            batch.append(item)
+            num_rows += len(item[0])
+        return batch, num_rows
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch, num_rows = await self._next_batch()
+            requests = [item[0] for item in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self.predict_fn, requests)
+            except Exception:
+                # Hatanın hangi istekten geldiği bilinmez; her istek tek başına denenir
+                results = [await self._score_alone(loop, rows) for rows in requests]
+            self.metrics.record_batch(num_rows)
+
+            for result, (_, future) in zip(results, batch):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def _score_alone(self, loop, rows):
+        try:
+            return (await loop.run_in_executor(self._executor, self.predict_fn, [rows]))[0]
+        except Exception as e:
+            return e
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+def predict_requests(bundle, store_index, requests):
+    """
+    Scores the rows of several requests with a single booster call (one per
+    segment for a segmented bundle). The features are built per request, so
+    a request's predictions do not depend on the requests batched with it
+    and a request whose features cannot be built fails alone.
+    Rows of closed stores (Open == 0) are predicted as 0.
+
+    Args:
+        bundle (model.ModelBundle): The trained model bundle.
+        store_index (dict): The store index (see inference.load_scoring_index).
+        requests (list): The rows of each request, as returned by parse_rows.
+
+    Returns:
+        list: Per request, an np.ndarray of predictions or the exception raised
+        while building its features.
+    """
+    results = [None] * len(requests)
+    matrices = []
+    for position, rows in enumerate(requests):
+        try:
+            matrices.append((position, build_feature_matrix(
+                rows, store_index, bundle.encoders, bundle.features, bundle.history)))
+        except Exception as e:
+            results[position] = e
+    if not matrices:
+        return results
+
+    predictions = bundle.predict(pd.concat([X for _, X in matrices], ignore_index=True))
+    offset = 0
+    for position, X in matrices:
+        request_predictions = predictions[offset:offset + len(X)]
+        offset += len(X)
+        results[position] = np.where(requests[position]['Open'].to_numpy() == 0, 0, request_predictions)
+    return results
+
+def parse_rows(records, store_index, encoders):
+    """
+    Validates the rows of a request and fills the optional columns.
+
+    Args:
+        records (list): One dict per row with 'Store' and 'Date' and optionally
+            'Open', 'Promo', 'StateHoliday' and 'SchoolHoliday'. Open, Promo
+            and SchoolHoliday must be 0 or 1 when given.
+        store_index (dict): The store index of the model.
+        encoders (dict): The encoder classes of the model bundle.
+
+    Returns:
+        pd.DataFrame: The rows, ready for predict_requests.
+    """
+    if not isinstance(records, list) or not records or not all(isinstance(record, dict) for record in records):
+        raise ValueError("'rows' must be a non-empty list of objects.")
+    rows = pd.DataFrame.from_records(records)
+    missing = [column for column in ('Store', 'Date') if column not in rows.columns]
+    if missing:
+        raise ValueError(f"Rows are missing required fields: {missing}")
+    # Varsayılan yalnızca alan verilmediğinde kullanılır; açıkça verilen null geçersizdir
+    for column, default in _ROW_DEFAULTS.items():
+        rows[column] = [record.get(column, default) for record in records]
+    for column in _FLAG_COLUMNS:
+        # bool da int'tir; true/false ve "1" gibi metinler reddedilir
+        invalid = [value for value in rows[column]
+                   if type(value) not in (int, float) or value not in (0, 1)]
+        if invalid:
+            raise ValueError(f"{column} must be 0 or 1: {invalid[:10]}")
+        rows[column] = rows[column].astype(np.int8)
+
+    try:
+        stores = pd.to_numeric(rows['Store'])
+        rows['Date'] = pd.to_datetime(rows['Date'])
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid Store or Date: {e}")
+    # 1.5 gibi değerler int64'e çevrilirken sessizce kırpılmasın diye önce reddedilir
+    values = stores.to_numpy(dtype=np.float64)
+    integral = np.isfinite(values) & (values == np.floor(values))
+    if not integral.all():
+        raise ValueError(f"Store ids must be integers: {rows.loc[~integral, 'Store'].unique()[:10].tolist()}")
+    rows['Store'] = stores.astype(np.int64)
+    rows['StateHoliday'] = rows['StateHoliday'].astype(str)
+
+    store_ids = rows['Store'].to_numpy()
+    known = (store_ids >= 0) & (store_ids < len(store_index['known']))
+    known[known] = store_index['known'][store_ids[known]]
+    if not known.all():
+        raise ValueError(f"Unknown stores: {np.unique(store_ids[~known])[:10].tolist()}")
+    encode_state_holiday(rows['StateHoliday'], encoders['StateHoliday'])
+    return rows[_ROW_COLUMNS]
+
+async def handle_predict(request):
+    start = time.perf_counter()
+    app = request.app
+    try:
+        payload = await request.json()
+        rows = parse_rows(payload.get('rows') if isinstance(payload, dict) else None,
+                          app['store_index'], app['bundle'].encoders)
+    except ValueError as e:
+        app['metrics'].record_request(time.perf_counter() - start, failed=True)
+        return web.json_response({'error': str(e)}, status=400)
+
+    try:
+        predictions = await app['batcher'].submit(rows)
+    except Exception as e:
+        app['metrics'].record_request(time.perf_counter() - start, failed=True)
+        return web.json_response({'error': f"Prediction failed: {e}"}, status=500)
+    app['metrics'].record_request(time.perf_counter() - start)
+    return web.json_response({'predictions': predictions.tolist()})
+
+async def handle_health(request):
+    bundle = request.app['bundle']
+    return web.json_response({
+        'status': 'ok',
+        'model': bundle.path,
+        'created_at': bundle.manifest['created_at'],
+        'validation_rmspe': bundle.metadata.get('validation_rmspe'),
+    })
+
+async def handle_metrics(request):
+    app = request.app
+    return web.json_response(app['metrics'].snapshot(app['batcher'].queue_depth))
+
+def create_app(model_path=MODEL_BUNDLE_PATH, max_batch_rows=SERVER_MAX_BATCH_ROWS, max_wait_ms=SERVER_MAX_WAIT_MS):
+    """
+    Builds the prediction service. The model bundle and store index are
+    loaded once when the app is created.
+
+    Args:
+        model_path (str): The model bundle directory, or a model registry
+            (its current version is served).
+        max_batch_rows (int): Maximum rows scored in one booster call.
+        max_wait_ms (float): How long a batch waits for more requests after the first one.
+
+    Returns:
+        web.Application: The aiohttp application.
+    """
+    bundle = load_model_bundle(resolve_bundle_path(model_path))
+    store_index = load_scoring_index(bundle)
+    # Booster ilk istekte değil, servis başlarken yüklenir
+    bundle.booster
+    metrics = ServerMetrics(max_batch_rows)
+
+    app = web.Application()
+    app['bundle'] = bundle
+    app['store_index'] = store_index
+    app['metrics'] = metrics
+
+    async def _start_batcher(app):
+        app['batcher'] = MicroBatcher(
+            lambda requests: predict_requests(bundle, store_index, requests), max_batch_rows, max_wait_ms, metrics
+        )
+        app['batcher_task'] = asyncio.create_task(app['batcher'].run())
+
+    async def _stop_batcher(app):
+        app['batcher_task'].cancel()
+        app['batcher'].shutdown()
+
+    app.on_startup.append(_start_batcher)
+    app.on_cleanup.append(_stop_batcher)
+    app.router.add_post('/predict', handle_predict)
+    app.router.add_get('/health', handle_health)
+    app.router.add_get('/metrics', handle_metrics)
+    return app
+
+if __name__ == '__main__':
+    # Örnek kullanım:
+    # python src/server.py --port 8080
+    # curl -X POST localhost:8080/predict -d '{"rows": [{"Store": 1, "Date": "2015-08-01", "Promo": 1}]}'
+    parser = argparse.ArgumentParser(description="HTTP prediction service for the Rossmann sales model.")
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--model', default=MODEL_BUNDLE_PATH, help="Model bundle directory.")
+    parser.add_argument('--max-batch-rows', type=int, default=SERVER_MAX_BATCH_ROWS,
+                        help="Maximum rows scored in one booster call.")
+    parser.add_argument('--max-wait-ms', type=float, default=SERVER_MAX_WAIT_MS,
+                        help="How long a batch waits for more requests after the first one.")
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.model, args.max_batch_rows, args.max_wait_ms), host=args.host, port=args.port)
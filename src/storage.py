@@ -0,0 +1,140 @@
+import os
+import re
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from schema import apply_schema
+
+# Yıl/ay bölümleme (partition) sütunları; veri sütunlarıyla karışmasın diye küçük harfli
+PARTITION_COLUMNS = ['year', 'month']
+# save_processed_data(part_index=...) ile yazılan dosya adları
+_PART_PATTERN = re.compile(r'part-(\d{5,})-\d+\.parquet$')
+
+_PARTITIONING = ds.partitioning(
+    pa.schema([('year', pa.int16()), ('month', pa.int8())]), flavor='hive'
+)
+
+def _date_range_filter(start_date=None, end_date=None):
+    """
+    Builds a pyarrow filter for a date range. The year/month terms let pyarrow
+    prune whole partitions, the 'Date' terms filter rows inside them.
+    """
+    expression = None
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        partition_expr = (ds.field('year') > start.year) | \
+                         ((ds.field('year') == start.year) & (ds.field('month') >= start.month))
+        expression = partition_expr & (ds.field('Date') >= pa.scalar(start, type=pa.timestamp('ns')))
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        partition_expr = (ds.field('year') < end.year) | \
+                         ((ds.field('year') == end.year) & (ds.field('month') <= end.month))
+        end_expr = partition_expr & (ds.field('Date') <= pa.scalar(end, type=pa.timestamp('ns')))
+        expression = end_expr if expression is None else expression & end_expr
+    return expression
+
+def save_processed_data(df, dataset_path, part_index=None):
+    """
+    Saves a merged dataframe as a Parquet dataset partitioned by year and month.
+
+    Args:
+        df (pd.DataFrame): The merged train/store data.
+        dataset_path (str): The directory of the Parquet dataset.
+        part_index (int, optional): Index of the part when a dataset is written
+            in several parts. Parts are stored as files named after the index,
+            so they read back in the order they were written. Existing contents
+            are replaced when this is None or 0.
+    """
+    # Sütunlar değiştirilirken çağıranın tablosu değişmesin diye sığ kopya
+    df = apply_schema(df.copy(deep=False))
+    df['Date'] = pd.to_datetime(df['Date']).astype('datetime64[ns]')
+    df['year'] = df['Date'].dt.year.astype('int16')
+    df['month'] = df['Date'].dt.month.astype('int8')
+
+    if not part_index and os.path.exists(dataset_path):
+        shutil.rmtree(dataset_path)
+    if part_index is None:
+        basename_template = 'part-{i}.parquet'
+    else:
+        basename_template = f'part-{part_index:05d}-{{i}}.parquet'
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(
+        table, dataset_path, format='parquet', partitioning=_PARTITIONING,
+        basename_template=basename_template, existing_data_behavior='overwrite_or_ignore'
+    )
+
+def next_processed_part(dataset_path):
+    """The part index after the largest one written by save_processed_data(part_index=...), or 1."""
+    indexes = [0]
+    for _, _, files in os.walk(dataset_path):
+        indexes += [int(match.group(1)) for match in map(_PART_PATTERN.match, files) if match]
+    return max(indexes) + 1
+
+def remove_processed_part(dataset_path, part_index):
+    """Deletes the files of one part written by save_processed_data(part_index=...)."""
+    prefix = f'part-{part_index:05d}-'
+    for root, _, files in os.walk(dataset_path):
+        for name in files:
+            if name.startswith(prefix):
+                os.remove(os.path.join(root, name))
+
+def load_processed_data(dataset_path, columns=None, start_date=None, end_date=None):
+    """
+    Loads the processed Parquet dataset with the column dtypes of schema.COLUMN_SCHEMA.
+
+    Args:
+        dataset_path (str): The directory of the Parquet dataset.
+        columns (list, optional): Columns to read. Defaults to all data columns.
+        start_date (str or datetime, optional): First date to include.
+        end_date (str or datetime, optional): Last date to include.
+
+    Returns:
+        pd.DataFrame: The requested columns of the rows in the date range.
+    """
+    if not os.path.exists(dataset_path):
+        raise FileNotFoundError(f"Processed dataset not found: {dataset_path}")
+
+    dataset = ds.dataset(dataset_path, format='parquet', partitioning=_PARTITIONING)
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name not in PARTITION_COLUMNS]
+
+    table = dataset.to_table(columns=columns, filter=_date_range_filter(start_date, end_date))
+    # Eski (geniş tipli) veri setleri de şemaya göre daraltılır
+    return apply_schema(table.to_pandas())
+
+def processed_null_counts(dataset_path):
+    """
+    Returns the null count and the row count of every column, read from the
+    Parquet footer statistics without loading any data pages. A column chunk
+    written without a null count is read and its nulls counted instead.
+
+    Args:
+        dataset_path (str): The directory of the Parquet dataset.
+
+    Returns:
+        tuple: (pd.Series of null counts indexed by column name, total row count)
+    """
+    dataset = ds.dataset(dataset_path, format='parquet', partitioning=_PARTITIONING)
+    null_counts = {}
+    num_rows = 0
+    for fragment in dataset.get_fragments():
+        parquet_file = pq.ParquetFile(fragment.path)
+        metadata = parquet_file.metadata
+        num_rows += metadata.num_rows
+        for row_group in range(metadata.num_row_groups):
+            row_group_meta = metadata.row_group(row_group)
+            for i in range(row_group_meta.num_columns):
+                column = row_group_meta.column(i)
+                name = column.path_in_schema
+                stats = column.statistics
+                if stats is not None and stats.has_null_count:
+                    null_count = stats.null_count
+                else:
+                    # İstatistiği olmayan sütun parçası 0 sayılmaz; yalnızca o sütun okunur
+                    null_count = parquet_file.read_row_group(row_group, columns=[name]).column(0).null_count
+                null_counts[name] = null_counts.get(name, 0) + null_count
+    return pd.Series(null_counts, dtype='int64'), num_rows
@@ -0,0 +1,168 @@
+import os
+import numpy as np
+import pandas as pd
+
+# PromoInterval değerlerinde geçen ay kısaltmaları (strftime('%b') ile aynı)
+MONTH_ABBRS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# Promo2 başlangıcı yıl * 100 + hafta olarak tek bir sayıda tutulur
+_WEEK_KEY_BASE = 100
+
+def parse_promo_interval(interval):
+    """Converts a PromoInterval string (e.g. 'Jan,Apr,Jul,Oct') to a 12-bit month mask."""
+    mask = 0
+    for bit, month_abbr in enumerate(MONTH_ABBRS):
+        if month_abbr in interval:
+            mask |= 1 << bit
+    return mask
+
+def _encode(values, classes=None):
+    """LabelEncoder-style codes: position of each value in the sorted classes."""
+    values = values.astype(str)
+    if classes is None:
+        codes, classes = pd.factorize(values, sort=True)
+        return codes, np.asarray(classes, dtype=str)
+    classes = np.asarray(classes, dtype=str)
+    codes = pd.Index(classes).get_indexer(values)
+    if (codes < 0).any():
+        raise ValueError(f"Values missing from the encoder classes {classes.tolist()}: "
+                         f"{sorted(set(values[codes < 0]))}")
+    return codes, classes
+
+def build_store_index(store_df, competition_distance_fill=None, category_classes=None):
+    """
+    Builds a compact, array-backed index of the static store features.
+    Every array is indexed directly by store id, so a lookup is a single
+    array read instead of a DataFrame filter.
+
+    Args:
+        store_df (pd.DataFrame): The store table (store.csv), one row per store.
+        competition_distance_fill (float, optional): Value for missing
+            CompetitionDistance. Defaults to the median of store_df.
+        category_classes (dict, optional): Encoder classes for 'StoreType' and
+            'Assortment' (e.g. from a model bundle). Defaults to the sorted
+            values of store_df.
+
+    Returns:
+        dict: Arrays of the index (see the keys below) plus the category classes.
+    """
+    store_ids = store_df['Store'].to_numpy()
+    size = store_ids.max() + 1
+    if competition_distance_fill is None:
+        competition_distance_fill = store_df['CompetitionDistance'].median()
+
+    def _column(values, dtype, fill=0):
+        array = np.full(size, fill, dtype=dtype)
+        array[store_ids] = values
+        return array
+
+    category_classes = category_classes or {}
+    store_type_codes, store_type_classes = _encode(store_df['StoreType'], category_classes.get('StoreType'))
+    assortment_codes, assortment_classes = _encode(store_df['Assortment'], category_classes.get('Assortment'))
+
+    since_month = store_df['CompetitionOpenSinceMonth'].fillna(0).to_numpy()
+    since_year = store_df['CompetitionOpenSinceYear'].fillna(0).to_numpy()
+    promo2_week = store_df['Promo2SinceWeek'].fillna(0).to_numpy().astype(int)
+    promo2_year = store_df['Promo2SinceYear'].fillna(0).to_numpy().astype(int)
+    promo_interval = store_df['PromoInterval'].astype(object).fillna('')
+
+    return {
+        'known': _column(True, bool, fill=False),
+        'store_type': _column(store_type_codes, np.int8, fill=-1),
+        'assortment': _column(assortment_codes, np.int8, fill=-1),
+        'competition_distance': _column(
+            store_df['CompetitionDistance'].fillna(competition_distance_fill).to_numpy(), np.float64
+        ),
+        # Rakibin açıldığı ay, yıl * 12 + ay olarak (eksikse 0)
+        'competition_open_month': _column(since_year * 12 + since_month, np.int32),
+        'promo2': _column(store_df['Promo2'].to_numpy(), np.int8),
+        'promo2_since_week': _column(promo2_year * _WEEK_KEY_BASE + promo2_week, np.int32),
+        'promo_interval_mask': _column(
+            [parse_promo_interval(interval) for interval in promo_interval], np.int16
+        ),
+        'store_type_classes': store_type_classes,
+        'assortment_classes': assortment_classes,
+    }
+
+def save_store_index(store_index, index_path):
+    """Saves a store index as one .npy file per array in the given directory."""
+    if not os.path.exists(index_path):
+        os.makedirs(index_path)
+    for key, array in store_index.items():
+        np.save(os.path.join(index_path, f'{key}.npy'), array)
+
+def load_store_index(index_path, mmap=True):
+    """
+    Loads a store index saved by save_store_index.
+
+    Args:
+        index_path (str): The directory of the index.
+        mmap (bool): Memory-map the arrays instead of reading them into memory.
+    """
+    mmap_mode = 'r' if mmap else None
+    return {
+        name[:-len('.npy')]: np.load(os.path.join(index_path, name), mmap_mode=mmap_mode)
+        for name in sorted(os.listdir(index_path)) if name.endswith('.npy')
+    }
+
+def _calendar_keys(year, month, week_of_year):
+    """The calendar values the store features compare with: month and ISO week keys and the month's bit."""
+    # Dar tipli takvim sütunları (int8/int16) yıl * 100 gibi işlemlerde taşmasın diye
+    year, month, week_of_year = (np.asarray(a, dtype=np.int32) for a in (year, month, week_of_year))
+    return {
+        'month_index': year * 12 + month,
+        'week_key': year * _WEEK_KEY_BASE + week_of_year,
+        'month_bit': (1 << (month - 1)).astype(np.int16),
+    }
+
+def lookup_store_features(store_index, store_ids, year, month, week_of_year, date_codes=None):
+    """
+    Reads the store-derived model features for each row from the index.
+
+    Args:
+        store_index (dict): The index built by build_store_index.
+        store_ids (np.ndarray): The store of each row.
+        year, month, week_of_year (np.ndarray): The calendar features of each
+            row or, with date_codes, of each distinct date.
+        date_codes (np.ndarray, optional): The position of each row's date in
+            the calendar arrays; the calendar keys are then computed once per
+            date and only gathered per row.
+
+    Returns:
+        dict: 'StoreType', 'Assortment', 'CompetitionDistance', 'CompetitionOpen',
+        'Promo2' and 'IsPromo2' arrays, aligned with store_ids.
+    """
+    store_ids = np.asarray(store_ids)
+    known = store_ids < len(store_index['known'])
+    known[known] = store_index['known'][store_ids[known]]
+    if not known.all():
+        raise ValueError(f"Stores missing from the store index: {np.unique(store_ids[~known])[:10].tolist()}")
+
+    keys = _calendar_keys(year, month, week_of_year)
+    if date_codes is not None:
+        keys = {name: values[date_codes] for name, values in keys.items()}
+    competition_open = keys['month_index'] - store_index['competition_open_month'][store_ids]
+    promo2 = store_index['promo2'][store_ids]
+    started = keys['week_key'] >= store_index['promo2_since_week'][store_ids]
+    in_interval = (store_index['promo_interval_mask'][store_ids] & keys['month_bit']) != 0
+    return {
+        'StoreType': store_index['store_type'][store_ids],
+        'Assortment': store_index['assortment'][store_ids],
+        'CompetitionDistance': store_index['competition_distance'][store_ids],
+        'CompetitionOpen': np.maximum(competition_open, 0),
+        'Promo2': promo2,
+        'IsPromo2': ((promo2 != 0) & started & in_interval).astype(int),
+    }
+
+def weighted_median(values, weights):
+    """Median of values repeated weights times (Series.median over the rows), ignoring NaN."""
+    valid = ~np.isnan(values) & (weights > 0)
+    values, weights = values[valid], weights[valid]
+    order = np.argsort(values, kind='stable')
+    values, cumulative = values[order], np.cumsum(weights[order])
+    total = cumulative[-1]
+    # Çift sayıda satırda ortadaki iki değerin ortalaması
+    lower = values[np.searchsorted(cumulative, (total - 1) // 2, side='right')]
+    upper = values[np.searchsorted(cumulative, total // 2, side='right')]
+    return float((lower + upper) / 2)
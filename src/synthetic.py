@@ -0,0 +1,261 @@
+# Rossmann biçiminde, tekrarlanabilir (deterministik) sentetik veri üretimi
+import argparse
+import math
+import os
+import numpy as np
+import pandas as pd
+
+from config import RAW_DATA_PATH, SYNTHETIC_DATA_PATH, SYNTHETIC_SEED
+
+# Gerçek verinin son günü; sentetik eğitim verisi bu tarihte biter, test verisi ertesi gün başlar
+END_DATE = '2015-07-31'
+TEST_DAYS = 48
+# Validasyon (6 hafta) ve öncesinde eğitim için yeterli gün kalsın diye alt sınır;
+# üst sınır sonrası ölçek mağaza sayısıyla büyütülür
+MIN_DAYS = 84
+MAX_DAYS = 3653
+# Store sütunu int16 olarak saklanır
+MAX_STORES = np.iinfo(np.int16).max
+# Bir seferde üretilip CSV'ye eklenen yaklaşık satır sayısı
+BLOCK_ROWS = 1_000_000
+N_STATES = 12
+
+TRAIN_COLUMNS = ['Store', 'DayOfWeek', 'Date', 'Sales', 'Customers', 'Open', 'Promo', 'StateHoliday', 'SchoolHoliday']
+TEST_COLUMNS = ['Id', 'Store', 'DayOfWeek', 'Date', 'Open', 'Promo', 'StateHoliday', 'SchoolHoliday']
+
+# Satışı belirleyen çarpanlar
+_DAY_OF_WEEK_EFFECT = np.array([1.15, 1.0, 0.95, 0.95, 1.05, 0.85, 0.9])  # Pazartesi..Pazar
+_STORE_TYPE_EFFECT = {'a': 1.0, 'b': 1.8, 'c': 1.0, 'd': 1.0}
+_ASSORTMENT_EFFECT = {'a': 1.0, 'b': 0.8, 'c': 1.1}
+_PROMO_EFFECT = 1.35
+_SCHOOL_HOLIDAY_EFFECT = 1.03
+_DECEMBER_EFFECT = 1.25
+_YEARLY_TREND = 0.02
+
+def scale_for_rows(rows, n_real_stores):
+    """
+    Chooses the number of stores and days for a target row count: all real
+    stores over as many days as needed, and extra stores once the date range
+    reaches MAX_DAYS.
+
+    Args:
+        rows (int): Target number of train rows.
+        n_real_stores (int): Number of stores in the real store table.
+
+    Returns:
+        tuple: (n_stores, n_days).
+    """
+    n_days = min(MAX_DAYS, max(MIN_DAYS, math.ceil(rows / n_real_stores)))
+    n_stores = math.ceil(rows / n_days)
+    if n_stores > MAX_STORES:
+        raise ValueError(f"{rows} rows need {n_stores} stores; at most {MAX_STORES} fit the Store dtype.")
+    return n_stores, n_days
+
+def synthetic_stores(store_df, n_stores, seed=SYNTHETIC_SEED):
+    """
+    Returns the store table for n_stores stores: the real stores, followed by
+    copies of randomly drawn real stores with new ids when more are needed.
+    """
+    store_df = store_df.sort_values('Store').reset_index(drop=True)
+    extra = n_stores - len(store_df)
+    if extra <= 0:
+        return store_df
+    rng = np.random.default_rng([seed, 0])
+    copies = store_df.iloc[rng.integers(0, len(store_df), extra)].copy()
+    copies['Store'] = np.arange(len(store_df) + 1, n_stores + 1)
+    return pd.concat([store_df, copies], ignore_index=True)
+
+def _store_attributes(stores, seed):
+    """Draws the per-store attributes (state, sales level, ticket size, closures) once."""
+    rng = np.random.default_rng([seed, 1])
+    n_stores = len(stores)
+    level = rng.lognormal(np.log(5400), 0.35, n_stores)
+    level *= stores['StoreType'].map(_STORE_TYPE_EFFECT).fillna(1.0).to_numpy()
+    level *= stores['Assortment'].map(_ASSORTMENT_EFFECT).fillna(1.0).to_numpy()
+    # Yakın rakip satışı düşürür
+    distance = stores['CompetitionDistance'].fillna(100000).to_numpy()
+    level *= 1 - 0.15 * np.exp(-distance / 2000)
+
+    # Yaklaşık %2 mağaza 1-6 ay tadilat için kapanır
+    refurbished = rng.random(n_stores) < 0.02
+    return {
+        'state': rng.integers(0, N_STATES, n_stores),
+        'level': level,
+        'ticket': rng.lognormal(np.log(9.5), 0.15, n_stores),
+        'sunday_open': rng.random(n_stores) < 0.03,
+        'refurbish_start': np.where(refurbished, rng.random(n_stores), np.inf),
+        'refurbish_days': rng.integers(30, 180, n_stores),
+    }
+
+def _easter(year):
+    """Easter Sunday of a year (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    day = (h + l - 7 * m + 33 * month + 19) % 32
+    return np.datetime64(f'{year:04d}-{month:02d}-{day:02d}')
+
+def _holiday_calendar(years):
+    """
+    Returns {date: (code, states)} for the public holidays of the given years;
+    states is None for national holidays.
+    """
+    calendar = {}
+    for year in years:
+        easter = _easter(year)
+        fixed = lambda month_day: np.datetime64(f'{year:04d}-{month_day}')
+        calendar.update({
+            fixed('01-01'): ('a', None), fixed('05-01'): ('a', None), fixed('10-03'): ('a', None),
+            easter - 2: ('b', None), easter + 1: ('b', None),
+            easter + 39: ('a', None), easter + 50: ('a', None),
+            fixed('12-25'): ('c', None), fixed('12-26'): ('c', None),
+            # Bölgesel tatiller
+            fixed('01-06'): ('a', range(0, 3)), easter + 60: ('a', range(0, 6)),
+            fixed('10-31'): ('a', range(9, 12)), fixed('11-01'): ('a', range(0, 6)),
+        })
+    return calendar
+
+def _school_holiday(days, state, years):
+    """School holidays by state: summer (6 weeks, staggered), Easter, autumn and Christmas breaks."""
+    day_of_year = (days - days.astype('datetime64[Y]').astype('datetime64[D]')).astype(np.int64)
+    summer_start = 175 + (state * 7) % 70
+    autumn_start = 285 + (state * 3) % 21
+    holiday = ((day_of_year >= summer_start) & (day_of_year < summer_start + 42)) | \
+              ((day_of_year >= autumn_start) & (day_of_year < autumn_start + 7)) | \
+              (day_of_year >= 356) | (day_of_year < 6)
+    for year in years:
+        easter = _easter(year)
+        holiday |= (days >= easter - 7) & (days <= easter + 7)
+    return holiday
+
+def _generate_block(days, stores, attributes, seed, block_index, with_sales=True):
+    """
+    Generates the rows of a block of days for all stores, ordered like the
+    Kaggle files (dates descending, stores ascending).
+    """
+    rng = np.random.default_rng([seed, 2, block_index])
+    n_stores, n_days = len(stores), len(days)
+    day = np.repeat(days, n_stores)
+    store_position = np.tile(np.arange(n_stores), n_days)
+    state = attributes['state'][store_position]
+
+    day_of_week = (day.astype(np.int64) + 3) % 7 + 1  # 1970-01-01 bir Perşembe günüdür
+    years = range(int(days.min().astype('datetime64[Y]').astype(int)) + 1970,
+                  int(days.max().astype('datetime64[Y]').astype(int)) + 1971)
+
+    # Resmi tatiller: ulusal olanlar tüm mağazalarda, bölgeseller yalnızca ilgili eyaletlerde
+    state_holiday = np.full(len(day), '0', dtype='<U1')
+    for holiday_date, (code, states) in _holiday_calendar(years).items():
+        applies = day == holiday_date
+        if states is not None:
+            applies &= np.isin(state, list(states))
+        state_holiday[applies] = code
+    school_holiday = _school_holiday(day, state, years)
+
+    # Promosyonlar tüm mağazalarda aynı takvimle, iki haftada bir hafta içi günlerde
+    promo = ((day.astype(np.int64) + 3) // 7 % 2 == 0) & (day_of_week <= 5)
+
+    # Kapanışlar: Pazar (birkaç mağaza hariç), resmi tatiller, tadilat ve rastgele günler
+    open_ = np.ones(len(day), dtype=bool)
+    open_ &= (day_of_week != 7) | attributes['sunday_open'][store_position]
+    open_ &= (state_holiday == '0') | (rng.random(len(day)) < 0.03)
+    day_number = (day - np.datetime64(END_DATE)).astype(np.int64) + MAX_DAYS
+    refurbish_start = attributes['refurbish_start'][store_position] * MAX_DAYS
+    open_ &= ~((day_number >= refurbish_start) &
+               (day_number < refurbish_start + attributes['refurbish_days'][store_position]))
+    open_ &= rng.random(len(day)) >= 0.003
+
+    block = pd.DataFrame({
+        'Store': stores['Store'].to_numpy()[store_position],
+        'DayOfWeek': day_of_week,
+        'Date': np.datetime_as_string(day),
+    })
+    if with_sales:
+        month = (day.astype('datetime64[M]') - day.astype('datetime64[Y]')).astype(np.int64) + 1
+        years_from_end = (day - np.datetime64(END_DATE)).astype(np.int64) / 365.25
+        expected = attributes['level'][store_position] * _DAY_OF_WEEK_EFFECT[day_of_week - 1] \
+            * np.where(promo, _PROMO_EFFECT, 1.0) * np.where(school_holiday, _SCHOOL_HOLIDAY_EFFECT, 1.0) \
+            * np.where(month == 12, _DECEMBER_EFFECT, 1.0) * (1 + _YEARLY_TREND) ** years_from_end
+        sales = np.where(open_, expected * rng.lognormal(0, 0.12, len(day)), 0).round()
+        customers = sales / (attributes['ticket'][store_position] * rng.lognormal(0, 0.05, len(day)))
+        block['Sales'] = sales.astype(np.int32)
+        block['Customers'] = customers.round().astype(np.int32)
+    block['Open'] = open_.astype(np.int8)
+    block['Promo'] = promo.astype(np.int8)
+    block['StateHoliday'] = state_holiday
+    block['SchoolHoliday'] = school_holiday.astype(np.int8)
+    return block
+
+def _write_days(path, columns, days, stores, attributes, seed, max_rows=None, with_sales=True, with_id=False):
+    """Generates days (newest first) in blocks and writes them to a CSV file."""
+    days_per_block = max(1, BLOCK_ROWS // len(stores))
+    written = 0
+    with open(path, 'w', newline='') as f:
+        for block_index, start in enumerate(range(0, len(days), days_per_block)):
+            block = _generate_block(days[start:start + days_per_block], stores, attributes, seed,
+                                    block_index, with_sales)
+            if max_rows is not None:
+                block = block.iloc[:max_rows - written]
+            if with_id:
+                block.insert(0, 'Id', np.arange(written + 1, written + len(block) + 1))
+            block[columns].to_csv(f, header=block_index == 0, index=False)
+            written += len(block)
+    return written
+
+def generate_dataset(output_dir, rows, store_csv_path=None, seed=SYNTHETIC_SEED, test_days=TEST_DAYS):
+    """
+    Writes a deterministic Rossmann-shaped train.csv, store.csv and test.csv.
+    The same rows and seed always produce the same files.
+
+    Args:
+        output_dir (str): Directory for the three files.
+        rows (int): Number of train rows (10k to 50M).
+        store_csv_path (str, optional): The real store table used as a template.
+            Defaults to data/raw/store.csv.
+        seed (int): Random seed.
+        test_days (int): Days after the train period covered by test.csv.
+
+    Returns:
+        dict: The paths of the files and the generated scale.
+    """
+    store_csv_path = store_csv_path or os.path.join(RAW_DATA_PATH, 'store.csv')
+    real_stores = pd.read_csv(store_csv_path)
+    n_stores, n_days = scale_for_rows(rows, len(real_stores))
+    stores = synthetic_stores(real_stores, n_stores, seed)
+    attributes = _store_attributes(stores, seed)
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {name: os.path.join(output_dir, f'{name}.csv') for name in ('train', 'store', 'test')}
+    # Gerçek store.csv'nin üzerine yazılmaz; ek mağaza yoksa aynı tablo zaten oradadır
+    if os.path.abspath(paths['store']) != os.path.abspath(store_csv_path) or n_stores > len(real_stores):
+        stores.to_csv(paths['store'], index=False)
+
+    end = np.datetime64(END_DATE)
+    train_days = end - np.arange(n_days)
+    train_rows = _write_days(paths['train'], TRAIN_COLUMNS, train_days, stores.iloc[:n_stores],
+                             attributes, seed, max_rows=rows)
+    # Test günleri farklı bir tohum dizisi kullanır; eğitim verisiyle aynı bloklar tekrar üretilmez
+    test_dates = end + np.arange(test_days, 0, -1)
+    test_rows = _write_days(paths['test'], TEST_COLUMNS, test_dates, stores.iloc[:n_stores],
+                            attributes, seed + 1, with_sales=False, with_id=True)
+    print(f"Generated {train_rows} train rows ({n_stores} stores x {n_days} days) "
+          f"and {test_rows} test rows in {output_dir}")
+    return {**paths, 'stores': n_stores, 'days': n_days, 'train_rows': train_rows, 'test_rows': test_rows}
+
+if __name__ == '__main__':
+    # Örnek kullanım:
+    # python src/synthetic.py --rows 1000000
+    # python src/synthetic.py --rows 50000000 --output-dir /data/rossmann-50m --seed 7
+    parser = argparse.ArgumentParser(description="Deterministic Rossmann-shaped synthetic data generator.")
+    parser.add_argument('--rows', type=int, required=True, help="Number of train rows.")
+    parser.add_argument('--output-dir', default=SYNTHETIC_DATA_PATH)
+    parser.add_argument('--store-csv', default=None, help="Template store table (default: data/raw/store.csv).")
+    parser.add_argument('--seed', type=int, default=SYNTHETIC_SEED)
+    parser.add_argument('--test-days', type=int, default=TEST_DAYS)
+    args = parser.parse_args()
+    generate_dataset(args.output_dir, args.rows, args.store_csv, args.seed, args.test_days)
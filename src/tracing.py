@@ -0,0 +1,212 @@
+# Pipeline aşamaları için yapılandırılmış izleme (trace) ve isteğe bağlı profil çıkarma
+import cProfile
+import json
+import os
+import threading
+import time
+import xgboost as xgb
+
+from memory import PeakRssSampler, rss_mb
+
+TRACE_FORMATS = ['json', 'chrome']
+
+# Etkin izleyici; None ise stage() hiçbir şey ölçmez
+_tracer = None
+
+def _io_counters():
+    """Bytes read and written by the process so far (rchar/wchar), or None if unavailable."""
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+class _NullStage:
+    """Stand-in returned by stage() when tracing is off."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    """One traced stage; measures wall/CPU time, peak RSS delta and I/O between enter and exit."""
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = dict(attributes)
+        self._profiler = None
+
+    def set(self, **attributes):
+        """Adds attributes (e.g. rows=len(df)) to the stage record."""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._rss_start = rss_mb()
+        self._sampler = PeakRssSampler().__enter__()
+        self._io_start = _io_counters()
+        if self.tracer.profile_dir and not self.tracer.profiling:
+            # cProfile aynı anda tek bir profil çıkarıcıyla çalışır; iç içe aşamalar dıştakine dahil olur
+            self._profiler = cProfile.Profile()
+            self.tracer.profiling = True
+            self._profiler.enable()
+        self._cpu_start = time.process_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        cpu_seconds = time.process_time() - self._cpu_start
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.tracer.profiling = False
+            self._profiler.dump_stats(os.path.join(
+                self.tracer.profile_dir, f'{len(self.tracer.records):02d}_{self.name}.prof'))
+        self._sampler.__exit__(exc_type, exc_value, traceback)
+        io_end = _io_counters()
+
+        record = {
+            'name': self.name,
+            'start_seconds': self._start - self.tracer.origin,
+            'wall_seconds': end - self._start,
+            'cpu_seconds': cpu_seconds,
+            'peak_rss_delta_mb': (None if self._rss_start is None or self._sampler.peak_mb is None
+                                  else self._sampler.peak_mb - self._rss_start),
+            'bytes_read': None if io_end is None else io_end[0] - self._io_start[0],
+            'bytes_written': None if io_end is None else io_end[1] - self._io_start[1],
+            'thread_id': threading.get_ident(),
+            'error': None if exc_type is None else exc_type.__name__,
+        }
+        record.update(self.attributes)
+        self.tracer.records.append(record)
+        return False
+
+class BoostingTimer(xgb.callback.TrainingCallback):
+    """XGBoost callback recording the wall time of every boosting iteration."""
+    def __init__(self):
+        super().__init__()
+        self.iterations = []
+        self._start = None
+
+    def before_iteration(self, model, epoch, evals_log):
+        self._start = time.perf_counter()
+        return False
+
+    def after_iteration(self, model, epoch, evals_log):
+        self.iterations.append((self._start, time.perf_counter() - self._start))
+        return False
+
+class Tracer:
+    """
+    Collects stage records and writes them as JSON Lines (one record per
+    stage) or as a Chrome trace (chrome://tracing, Perfetto).
+
+    Args:
+        trace_path (str, optional): Output file, written by close().
+        trace_format (str): 'json' or 'chrome'.
+        profile_dir (str, optional): If given, every top-level stage is run
+            under cProfile and its stats are dumped to <profile_dir>/NN_<stage>.prof.
+    """
+    def __init__(self, trace_path=None, trace_format='json', profile_dir=None):
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format {trace_format!r}; expected one of {TRACE_FORMATS}.")
+        self.trace_path = trace_path
+        self.trace_format = trace_format
+        self.profile_dir = profile_dir
+        self.profiling = False
+        self.records = []
+        self.origin = time.perf_counter()
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def stage(self, name, **attributes):
+        return _Stage(self, name, attributes)
+
+    def _chrome_events(self):
+        pid = os.getpid()
+        events = []
+        for record in self.records:
+            iterations = record.get('_iterations', [])
+            # İterasyon süreleri ayrı olaylar olarak yazılır
+            args = {key: value for key, value in record.items()
+                    if key not in ('name', 'start_seconds', 'wall_seconds', 'thread_id', 'iteration_seconds')
+                    and not key.startswith('_')}
+            events.append({
+                'name': record['name'], 'ph': 'X', 'pid': pid, 'tid': record['thread_id'],
+                'ts': record['start_seconds'] * 1e6, 'dur': record['wall_seconds'] * 1e6, 'args': args,
+            })
+            events.extend({
+                'name': f'iteration {i}', 'ph': 'X', 'pid': pid, 'tid': record['thread_id'],
+                'ts': (start - self.origin) * 1e6, 'dur': seconds * 1e6,
+            } for i, (start, seconds) in enumerate(iterations))
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def close(self):
+        """Writes the trace file (if any) and prints a one-line summary per stage."""
+        for record in self.records:
+            print(f"[trace] {record['name']}: {record['wall_seconds']:.3f}s wall, "
+                  f"{record['cpu_seconds']:.3f}s CPU")
+        if not self.trace_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.trace_path)), exist_ok=True)
+        with open(self.trace_path, 'w') as f:
+            if self.trace_format == 'chrome':
+                json.dump(self._chrome_events(), f)
+            else:
+                for record in self.records:
+                    record = {key: value for key, value in record.items() if not key.startswith('_')}
+                    f.write(json.dumps(record) + '\n')
+        print(f"Trace written to {self.trace_path}")
+
+def start_tracing(trace_path=None, trace_format='json', profile_dir=None):
+    """Activates a Tracer for the following stage() calls and returns it."""
+    global _tracer
+    _tracer = Tracer(trace_path, trace_format, profile_dir)
+    return _tracer
+
+def stop_tracing():
+    """Writes the active trace and turns tracing off."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+
+def stage(name, **attributes):
+    """
+    Context manager that traces a pipeline stage when tracing is active and
+    costs one global lookup otherwise.
+
+    Example:
+        with tracing.stage('load') as span:
+            df = load_processed_data(path)
+            span.set(rows=len(df))
+    """
+    if _tracer is None:
+        return _NULL_STAGE
+    return _tracer.stage(name, **attributes)
+
+def boosting_callbacks():
+    """Callbacks to pass to xgb.train: a BoostingTimer when tracing is active, otherwise none."""
+    return [BoostingTimer()] if _tracer is not None else []
+
+def record_boosting(span, callbacks):
+    """Adds the per-iteration timings of a BoostingTimer to a stage record."""
+    timers = [callback for callback in callbacks if isinstance(callback, BoostingTimer)]
+    if not timers or not timers[0].iterations:
+        return
+    iterations = timers[0].iterations
+    seconds = sorted(duration for _, duration in iterations)
+    span.set(
+        iterations=len(seconds),
+        iteration_mean_seconds=sum(seconds) / len(seconds),
+        iteration_p50_seconds=seconds[len(seconds) // 2],
+        iteration_max_seconds=seconds[-1],
+        iteration_seconds=[duration for _, duration in iterations],
+        _iterations=iterations,
+    )
@@ -0,0 +1,205 @@
+# Eğitilmiş booster'ı düz NumPy dizilerine aktarıp küçük batch'leri DMatrix olmadan tahmin etme
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+
+from config import MODEL_BUNDLE_PATH, RAW_DATA_PATH, COMPILED_PREDICT_MAX_ROWS
+from store_index import save_store_index, load_store_index
+
+# Çıktısı marjın kendisi olan ve marjın üsteli (log bağlantı) olan amaç fonksiyonları
+_IDENTITY_OBJECTIVES = {'reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror'}
+_LOG_OBJECTIVES = {'reg:gamma', 'reg:tweedie', 'count:poisson'}
+# (satır x ağaç) düğüm matrisinin bellekte sınırlı kalması için bir seferde işlenen satır sayısı
+_ROWS_PER_BLOCK = 4096
+
+def compile_booster(booster):
+    """
+    Exports a tree booster as flat arrays over the nodes of all trees: the
+    split feature and threshold of each node, its two children (a leaf points
+    to itself), the child taken by missing values and the leaf values, plus
+    the root of every tree and the base score.
+
+    Args:
+        booster (xgb.Booster): A trained gbtree booster with numerical splits.
+
+    Returns:
+        dict: The compiled trees, as accepted by predict_compiled.
+    """
+    model = json.loads(booster.save_raw('json'))['learner']
+    objective = model['objective']['name']
+    if objective not in _IDENTITY_OBJECTIVES | _LOG_OBJECTIVES:
+        raise ValueError(f"Objective {objective!r} is not supported by the compiled predictor.")
+    if model['gradient_booster']['name'] != 'gbtree':
+        raise ValueError("Only gbtree boosters can be compiled.")
+    if int(model['learner_model_param']['num_target']) > 1 or int(model['learner_model_param']['num_class']) > 0:
+        raise ValueError("Only single-output models can be compiled.")
+
+    trees = model['gradient_booster']['model']['trees']
+    sizes = np.array([len(tree['left_children']) for tree in trees], dtype=np.int64)
+    roots = np.r_[0, np.cumsum(sizes)[:-1]]
+    features, thresholds, values, children, missing, depth = [], [], [], [], [], 0
+    for tree, root in zip(trees, roots):
+        if any(tree['split_type']):
+            raise ValueError("Categorical splits are not supported by the compiled predictor.")
+        left = np.asarray(tree['left_children'], dtype=np.int64)
+        right = np.asarray(tree['right_children'], dtype=np.int64)
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        leaf = left == -1
+        nodes = np.arange(len(left))
+        # Yapraklar kendilerini gösterir; böylece tüm ağaçlar aynı sayıda adımda gezilir
+        left, right = np.where(leaf, nodes, left) + root, np.where(leaf, nodes, right) + root
+        children.append(np.stack([left, right], axis=1))
+        missing.append(np.where(np.asarray(tree['default_left'], dtype=bool), left, right))
+        features.append(np.where(leaf, 0, tree['split_indices']))
+        thresholds.append(np.where(leaf, 0, conditions))
+        # Yaprak değerleri (öğrenme oranıyla çarpılmış) split_conditions'da saklanır
+        values.append(np.where(leaf, conditions, 0))
+        # Ebeveyn her zaman çocuğundan önce gelir; derinlik tek geçişte hesaplanır
+        node_depth = np.zeros(len(left), dtype=np.int64)
+        parents = tree['parents']
+        for node in range(1, len(left)):
+            node_depth[node] = node_depth[parents[node]] + 1
+        depth = max(depth, int(node_depth.max()))
+
+    # XGBoost 3 base_score'u '[5.9E3]' biçiminde (hedef başına bir değer) yazar
+    base_score = float(model['learner_model_param']['base_score'].strip('[]'))
+    log_link = objective in _LOG_OBJECTIVES
+    return {
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float32),
+        'children': np.concatenate(children).astype(np.int32).ravel(),
+        'missing': np.concatenate(missing).astype(np.int32),
+        'value': np.concatenate(values).astype(np.float32),
+        'roots': roots.astype(np.int32),
+        'depth': np.array(depth),
+        'base_margin': np.array(np.log(base_score) if log_link else base_score),
+        'log_link': np.array(log_link),
+        'feature_names': np.array(booster.feature_names or [], dtype=str),
+    }
+
+def _predict_block(trees, X):
+    """Margins of the rows of X (float32, n x features), walking all trees one level per step."""
+    n = len(X)
+    flat = X.ravel()
+    row_offset = (np.arange(n, dtype=np.int64) * X.shape[1])[:, None]
+    has_missing = np.isnan(flat).any()
+    node = np.broadcast_to(trees['roots'], (n, len(trees['roots'])))
+    for _ in range(int(trees['depth'])):
+        x = flat[row_offset + trees['feature'][node]]
+        # x < eşik ise sol (0), değilse sağ (1) çocuk; NaN karşılaştırması sağa gider
+        next_node = trees['children'][2 * node + ~(x < trees['threshold'][node])]
+        if has_missing:
+            next_node = np.where(np.isnan(x), trees['missing'][node], next_node)
+        node = next_node
+    return trees['value'][node].sum(axis=1, dtype=np.float64) + float(trees['base_margin'])
+
+def predict_compiled(trees, X):
+    """
+    Predicts with compiled trees (see compile_booster) without building a
+    DMatrix. All trees are walked together, one level per step, as array
+    lookups over a (rows x trees) matrix of current nodes; the result
+    matches Booster.inplace_predict within float32 rounding.
+
+    Args:
+        trees (dict): The compiled trees.
+        X (pd.DataFrame or np.ndarray): Model features in training order.
+
+    Returns:
+        np.ndarray: The predictions (float32).
+    """
+    if isinstance(X, pd.DataFrame):
+        names = trees['feature_names'].tolist()
+        if names and X.columns.tolist() != names:
+            raise ValueError("The feature columns do not match the compiled model's features.")
+        X = X.to_numpy(dtype=np.float32, na_value=np.nan)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    if X.ndim == 1:
+        X = X[None, :]
+    margin = np.concatenate([_predict_block(trees, X[start:start + _ROWS_PER_BLOCK])
+                             for start in range(0, len(X), _ROWS_PER_BLOCK)]) if len(X) else np.empty(0)
+    if bool(trees['log_link']):
+        margin = np.exp(margin)
+    return margin.astype(np.float32)
+
+def save_compiled_trees(trees, trees_path):
+    """Saves compiled trees as one .npy file per array (the store index format)."""
+    save_store_index(trees, trees_path)
+
+def load_compiled_trees(trees_path, mmap=True):
+    """Loads compiled trees saved by save_compiled_trees."""
+    return load_store_index(trees_path, mmap=mmap)
+
+def _median_seconds(function, calls):
+    timings = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        function()
+        timings[i] = time.perf_counter() - start
+    return float(np.median(timings))
+
+def benchmark_predictors(bundle, rows, sizes=(1, 10, 100, 10_000), calls=50):
+    """
+    Times the booster (inplace_predict) and the compiled trees on batches of
+    each size, with and without building the feature matrix, and checks that
+    both give the same predictions.
+
+    Args:
+        bundle (model.ModelBundle): The model bundle.
+        rows (pd.DataFrame): Rows to score (e.g. test.csv); repeated if there are fewer than max(sizes).
+        sizes (tuple): Batch sizes.
+        calls (int): Timed calls per size (fewer for large batches).
+
+    Returns:
+        pd.DataFrame: Median milliseconds per call of each path and batch size.
+    """
+    from features import build_feature_matrix
+
+    booster, trees = bundle.booster, bundle.compiled_trees
+    rows = rows.iloc[np.arange(max(sizes)) % len(rows)].reset_index(drop=True)
+    X_all = build_feature_matrix(rows, bundle.store_index, bundle.encoders, bundle.features, bundle.history)
+    difference = np.abs(predict_compiled(trees, X_all) - booster.inplace_predict(X_all))
+    print(f"Max abs difference to Booster.inplace_predict: {difference.max():.2e} "
+          f"(relative {np.max(difference / np.abs(booster.inplace_predict(X_all))):.2e})")
+
+    def features(batch):
+        return build_feature_matrix(batch, bundle.store_index, bundle.encoders, bundle.features, bundle.history)
+
+    results = []
+    for size in sizes:
+        batch, X = rows.iloc[:size], X_all.iloc[:size]
+        repeat = max(3, calls if size <= 100 else calls // 10)
+        results.append({
+            'rows': size,
+            'booster_ms': _median_seconds(lambda: booster.inplace_predict(X), repeat) * 1000,
+            'compiled_ms': _median_seconds(lambda: predict_compiled(trees, X), repeat) * 1000,
+            'features_booster_ms': _median_seconds(lambda: booster.inplace_predict(features(batch)), repeat) * 1000,
+            'features_compiled_ms': _median_seconds(lambda: predict_compiled(trees, features(batch)), repeat) * 1000,
+        })
+    return pd.DataFrame(results).set_index('rows')
+
+if __name__ == '__main__':
+    # Örnek kullanım:
+    # python src/tree_predictor.py                  # paketteki ağaçları derleyip compiled_trees/ altına yazar
+    # python src/tree_predictor.py --benchmark      # 1, 10, 100 ve 10k satırda booster ile karşılaştırır
+    import os
+    from model import load_model_bundle, export_compiled_trees
+
+    parser = argparse.ArgumentParser(description="Compile the bundle's booster into NumPy arrays for small-batch scoring.")
+    parser.add_argument('--model', default=MODEL_BUNDLE_PATH, help="Model bundle directory.")
+    parser.add_argument('--benchmark', action='store_true', help="Time the compiled trees against the booster.")
+    parser.add_argument('--input', default=os.path.join(RAW_DATA_PATH, 'test.csv'), help="Rows for --benchmark.")
+    args = parser.parse_args()
+
+    bundle = load_model_bundle(args.model)
+    if args.benchmark:
+        test_rows = pd.read_csv(args.input, dtype={'StateHoliday': str})
+        if 'Open' in test_rows.columns:
+            test_rows = test_rows[test_rows['Open'] != 0]
+        table = benchmark_predictors(bundle, test_rows)
+        print(f"\nMedian latency per call (ms); compiled predictor used up to "
+              f"COMPILED_PREDICT_MAX_ROWS={COMPILED_PREDICT_MAX_ROWS} rows:")
+        print(table.to_string(float_format=lambda v: f"{v:.3f}"))
+    else:
+        export_compiled_trees(bundle)
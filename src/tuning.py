@@ -0,0 +1,238 @@
+# Paralel hiperparametre araması: rastgele örnekleme + successive halving
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import xgboost as xgb
+
+from config import XGB_PARAMS, TUNING_LOG_PATH, TUNED_PARAMS_PATH
+from model import train_booster
+from pipeline import load_train_validation
+
+# Arama uzayı: parametre -> (dağılım, alt sınır, üst sınır)
+SEARCH_SPACE = {
+    'eta': ('log', 0.01, 0.3),
+    'max_depth': ('int', 4, 12),
+    'subsample': ('uniform', 0.5, 1.0),
+    'colsample_bytree': ('uniform', 0.5, 1.0),
+    'min_child_weight': ('log', 1.0, 100.0),
+    'lambda': ('log', 0.1, 10.0),
+}
+
+# Tüm denemeler aynı QuantileDMatrix'i kullandığı için max_bin sabittir
+MAX_BIN = 256
+# Bir deneme validasyon RMSPE'si bu kadar tur iyileşmezse durur
+EARLY_STOPPING_ROUNDS = 50
+
+# Process pool modunda her işçinin bir kez oluşturduğu matrisler
+_worker_state = {}
+
+def sample_params(trial_id, seed):
+    """Draws the parameters of a trial; the same (trial_id, seed) always gives the same parameters."""
+    rng = np.random.default_rng([seed, trial_id])
+    params = {}
+    for name, (distribution, low, high) in SEARCH_SPACE.items():
+        if distribution == 'int':
+            params[name] = int(rng.integers(low, high + 1))
+        elif distribution == 'log':
+            params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            params[name] = float(rng.uniform(low, high))
+    return params
+
+def halving_rungs(min_rounds, max_rounds, reduction_factor):
+    """Boosting-round budgets of the successive halving rungs, e.g. 50, 150, 450, 1000."""
+    rungs = []
+    rounds = min_rounds
+    while rounds < max_rounds:
+        rungs.append(rounds)
+        rounds *= reduction_factor
+    rungs.append(max_rounds)
+    return rungs
+
+def _save_arrays(data_dir, X_train, y_train, X_val, y_val):
+    """Writes the split as .npy files that the workers memory-map."""
+    for name, array in (('X_train', X_train), ('y_train', y_train), ('X_val', X_val), ('y_val', y_val)):
+        np.save(os.path.join(data_dir, f'{name}.npy'), np.ascontiguousarray(array, dtype=np.float32))
+
+def _init_worker(data_dir, feature_names, nthread):
+    arrays = {
+        name: np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r')
+        for name in ('X_train', 'y_train', 'X_val', 'y_val')
+    }
+    # Histogram kutuları bir kez hesaplanır; validasyon matrisi eğitimin kutularını kullanır
+    dtrain = xgb.QuantileDMatrix(arrays['X_train'], label=arrays['y_train'], max_bin=MAX_BIN,
+                                 feature_names=feature_names, nthread=nthread)
+    dval = xgb.QuantileDMatrix(arrays['X_val'], label=arrays['y_val'], ref=dtrain,
+                               feature_names=feature_names, nthread=nthread)
+    _worker_state.update(dtrain=dtrain, dval=dval, nthread=nthread)
+
+def _run_trial(trial_id, rung, rounds, trial_params):
+    start = time.perf_counter()
+    params = {**XGB_PARAMS, **trial_params, 'max_bin': MAX_BIN, 'nthread': _worker_state['nthread']}
+    booster = train_booster(_worker_state['dtrain'], _worker_state['dval'], params, num_boost_round=rounds,
+                            early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False)
+    return {
+        'type': 'trial',
+        'trial_id': trial_id,
+        'rung': rung,
+        'rounds': rounds,
+        'params': trial_params,
+        'rmspe': float(booster.best_score),
+        'best_iteration': int(booster.best_iteration),
+        # Erken durduysa daha fazla tur sonucu değiştirmez; üst basamakta yeniden eğitilmez
+        'stopped_early': booster.num_boosted_rounds() < rounds,
+        'seconds': time.perf_counter() - start,
+    }
+
+def _read_log(log_path, search):
+    """Returns the completed trials of a log written by the same search, keyed by (trial_id, rung)."""
+    completed = {}
+    if not os.path.exists(log_path):
+        return completed
+    with open(log_path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records or records[0] != search:
+        raise ValueError(f"{log_path} was written by a different search (settings or data changed). "
+                         "Use --fresh to start over or --log to choose another file.")
+    for record in records[1:]:
+        completed[(record['trial_id'], record['rung'])] = record
+    return completed
+
+def _append_log(log_path, record):
+    with open(log_path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+def run_search(n_trials=27, min_rounds=50, max_rounds=1000, reduction_factor=3, workers=None, seed=42,
+               log_path=TUNING_LOG_PATH, fresh=False):
+    """
+    Runs a successive halving search over randomly sampled parameters. Every
+    rung trains the surviving trials for more boosting rounds and keeps the
+    best 1/reduction_factor of them by validation RMSPE. Each finished trial
+    is appended to the log, so an interrupted search resumes where it stopped.
+
+    Args:
+        n_trials (int): Number of sampled parameter sets.
+        min_rounds (int): Boosting rounds of the first rung.
+        max_rounds (int): Boosting rounds of the last rung.
+        reduction_factor (int): Growth of the round budget and shrink of the
+            trial count between rungs.
+        workers (int, optional): Processes. Defaults to the CPU count; each
+            worker gets cpu_count // workers XGBoost threads.
+        seed (int): Seed of the parameter sampling.
+        log_path (str): The JSONL trial log.
+        fresh (bool): Discard an existing log instead of resuming it.
+
+    Returns:
+        dict: The best trial of the last rung.
+    """
+    split = load_train_validation()
+    if split is None:
+        return None
+    X_train, y_train, X_val, y_val, keys = split
+
+    rungs = halving_rungs(min_rounds, max_rounds, reduction_factor)
+    search = {
+        'type': 'search', 'n_trials': n_trials, 'rungs': rungs, 'reduction_factor': reduction_factor,
+        'seed': seed, 'space': SEARCH_SPACE, 'base_params': XGB_PARAMS, 'max_bin': MAX_BIN,
+        'early_stopping_rounds': EARLY_STOPPING_ROUNDS, 'data_key': keys['dmatrix'],
+    }
+    # JSON'a yazılıp okunmuş haliyle karşılaştırmak için (tuple -> list)
+    search = json.loads(json.dumps(search))
+    if fresh and os.path.exists(log_path):
+        os.remove(log_path)
+    completed = _read_log(log_path, search)
+    if not completed and not os.path.exists(log_path):
+        os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+        _append_log(log_path, search)
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(workers or cpu_count, n_trials))
+    nthread = max(1, cpu_count // workers)
+    print(f"Searching {n_trials} trials over rungs {rungs} with {workers} worker(s) x {nthread} thread(s).")
+
+    data_dir = tempfile.mkdtemp(prefix='rossmann-tuning-')
+    pool = None
+    try:
+        _save_arrays(data_dir, X_train, y_train, X_val, y_val)
+        initargs = (data_dir, list(X_train.columns), nthread)
+        if workers > 1:
+            pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs)
+        else:
+            _init_worker(*initargs)
+
+        survivors = list(range(n_trials))
+        for rung, rounds in enumerate(rungs):
+            pending = []
+            for trial_id in survivors:
+                previous = completed.get((trial_id, rung - 1))
+                if (trial_id, rung) not in completed and previous is not None and previous['stopped_early']:
+                    completed[(trial_id, rung)] = {**previous, 'rung': rung, 'rounds': rounds}
+                elif (trial_id, rung) not in completed:
+                    pending.append(trial_id)
+            print(f"\n--- Rung {rung}: {len(survivors)} trials x {rounds} rounds "
+                  f"({len(survivors) - len(pending)} already done) ---")
+
+            if pool is None:
+                results = (_run_trial(t, rung, rounds, sample_params(t, seed)) for t in pending)
+            else:
+                futures = [pool.submit(_run_trial, t, rung, rounds, sample_params(t, seed)) for t in pending]
+                results = (future.result() for future in as_completed(futures))
+            for record in results:
+                _append_log(log_path, record)
+                completed[(record['trial_id'], rung)] = record
+                print(f"Trial {record['trial_id']:>3}: RMSPE {record['rmspe']:.4f} "
+                      f"(best iteration {record['best_iteration']}, {record['seconds']:.1f}s)")
+
+            survivors.sort(key=lambda t: completed[(t, rung)]['rmspe'])
+            if rung < len(rungs) - 1:
+                survivors = survivors[:max(1, len(survivors) // reduction_factor)]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    best = completed[(survivors[0], len(rungs) - 1)]
+    print(f"\nBest trial {best['trial_id']}: RMSPE {best['rmspe']:.4f} with {best['params']}")
+    return best
+
+def export_best_params(best, output_path=TUNED_PARAMS_PATH):
+    """
+    Writes the best trial's parameters merged over XGB_PARAMS, in the format
+    read by pipeline.load_params_file (python src/pipeline.py --params PATH).
+    """
+    exported = {
+        'params': {**XGB_PARAMS, **best['params']},
+        'validation_rmspe': best['rmspe'],
+        'best_iteration': best['best_iteration'],
+        'trial_id': best['trial_id'],
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(output_path, 'w') as f:
+        json.dump(exported, f, indent=2)
+    print(f"Best parameters saved to {output_path}")
+
+if __name__ == '__main__':
+    # Örnek kullanım:
+    # python src/tuning.py --trials 27 --workers 4
+    # python src/pipeline.py --params models/xgb_tuned_params.json
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter search for the sales model.")
+    parser.add_argument('--trials', type=int, default=27, help="Number of sampled parameter sets.")
+    parser.add_argument('--min-rounds', type=int, default=50, help="Boosting rounds of the first rung.")
+    parser.add_argument('--max-rounds', type=int, default=1000, help="Boosting rounds of the last rung.")
+    parser.add_argument('--reduction-factor', type=int, default=3, help="Keep 1/N of the trials per rung.")
+    parser.add_argument('--workers', type=int, default=None, help="Processes (default: CPU count).")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--log', default=TUNING_LOG_PATH, help="Resumable JSONL trial log.")
+    parser.add_argument('--output', default=TUNED_PARAMS_PATH, help="Where to write the best parameters.")
+    parser.add_argument('--fresh', action='store_true', help="Discard an existing trial log.")
+    args = parser.parse_args()
+
+    best_trial = run_search(args.trials, args.min_rounds, args.max_rounds, args.reduction_factor,
+                            args.workers, args.seed, args.log, args.fresh)
+    if best_trial is not None:
+        export_best_params(best_trial, args.output)
@@ -0,0 +1,73 @@
+# engineer_features'ın satır bazlı referansa göre hızlanmasının ölçümü (Rossmann büyüklüğünde sentetik veri)
+#
+# Örnek kullanım:
+# python tests/benchmark_features.py                  # 1.017.209 satır (gerçek train.csv kadar)
+# python tests/benchmark_features.py --rows 200000 --repeat 5
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from config import TRAIN_COLUMNS, MERGE_MEMORY_LIMIT_MB
+from data_prep import merge_data
+from features import engineer_features, _date_dimension, _create_date_features, _create_store_features
+from storage import load_processed_data
+from synthetic import generate_dataset
+from reference_features import reference_engineer_features
+
+# Kaggle Rossmann train.csv satır sayısı
+ROSSMANN_ROWS = 1_017_209
+
+def _best_time(function, df, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        function(frame)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _calendar_and_store_features(df):
+    """The part of engineer_features the reference covers: calendar, competition and Promo2 columns."""
+    calendar, date_codes = _date_dimension(df['Date'])
+    df = _create_date_features(df, calendar, date_codes)
+    return _create_store_features(df, calendar, date_codes)
+
+def run_features_benchmark(rows=ROSSMANN_ROWS, repeat=3, reference_repeat=1):
+    """
+    Times the row-wise reference, the same columns from the vectorized
+    engine and the whole engineer_features (which adds the history features
+    the reference does not compute) on the same merged synthetic rows and
+    returns the best times in seconds.
+    """
+    work_dir = tempfile.mkdtemp(prefix='rossmann-features-benchmark-')
+    try:
+        generate_dataset(os.path.join(work_dir, 'raw'), rows)
+        merge_data(os.path.join(work_dir, 'raw'), os.path.join(work_dir, 'processed'),
+                   memory_limit_mb=MERGE_MEMORY_LIMIT_MB)
+        df = load_processed_data(os.path.join(work_dir, 'processed', 'train_merged'), columns=TRAIN_COLUMNS)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Referans yalnızca takvim/rakip/Promo2 sütunlarını hesaplar; aynı iş ayrıca ölçülür
+    vectorized = _best_time(_calendar_and_store_features, df, repeat)
+    full = _best_time(lambda frame: engineer_features(frame, verbose=False), df, repeat)
+    reference = _best_time(reference_engineer_features, df, reference_repeat)
+    return {'rows': len(df), 'reference': reference, 'vectorized': vectorized, 'engineer_features': full}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Speedup of engineer_features over the row-wise reference.")
+    parser.add_argument('--rows', type=int, default=ROSSMANN_ROWS, help="Synthetic train rows.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs of engineer_features; the best is kept.")
+    args = parser.parse_args()
+
+    result = run_features_benchmark(args.rows, args.repeat)
+    print(f"\n{result['rows']} rows")
+    print(f"{'implementation':<36}{'seconds':>10}{'speedup':>10}")
+    for name, key in (('row-wise reference', 'reference'), ('vectorized, same columns', 'vectorized'),
+                      ('engineer_features (+ history)', 'engineer_features')):
+        print(f"{name:<36}{result[key]:>10.3f}{result['reference'] / result[key]:>9.1f}x")
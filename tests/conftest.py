@@ -0,0 +1,5 @@
+# Testler src/ içindeki modülleri, pipeline gibi düz importlarla kullanır
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
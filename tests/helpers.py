@@ -0,0 +1,25 @@
+# Testlerin ortak yardımcıları: küçük, hızlı eğitilen model paketleri
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from model import save_model_bundle
+
+BUNDLE_FEATURES = ['Store', 'Promo', 'DayOfWeek']
+
+def save_small_bundle(path, seed=0, rounds=5, features=BUNDLE_FEATURES, **bundle_parts):
+    """
+    Trains a tiny booster on random rows, saves it as a bundle at path and
+    returns the rows. Features other than BUNDLE_FEATURES (e.g. history
+    features, with a history state) get random values around 5000.
+    bundle_parts (metadata, store_index, history, ...) go to save_model_bundle.
+    """
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.integers(0, 7, (200, len(features))), columns=features).astype(np.float32)
+    for feature in features:
+        if feature not in BUNDLE_FEATURES:
+            X[feature] = rng.normal(5000, 1500, 200).astype(np.float32)
+    booster = xgb.train({'max_depth': 3, 'seed': seed}, xgb.DMatrix(X, label=rng.random(200) * 1000),
+                        num_boost_round=rounds)
+    save_model_bundle(booster, str(path), list(features), {}, {'CompetitionDistance': 2325.0}, **bundle_parts)
+    return X
@@ -0,0 +1,55 @@
+# Vektörleştirmeden önceki satır bazlı (df.apply) özellik mühendisliği; eşdeğerlik testleri ve hız ölçümü için referans
+import pandas as pd
+
+def _create_date_features(df):
+    df['Year'] = df['Date'].dt.year
+    df['Month'] = df['Date'].dt.month
+    df['Day'] = df['Date'].dt.day
+    df['DayOfWeek'] = df['Date'].dt.dayofweek
+    df['WeekOfYear'] = df['Date'].dt.isocalendar().week.astype(int)
+    return df
+
+def _create_competition_features(df):
+    # Eski sürümdeki fillna(inplace=True) çağrıları, copy-on-write altında da aynı sonucu verecek şekilde atanır
+    df['CompetitionOpenSinceMonth'] = df['CompetitionOpenSinceMonth'].fillna(0)
+    df['CompetitionOpenSinceYear'] = df['CompetitionOpenSinceYear'].fillna(0)
+    df['CompetitionOpen'] = (df['Year'] - df['CompetitionOpenSinceYear']) * 12 + \
+                            (df['Month'] - df['CompetitionOpenSinceMonth'])
+    df['CompetitionOpen'] = df['CompetitionOpen'].apply(lambda x: max(x, 0))
+    df['CompetitionDistance'] = df['CompetitionDistance'].fillna(df['CompetitionDistance'].median())
+    return df
+
+def _is_promo2_active(row):
+    if row['Promo2'] == 0:
+        return 0
+
+    promo2_start_year = int(row['Promo2SinceYear'])
+    promo2_start_week = int(row['Promo2SinceWeek'])
+    current_year = row['Year']
+    current_week = row['WeekOfYear']
+
+    if current_year < promo2_start_year:
+        return 0
+    if current_year == promo2_start_year and current_week < promo2_start_week:
+        return 0
+
+    month_str = row['Date'].strftime('%b')
+    if month_str in row['PromoInterval']:
+        return 1
+    else:
+        return 0
+
+def _create_promo2_features(df):
+    df['Promo2SinceWeek'] = df['Promo2SinceWeek'].fillna(0)
+    df['Promo2SinceYear'] = df['Promo2SinceYear'].fillna(0)
+    df['PromoInterval'] = df['PromoInterval'].astype(object).fillna('')
+    df['IsPromo2'] = df.apply(_is_promo2_active, axis=1)
+    return df
+
+def reference_engineer_features(df):
+    """The row-wise implementation of engineer_features before vectorization (without history features)."""
+    df['Date'] = pd.to_datetime(df['Date'])
+    df = _create_date_features(df)
+    df = _create_competition_features(df)
+    df = _create_promo2_features(df)
+    return df
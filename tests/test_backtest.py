@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import xgboost as xgb
+
+import backtest
+from backtest import make_folds, _save_arrays, _init_worker, _fold_matrix
+from config import FEATURES, HISTORY_MIN_LAG_DAYS
+
+DATES = np.arange(np.datetime64('2014-01-01'), np.datetime64('2015-08-01')).repeat(3)
+
+def test_folds_end_on_the_last_horizon():
+    folds = make_folds(DATES, 4, horizon_weeks=6)
+    assert [fold['val'][1] for fold in folds][-1] == len(DATES)
+    for before, after in zip(folds, folds[1:]):
+        assert before['val'] == (before['train'][1], after['train'][1])
+
+def test_rejects_horizons_longer_than_the_history_lag():
+    make_folds(DATES, 2, horizon_weeks=HISTORY_MIN_LAG_DAYS // 7)
+    with pytest.raises(ValueError):
+        make_folds(DATES, 2, horizon_weeks=HISTORY_MIN_LAG_DAYS // 7 + 1)
+
+def test_bin_cuts_come_from_the_fold_training_rows(tmp_path):
+    rows = 2000
+    X = np.tile(np.arange(rows, dtype=np.float32)[:, None], (1, len(FEATURES)))
+    _save_arrays(str(tmp_path), X, np.ones(rows))
+    _init_worker(str(tmp_path), 1)
+    try:
+        dtrain = _fold_matrix(0, 1000)
+        dval = _fold_matrix(1000, rows, dtrain)
+    finally:
+        backtest._worker_state.clear()
+    own = xgb.QuantileDMatrix(X[:1000], max_bin=backtest.MAX_BIN, feature_names=FEATURES)
+    everything = xgb.QuantileDMatrix(X, max_bin=backtest.MAX_BIN, feature_names=FEATURES)
+    # Validasyon satırları (>= 1000) eğitim matrisinin kutu sınırlarını etkilemez
+    np.testing.assert_array_equal(dtrain.get_quantile_cut()[1], own.get_quantile_cut()[1])
+    assert not np.array_equal(dtrain.get_quantile_cut()[1], everything.get_quantile_cut()[1])
+    assert dval.num_row() == 1000
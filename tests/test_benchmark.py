@@ -0,0 +1,47 @@
+import copy
+
+import pytest
+
+from benchmark import compare_results
+
+BASELINE = {
+    'rows': 200_000,
+    'boost_rounds': 50,
+    'environment': {'python': '3.11.7'},
+    'stages': {
+        'features': {'seconds': 1.0, 'peak_rss_mb': 400.0},
+        'train': {'seconds': 2.0, 'peak_rss_mb': 500.0},
+        'app_single_row': {'seconds': 0.001, 'peak_rss_mb': 450.0, 'calls': 200},
+    },
+}
+
+def _current(changes=None):
+    current = copy.deepcopy(BASELINE)
+    for (stage, metric), value in (changes or {}).items():
+        current['stages'][stage][metric] = value
+    return current
+
+def test_no_regression_within_thresholds():
+    current = _current({('features', 'seconds'): 1.2, ('train', 'peak_rss_mb'): 560.0})
+    assert compare_results(current, BASELINE, time_threshold=0.25, memory_threshold=0.15) == []
+
+def test_flags_slowdown_and_memory_growth_beyond_thresholds():
+    current = _current({('features', 'seconds'): 1.3, ('train', 'peak_rss_mb'): 600.0})
+    regressions = compare_results(current, BASELINE, time_threshold=0.25, memory_threshold=0.15)
+    assert regressions == [('features', 'seconds', 1.0, 1.3), ('train', 'peak_rss_mb', 500.0, 600.0)]
+
+def test_ignores_relative_changes_below_the_absolute_floor():
+    # Çağrı başı 0.2 ms'lik artış (%20), 200 çağrıda 40 ms eder; mutlak alt sınırın altında kalır
+    current = _current({('app_single_row', 'seconds'): 0.0012})
+    assert compare_results(current, BASELINE, time_threshold=0.05) == []
+
+def test_single_row_slowdown_is_scaled_by_calls():
+    current = _current({('app_single_row', 'seconds'): 0.002})
+    regressions = compare_results(current, BASELINE)
+    assert [(stage, metric) for stage, metric, _, _ in regressions] == [('app_single_row', 'seconds')]
+
+def test_rejects_a_baseline_of_another_scale():
+    current = _current()
+    current['rows'] = 1_000_000
+    with pytest.raises(ValueError):
+        compare_results(current, BASELINE)
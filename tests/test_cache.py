@@ -0,0 +1,68 @@
+import os
+
+import pandas as pd
+import pytest
+
+import cache
+import pipeline
+
+def _write_bytes(size):
+    def write(path):
+        with open(os.path.join(path, 'data.bin'), 'wb') as f:
+            f.write(b'\0' * size)
+    return write
+
+def _first_stage():
+    return 1
+
+def _second_stage():
+    return 2
+
+def test_key_changes_with_inputs_and_sources(tmp_path):
+    raw = tmp_path / 'train.csv'
+    raw.write_text('Store,Sales\n1,10\n')
+    key = cache.cache_key(cache.file_digest(raw), cache.source_digest(_first_stage), ['Promo'])
+    assert cache.cache_key(cache.file_digest(raw), cache.source_digest(_first_stage), ['Promo']) == key
+    assert cache.cache_key(cache.file_digest(raw), cache.source_digest(_second_stage), ['Promo']) != key
+    assert cache.cache_key(cache.file_digest(raw), cache.source_digest(_first_stage), ['Open']) != key
+    raw.write_text('Store,Sales\n1,11\n')
+    assert cache.cache_key(cache.file_digest(raw), cache.source_digest(_first_stage), ['Promo']) != key
+
+def test_hit_skips_the_stage(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'CACHE_PATH', str(tmp_path))
+    keys = {'features': 'k1'}
+    df = pd.DataFrame({'Store': [1, 2], 'Sales': [10, 20]})
+    pipeline._cache_features(keys, df, {'encoders': {}, 'imputation': {}})
+
+    def _fail(*args):
+        raise AssertionError("the merge stage ran despite a cache hit")
+    monkeypatch.setattr(pipeline, '_prepare_processed_data', _fail)
+    cached, artifacts = pipeline._build_features(keys, set(), prep_workers=1)
+    pd.testing.assert_frame_equal(cached, df)
+    assert artifacts == {'encoders': {}, 'imputation': {}}
+    with pytest.raises(AssertionError, match='cache hit'):
+        pipeline._build_features(keys, {'features'}, prep_workers=1)
+
+def test_merge_key_is_written_only_after_a_merge(tmp_path, monkeypatch):
+    dataset = tmp_path / 'train_merged'
+    dataset.mkdir()
+    monkeypatch.setattr(pipeline, 'PROCESSED_TRAIN_DATASET', str(dataset))
+    # train.csv eksik: merge_data hata yazıp False döner, eski veri yerinde kalır
+    monkeypatch.setattr(pipeline, 'merge_data', lambda *args, **kwargs: False)
+    pipeline._prepare_processed_data({'merge': 'new'}, set())
+    assert pipeline._read_merge_key() is None
+    monkeypatch.setattr(pipeline, 'merge_data', lambda *args, **kwargs: True)
+    pipeline._prepare_processed_data({'merge': 'new'}, set())
+    assert pipeline._read_merge_key() == 'new'
+
+def test_eviction_removes_the_least_recently_used_entries(tmp_path):
+    for age, key in enumerate(['newest', 'middle', 'oldest']):
+        path = cache.save_entry(str(tmp_path), 'features', key, _write_bytes(400_000))
+        mtime = 1_000_000 - age * 100
+        os.utime(os.path.join(path, 'manifest.json'), (mtime, mtime))
+    # Okunan girdi en yeni sayılır
+    assert cache.lookup_entry(str(tmp_path), 'features', 'oldest')
+    cache.evict_entries(str(tmp_path), max_size_mb=1)
+    assert sorted(os.listdir(tmp_path / 'features')) == ['newest', 'oldest']
+    cache.evict_entries(str(tmp_path), max_size_mb=0.5)
+    assert os.listdir(tmp_path / 'features') == ['oldest']
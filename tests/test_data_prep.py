@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+from data_prep import merge_data
+from storage import load_processed_data
+from synthetic import generate_dataset
+
+def _merged(raw, processed, memory_limit_mb):
+    merge_data(str(raw), str(processed), memory_limit_mb=memory_limit_mb)
+    return load_processed_data(str(processed / 'train_merged')).sort_values(['Store', 'Date'], ignore_index=True)
+
+def test_chunked_merge_equals_the_in_memory_merge(tmp_path):
+    generate_dataset(str(tmp_path / 'raw'), 10_000, seed=5)
+    in_memory = _merged(tmp_path / 'raw', tmp_path / 'in_memory', None)
+    # 0.05 MB'lık sınır birkaç yüz satırlık parçalara yol açar
+    chunked = _merged(tmp_path / 'raw', tmp_path / 'chunked', 0.05)
+    assert len(list((tmp_path / 'chunked').rglob('*.parquet'))) > len(list((tmp_path / 'in_memory').rglob('*.parquet')))
+    pd.testing.assert_frame_equal(chunked, in_memory)
+
+@pytest.mark.parametrize('memory_limit_mb', [None, 0.05])
+def test_stores_missing_from_the_store_table_are_rejected(tmp_path, memory_limit_mb):
+    raw = tmp_path / 'raw'
+    generate_dataset(str(raw), 10_000, seed=5)
+    store = pd.read_csv(raw / 'store.csv')
+    store[store['Store'] != pd.read_csv(raw / 'train.csv', nrows=1)['Store'][0]].to_csv(raw / 'store.csv', index=False)
+    with pytest.raises(ValueError, match='Stores missing from store.csv'):
+        merge_data(str(raw), str(tmp_path / 'processed'), memory_limit_mb=memory_limit_mb)
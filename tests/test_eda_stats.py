@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from eda_stats import EdaStats, RunningMoments, ValueHistogram, collect_eda_stats
+
+def _sales_rows(rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    sales = np.where(rng.random(rows) < 0.2, 0, rng.integers(1, 20_000, rows))
+    return pd.DataFrame({
+        'Sales': sales,
+        'StateHoliday': rng.choice(['0', 'a', 'b', 'c'], rows, p=[0.9, 0.05, 0.03, 0.02]),
+        'CompetitionDistance': np.where(rng.random(rows) < 0.1, np.nan, rng.random(rows) * 1000),
+    })
+
+def _chunks(df, sizes):
+    bounds = np.r_[0, np.cumsum(sizes)]
+    return [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+def test_merged_moments_match_describe():
+    values = np.random.default_rng(1).normal(100, 15, 3001)
+    total = RunningMoments()
+    for part in np.array_split(values, [1, 10, 1000, 1000]):
+        # Boş parçalar da birleştirilebilir
+        total.merge(RunningMoments().update(part))
+    expected = pd.Series(values).describe()
+    assert total.count == expected['count']
+    assert total.mean == pytest.approx(expected['mean'], rel=1e-12)
+    assert total.std == pytest.approx(expected['std'], rel=1e-12)
+    assert (total.min, total.max) == (expected['min'], expected['max'])
+
+def test_histogram_quantiles_of_integers_are_exact():
+    values = np.random.default_rng(2).integers(0, 500, 999)
+    histogram = ValueHistogram().update(values[:400]).merge(ValueHistogram().update(values[400:]))
+    qs = [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1]
+    np.testing.assert_allclose(histogram.quantiles(qs), np.quantile(values, qs))
+
+def test_wide_bins_stay_within_one_bin_width():
+    values = np.random.default_rng(3).random(2000) * 1000
+    histogram = ValueHistogram(width=10).update(values)
+    qs = np.linspace(0, 1, 11)
+    assert np.abs(histogram.quantiles(qs) - np.quantile(values, qs)).max() < 10
+    with pytest.raises(ValueError):
+        histogram.merge(ValueHistogram(width=1))
+    with pytest.raises(ValueError):
+        ValueHistogram().update([-1.0])
+
+def test_chunked_stats_match_pandas():
+    df = _sales_rows()
+    # Parça sınırları ve sırası sonucu değiştirmez
+    stats = collect_eda_stats(_chunks(df, [1, 999, 2500, 1500]))
+    merged = EdaStats().update(df.iloc[:2000]).merge(EdaStats().update(df.iloc[2000:]))
+    expected = df['Sales'].astype(float).describe()
+    for result in (stats, merged):
+        pd.testing.assert_series_equal(result.describe_sales(), expected, rtol=1e-12)
+        assert result.rows == len(df)
+        assert result.null_counts == df.isna().sum().to_dict()
+        for label, group in df.groupby('StateHoliday')['Sales']:
+            np.testing.assert_allclose(result.sales_by_holiday[label].quantiles([0.25, 0.5, 0.75]),
+                                       group.quantile([0.25, 0.5, 0.75]).to_numpy())
+        positive = df.loc[df['Sales'] > 0, 'Sales']
+        assert result.positive_sales.count == len(positive)
+        assert result.positive_sales.quantiles([0.5])[0] == positive.median()
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+from config import FEATURES, TARGET, TRAIN_COLUMNS
+from data_prep import merge_data
+from external_memory import FeatureBatchIter, _training_plan
+from features import engineer_features
+from storage import load_processed_data
+from synthetic import generate_dataset
+
+@pytest.fixture(scope='module')
+def data_dirs(tmp_path_factory):
+    root = tmp_path_factory.mktemp('external_memory')
+    generate_dataset(str(root / 'raw'), 20_000, seed=13)
+    merge_data(str(root / 'raw'), str(root / 'processed'))
+    return root / 'raw', str(root / 'processed' / 'train_merged')
+
+def _streamed(dataset_path, store_df, batch_rows):
+    """The training rows FeatureBatchIter feeds to XGBoost in build_external_matrices."""
+    plan = _training_plan(dataset_path, store_df, batch_rows)
+    iterator = FeatureBatchIter(dataset_path, plan['batches'], plan['index'], plan['encoders'],
+                                plan['validation_start'], plan['history_cutoff'])
+    parts = []
+    while iterator.next(lambda data, label: parts.append(data.assign(**{TARGET: label}))):
+        pass
+    return pd.concat(parts, ignore_index=True), len(plan['batches'])
+
+def _sorted(df):
+    return df.sort_values(['Store', 'Year', 'Month', 'Day'], ignore_index=True)
+
+def test_batches_match_engineer_features(data_dirs):
+    raw, dataset_path = data_dirs
+    streamed, num_batches = _streamed(dataset_path, pd.read_csv(raw / 'store.csv'), batch_rows=2000)
+    assert num_batches > 3
+
+    df = load_processed_data(dataset_path, columns=TRAIN_COLUMNS)
+    validation_start = pipeline._validation_start(df)
+    df = engineer_features(df, verbose=False, history_cutoff=validation_start - pd.Timedelta(days=1))
+    df, _ = pipeline._encode_categorical_features(df)
+    df = df[(df['Open'] == 1) & (df['Sales'] > 0) & (df['Date'] < validation_start)]
+    expected = df[FEATURES].assign(**{TARGET: df[TARGET].to_numpy(dtype=np.float32)})
+    pd.testing.assert_frame_equal(_sorted(streamed), _sorted(expected), check_dtype=False)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import engineer_features
+from reference_features import reference_engineer_features
+
+# Vektörleştirilmiş motorun ürettiği ve referansla karşılaştırılan sütunlar
+COMPARED_COLUMNS = [
+    'Year', 'Month', 'Day', 'DayOfWeek', 'WeekOfYear', 'CompetitionDistance', 'CompetitionOpen', 'IsPromo2'
+]
+
+STORES = pd.DataFrame({
+    'Store': [1, 2, 3, 4, 5],
+    'StoreType': ['a', 'b', 'c', 'd', 'a'],
+    'Assortment': ['a', 'b', 'c', 'a', 'c'],
+    # Mağaza 1: rakip ve Promo2 bilgilerinin hepsi eksik
+    'CompetitionDistance': [np.nan, 500.0, 1200.0, 20000.0, 80.0],
+    'CompetitionOpenSinceMonth': [np.nan, 12.0, np.nan, np.nan, 6.0],
+    'CompetitionOpenSinceYear': [np.nan, 2015.0, 2016.0, 2021.0, 2009.0],
+    'Promo2': [0, 1, 1, 1, 1],
+    # Promo2 başlangıçları ISO 53. haftada ve yıl sınırında
+    'Promo2SinceWeek': [np.nan, 53.0, 1.0, 53.0, 1.0],
+    'Promo2SinceYear': [np.nan, 2015.0, 2016.0, 2020.0, 2014.0],
+    'PromoInterval': [np.nan, 'Jan,Apr,Jul,Oct', 'Mar,Jun,Sept,Dec', 'Feb,May,Aug,Nov', 'Jan,Apr,Jul,Oct'],
+})
+
+# Yıl sınırları (53 haftalık 2015 ve 2020 yılları dahil) ve 'Sept' yazımı için Eylül günleri
+DATE_RANGES = [
+    ('2014-12-25', '2015-01-08'),
+    ('2015-12-24', '2016-01-10'),
+    ('2016-08-29', '2016-09-04'),
+    ('2020-12-24', '2021-01-10'),
+]
+
+def _merged_rows():
+    dates = pd.DatetimeIndex(np.concatenate([pd.date_range(start, end).to_numpy() for start, end in DATE_RANGES]))
+    rows = pd.DataFrame({
+        'Store': np.repeat(STORES['Store'].to_numpy(), len(dates)),
+        'Date': np.tile(dates.to_numpy(), len(STORES)),
+    })
+    rng = np.random.default_rng(0)
+    rows['Open'] = (rng.random(len(rows)) > 0.15).astype(int)
+    rows['Sales'] = np.where(rows['Open'] == 1, rng.integers(1000, 10000, len(rows)), 0)
+    rows['Customers'] = rows['Sales'] // 10
+    rows['Promo'] = rng.integers(0, 2, len(rows))
+    rows['StateHoliday'] = rng.choice(['0', 'a', 'b', 'c'], len(rows), p=[0.9, 0.04, 0.03, 0.03])
+    rows['SchoolHoliday'] = rng.integers(0, 2, len(rows))
+    return rows.merge(STORES, on='Store', how='left')
+
+def _compare(merged):
+    expected = reference_engineer_features(merged.copy())
+    actual = engineer_features(merged.copy(), verbose=False)
+    pd.testing.assert_frame_equal(actual[COMPARED_COLUMNS], expected[COMPARED_COLUMNS], check_dtype=False)
+    return actual
+
+def test_matches_reference():
+    _compare(_merged_rows())
+
+def test_matches_reference_with_string_dates():
+    merged = _merged_rows()
+    merged['Date'] = merged['Date'].dt.strftime('%Y-%m-%d')
+    _compare(merged)
+
+def test_matches_reference_in_shuffled_order():
+    _compare(_merged_rows().sample(frac=1.0, random_state=1).reset_index(drop=True))
+
+@pytest.mark.parametrize('date, year, week', [
+    ('2014-12-29', 2014, 1),   # ISO 2015'in 1. haftası, takvim yılı 2014
+    ('2015-12-31', 2015, 53),
+    ('2016-01-03', 2016, 53),  # ISO 2015'in 53. haftası, takvim yılı 2016
+    ('2016-01-04', 2016, 1),
+    ('2021-01-03', 2021, 53),
+])
+def test_iso_week_at_year_boundaries(date, year, week):
+    features = _compare(_merged_rows())
+    row = features[features['Date'] == pd.Timestamp(date)].iloc[0]
+    assert (row['Year'], row['WeekOfYear']) == (year, week)
+
+def test_missing_store_fields():
+    merged = _merged_rows()
+    features = _compare(merged)
+    store_1 = features[features['Store'] == 1]
+    # Açılış tarihi bilinmeyen rakip, 0. yıldan beri açık sayılır; eksik mesafe satırların medyanıdır
+    assert (store_1['CompetitionOpen'] == store_1['Year'].astype(int) * 12 + store_1['Month']).all()
+    assert (store_1['CompetitionDistance'] == merged['CompetitionDistance'].median()).all()
+    assert (store_1['IsPromo2'] == 0).all()
+
+def test_promo2_starts_in_week_53():
+    features = _compare(_merged_rows())
+    store_2 = features[features['Store'] == 2].set_index('Date')['IsPromo2']
+    # 53. haftanın Ocak günleri (takvim yılı 2016 > 2015) aktif, başlangıçtan önceki Aralık günleri değil
+    assert store_2[pd.Timestamp('2015-12-24')] == 0
+    assert store_2[pd.Timestamp('2016-01-01')] == 1
+    assert store_2[pd.Timestamp('2016-01-10')] == 1
+
+def test_competition_distance_fill_overrides_median():
+    features = engineer_features(_merged_rows(), verbose=False, competition_distance_fill=1234.0)
+    assert (features.loc[features['Store'] == 1, 'CompetitionDistance'] == 1234.0).all()
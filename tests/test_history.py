@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from config import HISTORY_FEATURES, HISTORY_MIN_LAG_DAYS
+from history import build_history_state, extend_history_state, history_features
+
+def _history_rows(stores=(1, 2), start='2014-01-01', end='2015-07-31', seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, end)
+    rows = pd.DataFrame({
+        'Store': np.repeat(stores, len(dates)),
+        'Date': np.tile(dates, len(stores)),
+    })
+    rows['Open'] = (rng.random(len(rows)) < 0.85).astype(np.int8)
+    rows['Sales'] = np.where(rows['Open'] == 1, rng.integers(2000, 9000, len(rows)), 0)
+    rows['Promo'] = rng.integers(0, 2, len(rows)).astype(np.int8)
+    rows['StateHoliday'] = '0'
+    rows['SchoolHoliday'] = rng.integers(0, 2, len(rows)).astype(np.int8)
+    return rows
+
+def _predict_rows(stores, dates, promo=0, state_holiday='0', school_holiday=0):
+    return pd.DataFrame({
+        'Store': stores, 'Date': pd.to_datetime(dates), 'Promo': promo,
+        'StateHoliday': state_holiday, 'SchoolHoliday': school_holiday,
+    })
+
+def test_features_do_not_depend_on_the_other_rows():
+    state = build_history_state(_history_rows())
+    alone = history_features(_predict_rows([1], ['2015-08-01']), state)
+    # Aynı mağazanın iki gün sonraki promosyon/tatil satırı ve aynı günün tekrarı eklenir
+    others = pd.concat([
+        _predict_rows([1], ['2015-08-01']),
+        _predict_rows([1, 1, 2], ['2015-08-03', '2015-08-01', '2015-09-20'],
+                      promo=1, state_holiday='a', school_holiday=1),
+    ], ignore_index=True)
+    together = history_features(others, state)
+    pd.testing.assert_frame_equal(together.iloc[[0]], alone)
+    pd.testing.assert_frame_equal(together.iloc[[2]].reset_index(drop=True), alone)
+
+def test_rows_without_sales_do_not_hide_the_stored_sales():
+    state = build_history_state(_history_rows())
+    later = _predict_rows([1], ['2015-09-10'])
+    # Durumda zaten olan bir günün satışsız satırı, sonraki günlerin özelliklerini değiştirmez
+    stored_day = _predict_rows([1], ['2015-07-20'])
+    together = history_features(pd.concat([later, stored_day], ignore_index=True), state)
+    pd.testing.assert_frame_equal(together.iloc[[0]], history_features(later, state))
+
+def test_no_sales_after_the_cutoff_leak_into_the_features():
+    rows = _history_rows()
+    cutoff = pd.Timestamp('2015-05-15')
+    features = history_features(rows, cutoff=cutoff)
+    changed = rows.copy()
+    after = changed['Date'] > cutoff
+    changed.loc[after, 'Sales'] = changed.loc[after, 'Sales'] * 10 + 1
+    pd.testing.assert_frame_equal(history_features(changed, cutoff=cutoff), features)
+    # Kesimden HISTORY_MIN_LAG_DAYS sonraki satırlar kesim sonrası satışları görmez, kesimsiz görür
+    late = (rows['Date'] > cutoff + pd.Timedelta(days=HISTORY_MIN_LAG_DAYS)).to_numpy()
+    uncut = history_features(changed, cutoff=None)
+    assert not np.allclose(uncut.loc[late, 'SalesMean7'], features.loc[late, 'SalesMean7'], equal_nan=True)
+
+def test_state_features_match_the_full_history():
+    rows = _history_rows()
+    split = pd.Timestamp('2015-05-01')
+    before, after = rows[rows['Date'] < split], rows[rows['Date'] >= split]
+    state = extend_history_state(build_history_state(before[before['Date'] < '2015-03-01']),
+                                 before[before['Date'] >= '2015-03-01'])
+    full = history_features(rows)
+    pd.testing.assert_frame_equal(history_features(after, state), full.loc[after.index])
+    assert list(full.columns) == HISTORY_FEATURES
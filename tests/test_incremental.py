@@ -0,0 +1,83 @@
+import os
+
+import pandas as pd
+import pytest
+
+import incremental
+from data_prep import merge_data, raw_checkpoint
+from helpers import save_small_bundle
+from history import build_history_state
+from model import load_model_bundle
+from storage import load_processed_data
+from store_index import build_store_index
+from synthetic import generate_dataset
+
+# Eğitimden sonra train.csv'ye eklenen günler
+APPENDED_DAYS = 14
+
+@pytest.fixture
+def data_dirs(tmp_path, monkeypatch):
+    """A synthetic raw/processed data pair whose train.csv lacks its last APPENDED_DAYS days."""
+    raw, processed = tmp_path / 'raw', tmp_path / 'processed'
+    generate_dataset(str(raw), 10_000, seed=3)
+    train = pd.read_csv(raw / 'train.csv', dtype={'StateHoliday': str})
+    train = train.sort_values(['Date', 'Store'], kind='stable')
+    split = (pd.to_datetime(train['Date']).max() - pd.Timedelta(days=APPENDED_DAYS)).strftime('%Y-%m-%d')
+    train[train['Date'] <= split].to_csv(raw / 'train.csv', index=False)
+    merge_data(str(raw), str(processed))
+    monkeypatch.setattr(incremental, 'RAW_DATA_PATH', str(raw))
+    monkeypatch.setattr(incremental, 'PROCESSED_DATA_PATH', str(processed))
+    monkeypatch.setattr(incremental, 'PROCESSED_TRAIN_DATASET', str(processed / 'train_merged'))
+    return {'raw': raw, 'dataset': str(processed / 'train_merged'), 'appended': train[train['Date'] > split],
+            'bundle': str(tmp_path / 'bundle'), 'log': str(tmp_path / 'runs.jsonl')}
+
+def _save_bundle(dirs):
+    rows = load_processed_data(dirs['dataset'])
+    save_small_bundle(
+        dirs['bundle'], rounds=5, metadata={'raw_checkpoint': raw_checkpoint(os.path.join(dirs['raw'], 'train.csv'))},
+        store_index=build_store_index(pd.read_csv(dirs['raw'] / 'store.csv')), history=build_history_state(rows)
+    )
+
+def _update(dirs, **kwargs):
+    options = {'mode': 'continue', 'window_weeks': 4, 'holdout_days': 7, 'rounds': 3, 'max_degradation': 1e9,
+               'fallback': False, 'bundle_path': dirs['bundle'], 'log_path': dirs['log'], 'publish': False}
+    return incremental.run_incremental_update(**{**options, **kwargs})
+
+def test_update_continues_the_booster_and_advances_the_checkpoint(data_dirs):
+    _save_bundle(data_dirs)
+    train_csv = os.path.join(data_dirs['raw'], 'train.csv')
+    data_dirs['appended'].to_csv(train_csv, mode='a', header=False, index=False)
+
+    record = _update(data_dirs)
+    assert record['action'] == 'updated'
+    assert record['new_rows'] == len(data_dirs['appended'])
+    bundle = load_model_bundle(data_dirs['bundle'])
+    assert bundle.booster.num_boosted_rounds() == 5 + 3
+    assert bundle.metadata['raw_checkpoint'] == raw_checkpoint(train_csv)
+    assert bundle.metadata['incremental']['updates'] == 1
+    dates = load_processed_data(data_dirs['dataset'], columns=['Date'])['Date']
+    assert dates.max() == pd.Timestamp(data_dirs['appended']['Date'].max())
+    assert bundle.history['day'].max() == dates.max().to_datetime64().astype('datetime64[D]').astype(int)
+
+    # Kontrol noktası ilerlediği için aynı satırlar ikinci kez okunmaz
+    assert _update(data_dirs)['new_rows'] == 0
+
+def test_refuses_a_rewritten_train_csv(data_dirs, monkeypatch):
+    _save_bundle(data_dirs)
+    train_csv = os.path.join(data_dirs['raw'], 'train.csv')
+    train = pd.read_csv(train_csv, dtype={'StateHoliday': str})
+    # Eklemek yerine mevcut satırları değiştirmek
+    train.loc[len(train) - 1, 'Sales'] += 1
+    pd.concat([train, data_dirs['appended']]).to_csv(train_csv, index=False)
+    rows_before = len(load_processed_data(data_dirs['dataset'], columns=['Date']))
+
+    record = _update(data_dirs)
+    assert record['action'] == 'kept' and 'not only appended' in record['reason']
+    assert load_model_bundle(data_dirs['bundle']).booster.num_boosted_rounds() == 5
+    assert len(load_processed_data(data_dirs['dataset'], columns=['Date'])) == rows_before
+
+    # Tam eğitime düşülünce güncellenen paket yolu eğitime verilir
+    calls = []
+    monkeypatch.setattr(incremental, 'run_training_pipeline', lambda **kwargs: calls.append(kwargs))
+    assert _update(data_dirs, fallback=True)['action'] == 'full_retrain'
+    assert calls[0]['bundle_path'] == data_dirs['bundle'] and calls[0]['publish'] is False
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import HISTORY_SALES_FEATURES
+from helpers import BUNDLE_FEATURES, save_small_bundle
+from history import build_history_state
+from inference import score_batches
+
+def _store_days(start, end, stores=(1, 2, 3, 500, 1000)):
+    rng = np.random.default_rng(0)
+    dates = pd.date_range(start, end)
+    rows = pd.DataFrame({'Store': np.repeat(stores, len(dates)), 'Date': np.tile(dates, len(stores))})
+    rows['Open'] = (rng.random(len(rows)) < 0.9).astype(np.int8)
+    rows['Sales'] = np.where(rows['Open'] == 1, rng.integers(2000, 9000, len(rows)), 0)
+    rows['Promo'] = rng.integers(0, 2, len(rows)).astype(np.int8)
+    rows['StateHoliday'] = '0'
+    rows['SchoolHoliday'] = 0
+    return rows
+
+@pytest.fixture(scope='module')
+def bundle_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('inference') / 'bundle'
+    state = build_history_state(_store_days('2014-06-01', '2015-07-31'))
+    save_small_bundle(path, features=BUNDLE_FEATURES + HISTORY_SALES_FEATURES, history=state)
+    return str(path)
+
+def _score(bundle_path, rows, output_path, chunksize, workers):
+    chunks = (rows.iloc[i:i + chunksize] for i in range(0, len(rows), chunksize))
+    score_batches(chunks, str(output_path), model_path=bundle_path, workers=workers)
+    return pd.read_parquet(output_path)
+
+def test_output_does_not_depend_on_chunks_or_workers(bundle_path, tmp_path):
+    # Satışları bilinen satırlar: özellikler yine yalnızca paketteki geçmişten gelmeli
+    rows = _store_days('2015-08-01', '2015-11-30').sample(frac=1, random_state=0)
+    expected = _score(bundle_path, rows, tmp_path / 'whole.parquet', len(rows), 1)
+    for chunksize, workers in [(97, 1), (1000, 2), (97, 2)]:
+        output = _score(bundle_path, rows, tmp_path / f'{chunksize}_{workers}.parquet', chunksize, workers)
+        pd.testing.assert_frame_equal(output, expected)
+    assert (expected.loc[rows['Open'].to_numpy() == 0, 'Sales'] == 0).all()
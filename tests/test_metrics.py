@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from metrics import ZERO_TARGET, RMSPEMetric, evaluation_report, grouped_metrics, regression_metrics, rmspe_score
+
+def _rows(n=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        'Store': rng.integers(1, 50, n),
+        'StoreType': rng.integers(0, 4, n).astype(np.int8),
+        'DayOfWeek': rng.integers(1, 8, n),
+        'Promo': rng.integers(0, 2, n),
+        'StateHoliday': rng.integers(0, 4, n).astype(np.int8),
+    })
+    y_true = np.where(rng.random(n) < 0.02, 0, rng.integers(1000, 10_000, n)).astype(float)
+    y_pred = y_true * rng.normal(1.02, 0.1, n) + 50
+    return X, y_true, y_pred
+
+def _reference(y_true, y_pred):
+    """The metrics of one group, written out with pandas."""
+    df = pd.DataFrame({'y': y_true, 'p': y_pred})
+    error = df['p'] - df['y']
+    percentage = error / df['y'].replace(0, ZERO_TARGET)
+    return {
+        'rows': len(df),
+        'rmspe': np.sqrt((percentage ** 2).mean()),
+        'rmse': np.sqrt((error ** 2).mean()),
+        'mape': percentage.abs().mean(),
+        'bias': error.mean(),
+        'bias_pct': error.sum() / df['y'].sum(),
+    }
+
+def _assert_metrics(result, expected):
+    assert result['rows'] == expected['rows']
+    for name in ('rmspe', 'rmse', 'mape', 'bias', 'bias_pct'):
+        assert result[name] == pytest.approx(expected[name], rel=1e-9), name
+
+def test_overall_metrics():
+    _, y_true, y_pred = _rows()
+    _assert_metrics(regression_metrics(y_true, y_pred), _reference(y_true, y_pred))
+    assert rmspe_score(y_true, y_pred) == pytest.approx(_reference(y_true, y_pred)['rmspe'], rel=1e-12)
+
+def test_breakdown_matches_groupby():
+    X, y_true, y_pred = _rows()
+    encoders = {'StoreType': ['a', 'b', 'c', 'd'], 'StateHoliday': ['0', 'a', 'b', 'c']}
+    report = evaluation_report(X, y_true, y_pred, encoders)
+    _assert_metrics(report['overall'], _reference(y_true, y_pred))
+    for feature in X.columns:
+        groups = X[feature].to_numpy()
+        expected = {}
+        for value, positions in pd.Series(np.arange(len(X))).groupby(groups):
+            label = encoders[feature][value] if feature in encoders else value
+            expected[str(label)] = _reference(y_true[positions], y_pred[positions])
+        assert report['breakdown'][feature].keys() == expected.keys(), feature
+        for label, metrics in expected.items():
+            _assert_metrics(report['breakdown'][feature][label], metrics)
+
+def test_groups_of_any_values():
+    _, y_true, y_pred = _rows(n=300)
+    # Negatif veya metin gruplar np.unique ile kodlanır
+    for groups in (np.tile([-1, 5, 2], 100), np.tile(['x', 'y', 'z'], 100)):
+        result = grouped_metrics(groups, y_true, y_pred)
+        for value in np.unique(groups):
+            _assert_metrics(result[str(value)], _reference(y_true[groups == value], y_pred[groups == value]))
+
+def test_custom_metric_matches_rmspe():
+    _, y_true, y_pred = _rows(n=500)
+    dmatrix = xgb.DMatrix(np.zeros((len(y_true), 1)), label=y_true)
+    metric = RMSPEMetric()
+    for _ in range(2):
+        name, value = metric(y_pred.astype(np.float32), dmatrix)
+        assert name == 'rmspe'
+        assert value == pytest.approx(rmspe_score(y_true, y_pred.astype(np.float32)), rel=1e-6)
@@ -0,0 +1,46 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from helpers import save_small_bundle
+from model import BUNDLE_FORMAT_VERSION, load_model_bundle
+
+def _save_bundle(path):
+    return save_small_bundle(path)
+
+def _set_format_version(path, version):
+    manifest_path = os.path.join(path, 'manifest.json')
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest['format_version'] = version
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+
+def test_saved_with_current_format(tmp_path):
+    path = str(tmp_path / 'model')
+    X = _save_bundle(path)
+    bundle = load_model_bundle(path)
+    assert bundle.format_version == BUNDLE_FORMAT_VERSION
+    np.testing.assert_allclose(bundle.predict(X.iloc[:3]), bundle.booster.inplace_predict(X.iloc[:3]), rtol=1e-5)
+
+def test_older_layout_without_compiled_trees(tmp_path):
+    path = str(tmp_path / 'model')
+    X = _save_bundle(path)
+    # 1. sürüm paketlerde derlenmiş ağaç, geçmiş ve segment klasörü yoktu
+    _set_format_version(path, 1)
+    for name in os.listdir(os.path.join(path, 'compiled_trees')):
+        os.remove(os.path.join(path, 'compiled_trees', name))
+    os.rmdir(os.path.join(path, 'compiled_trees'))
+    bundle = load_model_bundle(path)
+    assert bundle.format_version == 1 and bundle.compiled_trees is None
+    assert len(bundle.predict(X.iloc[:3])) == 3
+
+@pytest.mark.parametrize('version', [0, '4', None, BUNDLE_FORMAT_VERSION + 1])
+def test_rejects_unknown_formats(tmp_path, version):
+    path = str(tmp_path / 'model')
+    _save_bundle(path)
+    _set_format_version(path, version)
+    with pytest.raises(ValueError):
+        load_model_bundle(path)
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+import pipeline
+from config import TRAIN_COLUMNS
+from data_prep import merge_data
+from features import engineer_features
+from parallel_prep import OUTPUT_COLUMNS, run_parallel_preprocessing
+from storage import load_processed_data
+from synthetic import generate_dataset
+
+@pytest.fixture(scope='module')
+def raw_dir(tmp_path_factory):
+    raw = tmp_path_factory.mktemp('parallel_prep') / 'raw'
+    generate_dataset(str(raw), 20_000, seed=11)
+    return raw
+
+@pytest.fixture(scope='module')
+def serial(raw_dir, tmp_path_factory):
+    """Steps 1-4 of the serial pipeline: merge_data, engineer_features and the encoding."""
+    processed = tmp_path_factory.mktemp('serial')
+    merge_data(str(raw_dir), str(processed))
+    df = load_processed_data(str(processed / 'train_merged'), columns=TRAIN_COLUMNS)
+    imputation = {'CompetitionDistance': float(df['CompetitionDistance'].median())}
+    df = engineer_features(df, verbose=False, history_cutoff=pipeline._validation_start(df) - pd.Timedelta(days=1))
+    df, encoders = pipeline._encode_categorical_features(df)
+    return df[OUTPUT_COLUMNS], {'encoders': encoders, 'imputation': imputation}
+
+def _by_store_and_date(df):
+    return df.sort_values(['Store', 'Date'], kind='stable', ignore_index=True)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_matches_the_serial_pipeline(raw_dir, serial, tmp_path, workers):
+    # Küçük bloklar ve birden fazla mağaza aralığı, birleştirme ve parça sınırlarını da sınar
+    df, artifacts = run_parallel_preprocessing(str(raw_dir), str(tmp_path / 'train_merged'), workers,
+                                               shards_per_worker=3, block_bytes=64 * 1024)
+    expected_df, expected_artifacts = serial
+    pd.testing.assert_frame_equal(_by_store_and_date(df[OUTPUT_COLUMNS]), _by_store_and_date(expected_df))
+    assert artifacts['imputation'] == pytest.approx(expected_artifacts['imputation'])
+    assert {name: list(classes) for name, classes in artifacts['encoders'].items()} == \
+        {name: list(classes) for name, classes in expected_artifacts['encoders'].items()}
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+
+from helpers import save_small_bundle
+from registry import (
+    ModelWatcher, list_versions, publish_bundle, read_pointer, rollback, set_current, verify_version, version_path
+)
+
+def _publish(tmp_path, registry, seed, keep=5):
+    bundle_path = tmp_path / f'bundle_{seed}'
+    X = save_small_bundle(bundle_path, seed=seed)
+    return publish_bundle(str(bundle_path), registry, keep=keep), X
+
+def _tamper(registry, version):
+    with open(os.path.join(version_path(registry, version), 'model.ubj'), 'r+b') as f:
+        f.seek(10)
+        f.write(b'\x00\x01\x02')
+
+def test_publish_promote_and_rollback(tmp_path):
+    registry = str(tmp_path / 'registry')
+    assert _publish(tmp_path, registry, 1)[0] == 'v0001'
+    assert _publish(tmp_path, registry, 2)[0] == 'v0002'
+    assert read_pointer(registry)['version'] == 'v0002'
+    assert read_pointer(registry)['previous'] == 'v0001'
+
+    assert rollback(registry) == 'v0001'
+    assert read_pointer(registry) | {'updated_at': None} == {'version': 'v0001', 'previous': 'v0002',
+                                                              'updated_at': None}
+    set_current(registry, 'v0002')
+    assert read_pointer(registry)['version'] == 'v0002'
+    with pytest.raises(ValueError):
+        set_current(registry, 'v0009')
+
+def test_prune_keeps_the_newest_versions(tmp_path):
+    registry = str(tmp_path / 'registry')
+    for seed in range(4):
+        _publish(tmp_path, registry, seed, keep=2)
+    assert list_versions(registry) == ['v0003', 'v0004']
+
+def test_verify_detects_a_tampered_file(tmp_path):
+    registry = str(tmp_path / 'registry')
+    _publish(tmp_path, registry, 1)
+    verify_version(registry, 'v0001')
+    _tamper(registry, 'v0001')
+    with pytest.raises(ValueError, match='checksums'):
+        verify_version(registry, 'v0001')
+
+def test_watcher_swaps_in_new_versions_and_refuses_corrupt_ones(tmp_path):
+    registry = str(tmp_path / 'registry')
+    _, X = _publish(tmp_path, registry, 1)
+    swaps = []
+    watcher = ModelWatcher(registry, on_swap=lambda version, bundle: swaps.append(version))
+    old_bundle = watcher.bundle
+    assert watcher.version == 'v0001' and not watcher.check()
+
+    _publish(tmp_path, registry, 2)
+    assert watcher.check()
+    assert watcher.version == 'v0002' and swaps == ['v0002']
+    # Değişimden önce alınan paket, onu kullanan isteğin elinde aynen kalır
+    assert not np.allclose(old_bundle.predict(X), watcher.bundle.predict(X))
+
+    _publish(tmp_path, registry, 3)
+    _tamper(registry, 'v0003')
+    with pytest.raises(ValueError):
+        watcher.check()
+    assert watcher.version == 'v0002'
+    # Bozuk sürüm, işaretçi değişene kadar yeniden denenmez
+    assert not watcher.check()
+    set_current(registry, 'v0001')
+    assert watcher.check() and watcher.version == 'v0001'
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from config import FEATURES
+from model import load_model_bundle, route_predict, save_model_bundle
+from segments import store_segments, train_segment_models
+
+ROUTER_FEATURES = ['Store', 'Promo']
+
+def _constant_booster(value, features=ROUTER_FEATURES):
+    """A booster that predicts value for every row."""
+    X = pd.DataFrame(np.zeros((10, len(features))), columns=features)
+    return xgb.train({'base_score': value}, xgb.DMatrix(X, label=np.full(10, value)), num_boost_round=1)
+
+def _rows(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'Store': rng.integers(1, 7, n).astype(np.int16), 'Promo': rng.integers(0, 2, n).astype(np.int8)})
+
+# Mağaza 1-2 segment 0, 3-4 segment 1, 5 segment 2 (modeli yok), 6 segmentsiz
+STORE_SEGMENT = np.array([-1, 0, 0, 1, 1, 2, -1], dtype=np.int32)
+
+def test_route_predict_sends_rows_to_their_segment_model():
+    boosters = {0: _constant_booster(100.0), 1: _constant_booster(200.0), 2: _constant_booster(300.0),
+                -1: _constant_booster(900.0)}
+    X = _rows()
+    predictions = route_predict(STORE_SEGMENT, X, boosters.__getitem__)
+    segment = STORE_SEGMENT[X['Store'].to_numpy()]
+    expected = np.select([segment == 0, segment == 1, segment == 2], [100.0, 200.0, 300.0], 900.0)
+    np.testing.assert_allclose(predictions, expected, rtol=1e-6)
+    assert len(route_predict(STORE_SEGMENT, X.iloc[:0], boosters.__getitem__)) == 0
+
+def test_bundle_falls_back_to_the_global_model(tmp_path):
+    segments = {'key': 'StoreType', 'labels': ['a', 'b', 'c'], 'store_segment': STORE_SEGMENT,
+                'models': {0: _constant_booster(100.0), 1: _constant_booster(200.0)}}
+    save_model_bundle(_constant_booster(900.0), str(tmp_path / 'bundle'), ROUTER_FEATURES, {}, {}, segments=segments)
+    bundle = load_model_bundle(str(tmp_path / 'bundle'))
+    X = _rows()
+    segment = STORE_SEGMENT[X['Store'].to_numpy()]
+    expected = np.select([segment == 0, segment == 1], [100.0, 200.0], 900.0)
+    # Küçük batch'ler de (derlenmiş ağaç sınırının altı) segment modellerine gider
+    for rows in (1, 5, len(X)):
+        np.testing.assert_allclose(bundle.predict(X.iloc[:rows]), expected[:rows], rtol=1e-6)
+
+def test_store_segments_from_clusters(tmp_path):
+    clusters_path = tmp_path / 'clusters.csv'
+    pd.DataFrame({'Store': [1, 2, 4, 99], 'Cluster': ['north', 'south', 'north', 'south']}).to_csv(
+        clusters_path, index=False)
+    store_segment, labels = store_segments({'known': np.ones(6, dtype=bool)}, 'StoreCluster', str(clusters_path))
+    assert labels == ['north', 'south']
+    assert store_segment.tolist() == [-1, 0, 1, -1, 0, -1]
+    with pytest.raises(ValueError):
+        store_segments({'known': np.ones(6, dtype=bool)}, 'Region')
+
+def test_small_segments_get_no_model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.integers(0, 5, (600, len(FEATURES))), columns=FEATURES)
+    # Segment 0: 3 mağaza, segment 1: tek mağaza (az satır), mağaza 5 segmentsiz
+    X['Store'] = rng.choice([1, 2, 3, 4, 5], 600, p=[0.3, 0.3, 0.3, 0.04, 0.06])
+    y = pd.Series(rng.random(600) * 1000 + 100)
+    store_segment = np.array([-1, 0, 0, 0, 1, -1], dtype=np.int32)
+    models, metrics = train_segment_models(X.iloc[:400], y.iloc[:400], X.iloc[400:], y.iloc[400:], store_segment,
+                                           {'max_depth': 2, 'eta': 0.3}, workers=1, min_rows=50)
+    assert list(models) == [0]
+    assert metrics[0]['train_rows'] == int(np.isin(X['Store'].iloc[:400], [1, 2, 3]).sum())
@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import RAW_DATA_PATH
+from helpers import save_small_bundle
+from model import load_model_bundle
+from server import MicroBatcher, ServerMetrics, parse_rows, predict_requests
+from store_index import build_store_index
+
+STORE_INDEX = {'known': np.array([False, True, True])}
+ENCODERS = {'StateHoliday': ['0', 'a', 'b', 'c']}
+
+def test_fills_optional_columns():
+    rows = parse_rows([{'Store': 1, 'Date': '2015-08-01'}, {'Store': 2.0, 'Date': '2015-08-02'}],
+                      STORE_INDEX, ENCODERS)
+    assert rows['Store'].tolist() == [1, 2]
+    assert rows['Store'].dtype == np.int64
+    assert rows['StateHoliday'].tolist() == ['0', '0']
+
+@pytest.mark.parametrize('store', [1.5, '1.5', None, 'abc', float('inf')])
+def test_rejects_non_integral_store_ids(store):
+    with pytest.raises(ValueError):
+        parse_rows([{'Store': 1, 'Date': '2015-08-01'}, {'Store': store, 'Date': '2015-08-01'}],
+                   STORE_INDEX, ENCODERS)
+
+def test_rejects_unknown_stores():
+    with pytest.raises(ValueError, match='Unknown stores'):
+        parse_rows([{'Store': 0, 'Date': '2015-08-01'}], STORE_INDEX, ENCODERS)
+
+@pytest.mark.parametrize('column', ['Open', 'Promo', 'SchoolHoliday'])
+@pytest.mark.parametrize('value', ['1', None, 2, True])
+def test_rejects_invalid_flags(column, value):
+    with pytest.raises(ValueError, match=column):
+        parse_rows([{'Store': 1, 'Date': '2015-08-01'}, {'Store': 1, 'Date': '2015-08-02', column: value}],
+                   STORE_INDEX, ENCODERS)
+
+def test_batched_requests_fail_alone_and_match_single_scoring(tmp_path):
+    save_small_bundle(tmp_path / 'bundle')
+    bundle = load_model_bundle(str(tmp_path / 'bundle'))
+    store_index = build_store_index(pd.read_csv(os.path.join(RAW_DATA_PATH, 'store.csv')))
+    encoders = {'StateHoliday': ['0', 'a', 'b', 'c']}
+    requests = [
+        parse_rows([{'Store': 1, 'Date': '2015-08-01', 'Promo': 1}], store_index, encoders),
+        # Özellikleri üretilemeyen istek (bilinmeyen tatil kodu); yalnızca kendisi hata almalı
+        parse_rows([{'Store': 2, 'Date': '2015-08-01'}], store_index, encoders).assign(StateHoliday='x'),
+        parse_rows([{'Store': 3, 'Date': '2015-08-02'}, {'Store': 1, 'Date': '2015-08-03', 'Open': 0}],
+                   store_index, encoders),
+    ]
+    metrics = ServerMetrics(64)
+    batcher = MicroBatcher(lambda batch: predict_requests(bundle, store_index, batch), 64, 50, metrics)
+
+    async def _submit_all():
+        task = asyncio.create_task(batcher.run())
+        try:
+            return await asyncio.gather(*(batcher.submit(rows) for rows in requests), return_exceptions=True)
+        finally:
+            task.cancel()
+            batcher.shutdown()
+
+    results = asyncio.run(_submit_all())
+    # Üç istek tek batch'te skorlanır
+    assert metrics.batches == 1 and metrics.rows == 4
+    assert isinstance(results[1], ValueError)
+    alone = predict_requests(bundle, store_index, [requests[0], requests[2]])
+    np.testing.assert_array_equal(results[0], alone[0])
+    np.testing.assert_array_equal(results[2], alone[1])
+    assert results[2][1] == 0
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from storage import (
+    save_processed_data, load_processed_data, processed_null_counts, next_processed_part, remove_processed_part
+)
+
+def _merged_rows():
+    dates = pd.date_range('2015-05-25', '2015-06-07')
+    return pd.DataFrame({
+        'Store': np.repeat([1, 2], len(dates)),
+        'Date': np.tile(dates, 2),
+        'Sales': np.arange(2 * len(dates), dtype=float),
+        'StoreType': 'a',
+        'CompetitionDistance': np.tile([np.nan, 250.0], len(dates)),
+    })
+
+def test_load_with_projection_and_date_range(tmp_path):
+    save_processed_data(_merged_rows(), str(tmp_path))
+    df = load_processed_data(str(tmp_path), columns=['Store', 'Date', 'Sales'],
+                             start_date='2015-05-31', end_date='2015-06-01')
+    assert list(df.columns) == ['Store', 'Date', 'Sales']
+    assert sorted(df['Date'].dt.strftime('%Y-%m-%d').unique()) == ['2015-05-31', '2015-06-01']
+    assert len(df) == 4
+
+def test_null_counts_from_statistics(tmp_path):
+    save_processed_data(_merged_rows(), str(tmp_path))
+    null_counts, num_rows = processed_null_counts(str(tmp_path))
+    assert num_rows == 28
+    assert null_counts['CompetitionDistance'] == 14
+    assert null_counts['Sales'] == 0
+
+def test_null_counts_without_statistics(tmp_path):
+    # Ayrık bir ay bölümü, istatistikleri yazılmadan eklenir
+    df = _merged_rows()
+    table = pa.Table.from_pandas(df.drop(columns=['Date']).assign(
+        Date=df['Date'].astype('datetime64[ns]')), preserve_index=False)
+    partition = tmp_path / 'year=2015' / 'month=5'
+    partition.mkdir(parents=True)
+    pq.write_table(table, partition / 'part-0.parquet', write_statistics=False)
+    assert pq.ParquetFile(partition / 'part-0.parquet').metadata.row_group(0).column(0).statistics is None
+    null_counts, num_rows = processed_null_counts(str(tmp_path))
+    assert num_rows == 28
+    assert null_counts['CompetitionDistance'] == 14
+    assert null_counts['Sales'] == 0
+
+def test_appended_parts_get_increasing_indexes(tmp_path):
+    assert next_processed_part(str(tmp_path)) == 1
+    rows = _merged_rows()
+    for _ in range(2):
+        # Aynı saniyede yazılan parçalar da birbirinin üzerine yazılmaz
+        save_processed_data(rows, str(tmp_path), part_index=next_processed_part(str(tmp_path)))
+    assert next_processed_part(str(tmp_path)) == 3
+    assert len(load_processed_data(str(tmp_path))) == 2 * len(rows)
+    remove_processed_part(str(tmp_path), 2)
+    assert len(load_processed_data(str(tmp_path))) == len(rows)
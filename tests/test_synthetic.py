@@ -0,0 +1,19 @@
+import filecmp
+import os
+
+from synthetic import generate_dataset
+
+def _generate(path, seed):
+    generate_dataset(str(path), 10_000, seed=seed)
+    return {name: os.path.join(path, f'{name}.csv') for name in ('train', 'store', 'test')}
+
+def test_same_seed_writes_identical_files(tmp_path):
+    first = _generate(tmp_path / 'first', 7)
+    second = _generate(tmp_path / 'second', 7)
+    for name in first:
+        assert filecmp.cmp(first[name], second[name], shallow=False), name
+
+def test_different_seed_writes_different_sales(tmp_path):
+    first = _generate(tmp_path / 'first', 7)
+    second = _generate(tmp_path / 'second', 8)
+    assert not filecmp.cmp(first['train'], second['train'], shallow=False)
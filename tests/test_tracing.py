@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import pipeline
+import tracing
+from synthetic import generate_dataset
+
+PIPELINE_STAGES = ['merge', 'load', 'features', 'encoding', 'split', 'dmatrix', 'boosting', 'evaluation', 'save']
+
+@pytest.fixture
+def tracer(tmp_path):
+    trace_path = tmp_path / 'trace.jsonl'
+    yield tracing.start_tracing(str(trace_path)), trace_path
+    tracing.stop_tracing()
+
+def _read_records(trace_path):
+    with open(trace_path) as f:
+        return [json.loads(line) for line in f]
+
+def test_one_record_per_stage(tracer):
+    _, trace_path = tracer
+    with tracing.stage('outer', rows=3) as span:
+        with tracing.stage('inner'):
+            pass
+        span.set(cached=False)
+    with pytest.raises(KeyError):
+        with tracing.stage('failing'):
+            raise KeyError('x')
+    tracing.stop_tracing()
+
+    records = _read_records(trace_path)
+    # İç aşama önce biter, kaydı önce yazılır
+    assert [record['name'] for record in records] == ['inner', 'outer', 'failing']
+    assert records[1]['rows'] == 3 and records[1]['cached'] is False
+    assert records[1]['wall_seconds'] >= records[0]['wall_seconds']
+    assert records[2]['error'] == 'KeyError'
+    assert tracing.stage('untraced') is tracing._NULL_STAGE
+
+def test_chrome_trace_has_one_event_per_stage_and_iteration(tmp_path):
+    trace_path = tmp_path / 'trace.json'
+    tracer = tracing.start_tracing(str(trace_path), 'chrome')
+    callbacks = tracing.boosting_callbacks()
+    with tracing.stage('boosting') as span:
+        for epoch in range(3):
+            callbacks[0].before_iteration(None, epoch, {})
+            callbacks[0].after_iteration(None, epoch, {})
+        tracing.record_boosting(span, callbacks)
+    tracing.stop_tracing()
+
+    with open(trace_path) as f:
+        events = json.load(f)['traceEvents']
+    assert [event['name'] for event in events] == ['boosting', 'iteration 0', 'iteration 1', 'iteration 2']
+    assert events[0]['args']['iterations'] == 3
+    assert '_iterations' not in events[0]['args'] and len(tracer.records) == 1
+    with pytest.raises(ValueError):
+        tracing.Tracer(trace_format='csv')
+
+def test_pipeline_traces_each_stage_once(tmp_path, monkeypatch, tracer):
+    _, trace_path = tracer
+    raw, processed = tmp_path / 'raw', tmp_path / 'processed'
+    generate_dataset(str(raw), 10_000, seed=5)
+    monkeypatch.setattr(pipeline, 'RAW_DATA_PATH', str(raw))
+    monkeypatch.setattr(pipeline, 'PROCESSED_DATA_PATH', str(processed))
+    monkeypatch.setattr(pipeline, 'PROCESSED_TRAIN_DATASET', str(processed / 'train_merged'))
+    monkeypatch.setattr(pipeline, 'CACHE_PATH', str(tmp_path / 'cache'))
+    params = {'objective': 'reg:squarederror', 'eta': 0.5, 'max_depth': 3, 'eval_metric': 'rmse'}
+    pipeline.run_training_pipeline(params=params, prep_workers=1, publish=False,
+                                   bundle_path=str(tmp_path / 'bundle'))
+    tracing.stop_tracing()
+
+    records = _read_records(trace_path)
+    assert [record['name'] for record in records] == PIPELINE_STAGES
+    assert all(record['wall_seconds'] >= 0 and record['error'] is None for record in records)
+    boosting = records[PIPELINE_STAGES.index('boosting')]
+    assert boosting['iterations'] == len(boosting['iteration_seconds'])
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from config import COMPILED_PREDICT_MAX_ROWS
+from model import load_model_bundle, save_model_bundle
+from tree_predictor import compile_booster, predict_compiled
+
+FEATURES = ['a', 'b', 'c', 'd']
+
+def _train(objective, missing_fraction=0.2, depth=10, rounds=30, seed=0):
+    """A booster on rows with NaN values, so its splits learn both missing directions."""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(3000, len(FEATURES))).astype(np.float32)
+    y = 5000 + 1500 * np.sin(3 * X[:, 0]) + 800 * X[:, 1] * X[:, 2] + rng.normal(0, 100, len(X))
+    # Eksik değerli satırların hedefi farklı; bazı bölünmeler eksikleri sola, bazıları sağa gönderir
+    missing = rng.random(X.shape) < missing_fraction
+    y = np.maximum(y + 2000 * missing[:, 0] - 1500 * missing[:, 1], 100)
+    X[missing] = np.nan
+    booster = xgb.train({'objective': objective, 'max_depth': depth, 'eta': 0.3, 'seed': seed},
+                        xgb.DMatrix(pd.DataFrame(X, columns=FEATURES), label=y), num_boost_round=rounds)
+    return booster, pd.DataFrame(rng.normal(size=(500, len(FEATURES))).astype(np.float32), columns=FEATURES)
+
+def _with_missing(X, fraction=0.3, seed=1):
+    values = X.to_numpy().copy()
+    values[np.random.default_rng(seed).random(values.shape) < fraction] = np.nan
+    return pd.DataFrame(values, columns=X.columns)
+
+@pytest.mark.parametrize('objective', ['reg:squarederror', 'reg:gamma'])
+def test_matches_inplace_predict(objective):
+    booster, X = _train(objective)
+    trees = compile_booster(booster)
+    assert int(trees['depth']) == 10
+    nodes = np.arange(len(trees['missing']))
+    left, right = trees['children'][0::2], trees['children'][1::2]
+    split = left != nodes
+    # Eksik değerler hem sola hem sağa giden bölünmeler var
+    assert (trees['missing'][split] == left[split]).any() and (trees['missing'][split] == right[split]).any()
+    for rows in (X, _with_missing(X), _with_missing(X, fraction=1.0)):
+        np.testing.assert_allclose(predict_compiled(trees, rows), booster.inplace_predict(rows), rtol=1e-5)
+
+def test_bundle_predicts_the_same_on_both_sides_of_the_compiled_limit(tmp_path):
+    booster, X = _train('reg:squarederror')
+    save_model_bundle(booster, str(tmp_path / 'bundle'), FEATURES, {}, {})
+    bundle = load_model_bundle(str(tmp_path / 'bundle'))
+    assert bundle.compiled_trees is not None
+    X = _with_missing(X)
+    for rows in (1, COMPILED_PREDICT_MAX_ROWS, COMPILED_PREDICT_MAX_ROWS + 1, len(X)):
+        np.testing.assert_allclose(bundle.predict(X.iloc[:rows]), booster.inplace_predict(X.iloc[:rows]), rtol=1e-5)
+
+def test_rejects_other_feature_orders():
+    booster, X = _train('reg:squarederror', rounds=2)
+    with pytest.raises(ValueError, match='feature columns'):
+        predict_compiled(compile_booster(booster), X[FEATURES[::-1]])
@@ -0,0 +1,62 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import tuning
+from pipeline import load_params_file
+
+def _split(seed=0, rows=600):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.random((rows, 3)), columns=['Store', 'Promo', 'DayOfWeek'])
+    y = pd.Series(1000 + 3000 * X['Promo'] + 500 * rng.random(rows))
+    cut = rows * 3 // 4
+    return X.iloc[:cut], y.iloc[:cut], X.iloc[cut:], y.iloc[cut:], {'dmatrix': 'data-key'}
+
+@pytest.fixture
+def search(tmp_path, monkeypatch):
+    monkeypatch.setattr(tuning, 'load_train_validation', _split)
+    options = {'n_trials': 9, 'min_rounds': 2, 'max_rounds': 18, 'reduction_factor': 3, 'workers': 1, 'seed': 7,
+               'log_path': str(tmp_path / 'tuning.jsonl')}
+    return lambda **kwargs: tuning.run_search(**{**options, **kwargs})
+
+def _trials(log_path):
+    with open(log_path) as f:
+        return [record for record in map(json.loads, f) if record['type'] == 'trial']
+
+def test_sampled_params_are_reproducible_and_in_bounds():
+    assert tuning.sample_params(3, seed=1) == tuning.sample_params(3, seed=1)
+    assert tuning.sample_params(3, seed=1) != tuning.sample_params(4, seed=1)
+    for trial_id in range(50):
+        params = tuning.sample_params(trial_id, seed=0)
+        for name, (distribution, low, high) in tuning.SEARCH_SPACE.items():
+            assert low <= params[name] <= high
+            assert isinstance(params[name], int) == (distribution == 'int')
+    assert tuning.halving_rungs(50, 1000, 3) == [50, 150, 450, 1000]
+    assert tuning.halving_rungs(2, 18, 3) == [2, 6, 18]
+
+def test_halving_keeps_the_best_trials_of_each_rung(search, tmp_path):
+    best = search()
+    trials = _trials(tmp_path / 'tuning.jsonl')
+    by_rung = [[t for t in trials if t['rung'] == rung] for rung in range(3)]
+    # Erken duran denemeler üst basamakta yeniden eğitilmez, loga da yazılmaz
+    assert len(by_rung[0]) == 9 and len(by_rung[1]) <= 3 and len(by_rung[2]) <= 1
+    ranked = sorted(by_rung[0], key=lambda t: t['rmspe'])
+    retrained = {t['trial_id'] for t in by_rung[1]}
+    assert retrained <= {t['trial_id'] for t in ranked[:3]}
+    assert best['trial_id'] in {t['trial_id'] for t in ranked[:3]} and best['rung'] == 2
+    assert best['params'] == tuning.sample_params(best['trial_id'], seed=7)
+
+def test_resumes_from_the_log_and_refuses_another_search(search, tmp_path, monkeypatch):
+    best = search()
+    def _fail(*args):
+        raise AssertionError("a logged trial was trained again")
+    monkeypatch.setattr(tuning, '_run_trial', _fail)
+    assert search() == best
+    with pytest.raises(ValueError, match='different search'):
+        search(seed=8)
+
+    tuning.export_best_params(best, str(tmp_path / 'params.json'))
+    params = load_params_file(str(tmp_path / 'params.json'))
+    assert params == {**tuning.XGB_PARAMS, **best['params']}